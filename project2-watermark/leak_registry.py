@@ -0,0 +1,172 @@
+import math
+from collections import namedtuple
+import numpy as np
+from watermark import DwtDctEmbedder, WATERMARK_W, WATERMARK_H
+from watermark_batch import recipient_digest
+
+# 泄露溯源：从泄露图像中提取出的水印带噪声，需要在全部接收者的水印中找汉明距离最近的。
+# 水印以np.packbits压缩存储（1024位 = 16个uint64），精确搜索为向量化的 异或 + 位计数。
+# 多索引哈希（MIH）把1024位分成chunks段，每段建一张"段值 -> 接收者"表：
+# 距离小于chunks时至少有一段完全相同、小于2·chunks时至少有一段只差1位（抽屉原理），
+# 只需比较这些表中命中的少量候选。
+#
+# 置信度：与查询无关的接收者水印（由ID哈希导出，可视为随机位串）距离不超过d的概率为
+#   P[Bin(L, 1/2) ≤ d]，n个接收者中任一如此接近的概率不超过 n·P，置信度取 1 - n·P。
+# 这一估计只对由ID导出的水印成立；add(..., mark=...)显式给出的水印可能彼此相关，
+# 此时search不再依据它提前结束（见search），置信度也只是参考值。
+
+Match = namedtuple('Match', ['recipient_id', 'distance', 'confidence'])
+MARK_BITS = WATERMARK_W * WATERMARK_H
+CHUNKS = 64
+ALPHA = 1e-6  #MIH结果的最近候选误判概率低于该值时不再做全量扫描
+_SCAN_ROWS = 1 << 16
+
+
+def mark_bits(mark):
+    """
+    水印 -> 长为MARK_BITS的布尔位向量。二维输入按嵌入时的方式处理（缩放到32x32，>127为1），
+    如retrieve_watermark的输出；一维输入视为0/1位向量
+    """
+    mark = np.asarray(mark)
+    if mark.ndim == 2:
+        return DwtDctEmbedder()._preprocess_watermark(mark.astype(np.uint8)).astype(bool)
+    bits = mark.ravel() != 0
+    if bits.size != MARK_BITS: raise ValueError(f"水印须为{MARK_BITS}位")
+    return bits
+
+
+def _popcount_rows(xored):
+    #每行的汉明重量；xored为(n, MARK_BITS // 64)的uint64
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(xored).sum(axis=1, dtype=np.int32)
+    table = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    return table[xored.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+class RecipientRegistry:
+    """
+    接收者水印登记表，search()返回与提取水印最接近的top-k接收者及置信度。
+    """
+
+    def __init__(self, chunks=CHUNKS):
+        if MARK_BITS % chunks or MARK_BITS // chunks not in (8, 16, 32): raise ValueError("每段须为8、16或32位")
+        self.chunks = chunks
+        self._ids = []
+        self._rows = []  #待合并的打包水印
+        self._explicit = False  #是否登记过显式给出的水印
+        self._marks = np.zeros((0, MARK_BITS // 64), dtype=np.uint64)
+        self._index = None
+        # 累积二项分布 P[Bin(L, 1/2) ≤ d]，d = 0..L
+        total, cumulative = 0, []
+        for d in range(MARK_BITS + 1):
+            total += math.comb(MARK_BITS, d)
+            cumulative.append(total / 2 ** MARK_BITS)
+        self._cdf = np.array(cumulative)
+
+    def add(self, recipient_id, mark=None):
+        """登记一个接收者；mark缺省时使用由ID导出的水印（与watermark_batch一致）"""
+        self.add_many([recipient_id], None if mark is None else [mark])
+
+    def add_many(self, recipient_ids, marks=None):
+        recipient_ids = list(recipient_ids)
+        if marks is None:
+            #由ID导出的水印，其打包形式就是摘要本身
+            packed = np.frombuffer(b''.join(recipient_digest(r) for r in recipient_ids), dtype=np.uint8)
+            packed = packed.reshape(len(recipient_ids), MARK_BITS // 8)
+        else:
+            packed = np.packbits(np.stack([mark_bits(m) for m in marks]), axis=1)
+            self._explicit = True
+        if len(packed) != len(recipient_ids): raise ValueError("接收者与水印数量不一致")
+        self._ids.extend(recipient_ids)
+        self._rows.append(packed.view(np.uint64))
+        self._index = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _packed(self):
+        if self._rows:
+            self._marks = np.concatenate([self._marks] + self._rows)
+            self._rows = []
+        return self._marks
+
+    def _chunk_values(self, packed):
+        #把打包水印切成chunks段（每段8/16/32位）的整数值，形状(n, chunks)
+        width = MARK_BITS // self.chunks
+        return packed.view(np.dtype(f'>u{width // 8}')).astype(np.dtype(f'u{width // 8}'))
+
+    def _build_index(self):
+        #每段一张表：排好序的段值，以及对应的接收者下标
+        values = self._chunk_values(self._packed())
+        self._index = []
+        for j in range(self.chunks):
+            order = np.argsort(values[:, j], kind='stable').astype(np.uint32)
+            self._index.append((values[order, j], order))
+
+    def _candidates(self, query, radius):
+        #各段与查询相差不超过radius（0或1）位的接收者
+        values = self._chunk_values(query[None, :])[0]
+        width = MARK_BITS // self.chunks
+        flips = np.array([0] + [1 << b for b in range(width)] if radius else [0], dtype=values.dtype)
+        found = []
+        for (keys, order), v in zip(self._index, values):
+            probes = v ^ flips
+            lo, hi = np.searchsorted(keys, probes, 'left'), np.searchsorted(keys, probes, 'right')
+            found.extend(order[a:b] for a, b in zip(lo.tolist(), hi.tolist()) if b > a)
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.uint32)
+
+    def confidence(self, distance):
+        """距离为distance的匹配不是偶然接近的概率下界"""
+        return float(max(0.0, 1.0 - len(self) * self._cdf[distance]))
+
+    def _top(self, candidates, distances, k):
+        if len(distances) > k:
+            keep = np.argpartition(distances, k)[:k]
+            candidates, distances = candidates[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return [Match(self._ids[candidates[i]], int(distances[i]), self.confidence(int(distances[i])))
+                for i in order]
+
+    def search(self, extracted, k=5, exhaustive=False):
+        """
+        返回距离最近的k个接收者（按距离升序）。
+        默认先查MIH：最近候选的距离小于chunks·(radius+1)（必为真正的最近者），或其误判概率低于ALPHA时直接返回，
+        此时第2..k名只是候选集合中的最近者；否则、或exhaustive=True时做全量扫描。
+        误判概率按"无关水印是随机位串"估计，只对由ID导出的水印成立；登记过显式给出的水印时不使用这一条件，
+        只有抽屉原理保证的结果才直接返回。
+        """
+        packed = self._packed()
+        if not len(packed): return []
+        query = np.packbits(mark_bits(extracted)).view(np.uint64)
+        if not exhaustive:
+            if self._index is None: self._build_index()
+            #先查各段完全相同的，找不到可信的最近者时再放宽到各段相差1位
+            for radius in (0, 1):
+                candidates = self._candidates(query, radius)
+                if not len(candidates): continue
+                distances = _popcount_rows(packed[candidates] ^ query)
+                best = int(distances.min())
+                if best < self.chunks * (radius + 1) or (not self._explicit and len(self) * self._cdf[best] < ALPHA):
+                    return self._top(candidates, distances, k)
+        #全量扫描，分块进行以限制临时内存
+        best_ids, best_dist = [], []
+        for start in range(0, len(packed), _SCAN_ROWS):
+            distances = _popcount_rows(packed[start:start + _SCAN_ROWS] ^ query)
+            keep = np.argpartition(distances, k)[:k] if len(distances) > k else np.arange(len(distances))
+            best_ids.append(keep + start)
+            best_dist.append(distances[keep])
+        return self._top(np.concatenate(best_ids), np.concatenate(best_dist), k)
+
+    def save(self, path):
+        np.savez(path, ids=np.array(self._ids, dtype=str), marks=self._packed().view(np.uint8), chunks=self.chunks,
+                 explicit=self._explicit)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        registry = cls(int(data['chunks']))
+        registry._ids = data['ids'].tolist()
+        registry._marks = np.ascontiguousarray(data['marks']).view(np.uint64)
+        #未记录该标志的旧文件按保守的一方处理
+        registry._explicit = bool(data['explicit']) if 'explicit' in data.files else True
+        return registry
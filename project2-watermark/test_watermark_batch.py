@@ -0,0 +1,46 @@
+import os
+import threading
+import cv2
+import numpy as np
+import pytest
+import watermark_batch
+
+
+def _manifest(tmp_path, watermark):
+    for i in range(6):
+        cv2.imwrite(str(tmp_path / f"host{i}.png"), np.full((128, 128, 3), 100 + i, dtype=np.uint8))
+    path = tmp_path / 'manifest.csv'
+    path.write_text("image,recipient,watermark\n" + "".join(f"host{i}.png,r{i},{watermark}\n" for i in range(6)))
+    return watermark_batch.load_manifest(str(path))
+
+
+def _run_with_timeout(jobs, out_dir, timeout=30, **kwargs):
+    #在线程中运行，超时仍未结束视为死锁
+    result = {}
+
+    def run():
+        try:
+            result['report'] = watermark_batch.run_batch(jobs, out_dir, **kwargs)
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "run_batch未能结束（死锁）"
+    return result
+
+
+def test_pipeline_writes_every_copy(tmp_path):
+    jobs = _manifest(tmp_path, '')
+    result = _run_with_timeout(jobs, str(tmp_path / 'out'), queue_size=1)
+    assert result['report']['图像'] == 6
+    assert all(os.path.exists(tmp_path / 'out' / f"r{i}" / f"host{i}.png") for i in range(6))
+
+
+def test_pipeline_embed_error_does_not_deadlock(tmp_path):
+    # 水印文件不存在：嵌入阶段出错时读线程正阻塞在已满的有界队列上
+    jobs = _manifest(tmp_path, 'missing.png')
+    result = _run_with_timeout(jobs, str(tmp_path / 'out'), queue_size=1)
+    with pytest.raises(ValueError, match="无法读取水印图像"):
+        raise result['error']
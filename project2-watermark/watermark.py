@@ -9,10 +9,144 @@ WATERMARK_H = 32  #水印图像的高度
 RANDOM_SEED = 42  #伪随机数发生器的种子
 
 
+_SQRT_HALF = np.float32(np.sqrt(0.5))
+
+
+def _block_dct(blocks):
+    """
+    批量2x2 DCT，blocks形状为(n, 2, 2)、类型float32。
+    2点正交DCT与其逆变换是同一个蝶形 (p·s + q·s, p·s - q·s)，s=√½，因此本函数同时用作IDCT；
+    按先行后列、全程float32的顺序计算，与cv2.dct/cv2.idct对2x2 float32块的结果逐位一致。
+    """
+    s = _SQRT_HALF
+    a, b, c, d = blocks[:, 0, 0] * s, blocks[:, 0, 1] * s, blocks[:, 1, 0] * s, blocks[:, 1, 1] * s
+    r0, r1, r2, r3 = (a + b) * s, (a - b) * s, (c + d) * s, (c - d) * s
+    out = np.empty_like(blocks)
+    out[:, 0, 0] = r0 + r2
+    out[:, 1, 0] = r0 - r2
+    out[:, 0, 1] = r1 + r3
+    out[:, 1, 1] = r1 - r3
+    return out
+
+
+def _embedding_region(band_h, band_w):
+    """LH/HL子带（两者尺寸相同）中可用于嵌入的区域尺寸，裁为水印尺寸的整数倍"""
+    return band_h - band_h % WATERMARK_H, band_w - band_w % WATERMARK_W
+
+
+def _embedding_coords(embedding_h, embedding_w, count, seed=RANDOM_SEED):
+    """
+    一次性生成count个水印位的嵌入坐标，返回(lh行, lh列, hl行, hl列)。
+    对全局随机数发生器的一次向量化randint与逐位调用4次randint得到相同序列，
+    调用后全局随机状态也与逐位调用时相同。
+    """
+    np.random.seed(seed)
+    bounds = np.tile([embedding_h - 1, embedding_w - 1] * 2, count)
+    coords = np.random.randint(0, bounds).reshape(count, 4)
+    return coords[:, 0], coords[:, 1], coords[:, 2], coords[:, 3]
+
+
+_HAAR_S = pywt.Wavelet('haar').dec_lo[1]
+
+
+def _pixel_index(rows, cols):
+    #系数块(rows, cols)对应的4x4像素花式索引，形状均为(n, 4, 4)
+    return 2 * rows[:, None, None] + np.arange(4)[:, None], 2 * cols[:, None, None] + np.arange(4)
+
+
+def _haar_detail_blocks(img, rows, cols):
+    """
+    只对(rows, cols)处2x2块所需的4x4像素做一层Haar分解，返回这些位置的(LH块, HL块)，形状均为(n, 2, 2)。
+    先纵向后横向、按 p·s ± q·s 计算，与pywt.dwt2(img, 'haar')在这些位置的系数逐位一致。
+    """
+    s = _HAAR_S
+    patch = img[_pixel_index(rows, cols)].astype(np.float64)
+    top, bottom = patch[:, 0::2] * s, patch[:, 1::2] * s
+    low_v, high_v = top + bottom, top - bottom
+    lh = high_v[:, :, 0::2] * s + high_v[:, :, 1::2] * s
+    hl = low_v[:, :, 0::2] * s - low_v[:, :, 1::2] * s
+    return lh, hl
+
+
+def _haar_inverse_patches(bands, rows, cols):
+    """
+    由(LL, LH, HL, HH)在(rows, cols)处的2x2系数块重构对应的4x4像素，形状(n, 4, 4)。
+    先横向后纵向、按 lo·s ± hi·s 计算，与pywt.idwt2在这些像素上的结果逐位一致。
+    """
+    s = _HAAR_S
+    index = _block_index(rows, cols)
+    ll, lh, hl, hh = (band[index] * s for band in bands)
+    low = np.empty((len(rows), 2, 4))
+    high = np.empty((len(rows), 2, 4))
+    low[:, :, 0::2], low[:, :, 1::2] = ll + hl, ll - hl
+    high[:, :, 0::2], high[:, :, 1::2] = lh + hh, lh - hh
+    low *= s
+    high *= s
+    out = np.empty((len(rows), 4, 4))
+    out[:, 0::2], out[:, 1::2] = low + high, low - high
+    return out
+
+
+def _local_haar_ok(img, embedding_h, embedding_w):
+    #局部计算要求：二维、pywt按float64计算的类型、且嵌入区域不触及边界延拓的像素
+    return (img.ndim == 2 and (img.dtype.kind in 'biu' or img.dtype == np.float64)
+            and 2 * embedding_h <= img.shape[0] and 2 * embedding_w <= img.shape[1])
+
+
+def _block_index(rows, cols):
+    #每个2x2块四个元素的(行, 列)花式索引，形状均为(n, 2, 2)
+    return rows[:, None, None] + np.array([[0], [1]]), cols[:, None, None] + np.array([[0, 1]])
+
+
+def _block_waves(rows, cols):
+    """
+    为按顺序修改的块分批：块i的批次比所有与它共享像素的更早的块都大。
+    同一批内的块互不重叠，可以一次聚集、变换、写回，结果与逐块顺序处理相同。
+    """
+    waves = np.zeros(len(rows), dtype=np.int64)
+    last = {}  #像素 -> 最近一次写它的批次
+    for i, (r, c) in enumerate(zip(rows.tolist(), cols.tolist())):
+        pixels = ((r, c), (r, c + 1), (r + 1, c), (r + 1, c + 1))
+        wave = max([last[p] + 1 for p in pixels if p in last], default=0)
+        for p in pixels:
+            last[p] = wave
+        waves[i] = wave
+    return waves
+
+
+def _apply_blocks(band, rows, cols, waves, coeff, deltas):
+    """对band中(rows, cols)处的2x2块按批次依次做 DCT -> coeff系数加deltas -> IDCT 并写回"""
+    for wave in range(waves.max() + 1 if len(waves) else 0):
+        sel = waves == wave
+        index = _block_index(rows[sel], cols[sel])
+        dct_blocks = _block_dct(np.float32(band[index]))
+        dct_blocks[:, coeff[0], coeff[1]] += deltas[sel]
+        band[index] = _block_dct(dct_blocks)
+
+
+class PreparedCarrier:
+    """
+    一幅载体的DWT子带、嵌入坐标及其分批，以及未加水印时的重构图像。
+    坐标只取决于子带尺寸，同一载体嵌入多个水印（如给每个接收者一份）时只需准备一次。
+    """
+
+    def __init__(self, carrier_img, seed=RANDOM_SEED):
+        low_pass_ll, (high_pass_lh, high_pass_hl, high_pass_hh) = pywt.dwt2(carrier_img, 'haar')
+        self.bands = [low_pass_ll, high_pass_lh, high_pass_hl, high_pass_hh]
+        embedding_h, embedding_w = _embedding_region(*high_pass_lh.shape)
+        self.rows_lh, self.cols_lh, self.rows_hl, self.cols_hl = _embedding_coords(
+            embedding_h, embedding_w, WATERMARK_W * WATERMARK_H, seed)
+        self.waves_lh = _block_waves(self.rows_lh, self.cols_lh)
+        self.waves_hl = _block_waves(self.rows_hl, self.cols_hl)
+        base = pywt.idwt2((low_pass_ll, (high_pass_lh, high_pass_hl, high_pass_hh)), 'haar')
+        self.base = np.clip(base, 0, 255).astype(np.uint8)
+
+
 class DwtDctEmbedder:
     """
     基于DWT和DCT的图像水印处理器。
     该类负责水印的嵌入与提取。
+    所有水印位的嵌入坐标一次生成，2x2块的DCT以批量闭式计算完成，结果与逐位调用cv2.dct的实现逐位一致。
     """
 
     def __init__(self, strength=EMBED_STRENGTH):
@@ -25,93 +159,72 @@ class DwtDctEmbedder:
         resized_wm = cv2.resize(wm_img, (WATERMARK_W, WATERMARK_H))
         return (resized_wm > 127).astype(np.uint8).flatten()
 
-    def insert_watermark(self, carrier_img, wm_img):
+    def insert_watermark(self, carrier_img, wm_img, seed=RANDOM_SEED):
+        """
+        将水印嵌入到载体图像中，seed决定嵌入坐标，提取时须使用相同的seed
+        """
+        return self.insert_prepared(self.prepare_carrier(carrier_img, seed), wm_img)
+
+    def prepare_carrier(self, carrier_img, seed=RANDOM_SEED):
+        """
+        对载体做一次DWT并算好嵌入坐标，返回的PreparedCarrier可交给insert_prepared反复使用
         """
-        将水印嵌入到载体图像中
+        return PreparedCarrier(carrier_img, seed)
+
+    def insert_prepared(self, prepared, wm_img):
+        """
+        向已准备好的载体嵌入水印，结果与insert_watermark逐位一致。
+        Haar逆变换是局部的：只有被修改的2x2系数块对应的4x4像素会变化，其余像素直接取未加水印时的重构结果。
         """
         #准备水印：将水印图像转换为一维的二进制位序列
         wm_bits = self._preprocess_watermark(wm_img)
-
-        #图像分解：对载体图像进行DWT分解
-        dwt_coefficients = pywt.dwt2(carrier_img, 'haar')
-        low_pass_ll, (high_pass_lh, high_pass_hl, high_pass_hh) = dwt_coefficients
-
-        #定义嵌入区域：选择LH和HL子带
-        lh_height, lh_width = high_pass_lh.shape
-        hl_height, hl_width = high_pass_hl.shape
-        embedding_h = min(lh_height, hl_height)
-        embedding_w = min(lh_width, hl_width)
-
-        #确保嵌入区域尺寸可用
-        embedding_h -= embedding_h % WATERMARK_H
-        embedding_w -= embedding_w % WATERMARK_W
-
-        #嵌入过程：通过伪随机位置在 DCT 域修改系数
-        np.random.seed(RANDOM_SEED)
-
-        for idx, bit_value in enumerate(wm_bits):
-            #获取随机嵌入坐标
-            rand_h_lh = np.random.randint(0, embedding_h - 1)
-            rand_w_lh = np.random.randint(0, embedding_w - 1)
-            rand_h_hl = np.random.randint(0, embedding_h - 1)
-            rand_w_hl = np.random.randint(0, embedding_w - 1)
-
-            #对2x2块进行DCT变换
-            dct_block_lh = cv2.dct(np.float32(high_pass_lh[rand_h_lh:rand_h_lh + 2, rand_w_lh:rand_w_lh + 2]))
-            dct_block_hl = cv2.dct(np.float32(high_pass_hl[rand_h_hl:rand_h_hl + 2, rand_w_hl:rand_w_hl + 2]))
-
-            #根据水印位修改DCT系数
-            if bit_value == 1:
-                dct_block_lh[0, 1] += self.strength
-                dct_block_hl[1, 0] += self.strength
-            else:
-                dct_block_lh[0, 1] -= self.strength
-                dct_block_hl[1, 0] -= self.strength
-
-            #IDCT反变换回子带
-            high_pass_lh[rand_h_lh:rand_h_lh + 2, rand_w_lh:rand_w_lh + 2] = cv2.idct(dct_block_lh)
-            high_pass_hl[rand_h_hl:rand_h_hl + 2, rand_w_hl:rand_w_hl + 2] = cv2.idct(dct_block_hl)
-
-        #图像重构：使用修改后的子带系数进行IDWT
-        final_image = pywt.idwt2((low_pass_ll, (high_pass_lh, high_pass_hl, high_pass_hh)), 'haar')
-        return np.clip(final_image, 0, 255).astype(np.uint8)
-
-    def retrieve_watermark(self, watermarked_img):
+        deltas = np.where(wm_bits == 1, np.float32(self.strength), -np.float32(self.strength)).astype(np.float32)
+
+        #嵌入过程：通过伪随机位置在 DCT 域修改LH和HL子带的系数，位为1时加strength，为0时减strength
+        p = prepared
+        high_pass_lh, high_pass_hl = p.bands[1], p.bands[2]
+        index_lh, index_hl = _block_index(p.rows_lh, p.cols_lh), _block_index(p.rows_hl, p.cols_hl)
+        saved_lh, saved_hl = high_pass_lh[index_lh], high_pass_hl[index_hl]
+        try:
+            _apply_blocks(high_pass_lh, p.rows_lh, p.cols_lh, p.waves_lh, (0, 1), deltas)
+            _apply_blocks(high_pass_hl, p.rows_hl, p.cols_hl, p.waves_hl, (1, 0), deltas)
+
+            #图像重构：只对受影响的像素块做IDWT
+            rows = np.concatenate([p.rows_lh, p.rows_hl])
+            cols = np.concatenate([p.cols_lh, p.cols_hl])
+            patches = _haar_inverse_patches(p.bands, rows, cols)
+        finally:
+            #子带是就地修改的，恢复原值以便载体继续复用
+            high_pass_lh[index_lh], high_pass_hl[index_hl] = saved_lh, saved_hl
+        final_image = p.base.copy()
+        final_image[_pixel_index(rows, cols)] = np.clip(patches, 0, 255).astype(np.uint8)
+        return final_image
+
+    def retrieve_watermark(self, watermarked_img, seed=RANDOM_SEED):
         """
         从带水印的图像中提取水印
         """
-        #图像分解：对带水印图像进行DWT
-        dwt_coefficients = pywt.dwt2(watermarked_img, 'haar')
-        low_pass_ll, (high_pass_lh, high_pass_hl, high_pass_hh) = dwt_coefficients
-
-        #确定提取区域
-        lh_height, lh_width = high_pass_lh.shape
-        hl_height, hl_width = high_pass_hl.shape
-        embedding_h = min(lh_height, hl_height)
-        embedding_w = min(lh_width, hl_width)
-
-        embedding_h -= embedding_h % WATERMARK_H
-        embedding_w -= embedding_w % WATERMARK_W
-
-        extracted_bits = np.zeros(WATERMARK_W * WATERMARK_H, dtype=np.float32)
-
-        # 3. 提取过程：使用与嵌入时相同的随机种子
-        np.random.seed(RANDOM_SEED)
-
-        for i in range(WATERMARK_W * WATERMARK_H):
-            #获取与嵌入时相同的随机坐标
-            rand_h_lh = np.random.randint(0, embedding_h - 1)
-            rand_w_lh = np.random.randint(0, embedding_w - 1)
-            rand_h_hl = np.random.randint(0, embedding_h - 1)
-            rand_w_hl = np.random.randint(0, embedding_w - 1)
-
-            #提取DCT域系数
-            dct_block_lh = cv2.dct(np.float32(high_pass_lh[rand_h_lh:rand_h_lh + 2, rand_w_lh:rand_w_lh + 2]))
-            dct_block_hl = cv2.dct(np.float32(high_pass_hl[rand_h_hl:rand_h_hl + 2, rand_w_hl:rand_w_hl + 2]))
-
-            #根据DCT系数差值判断水印位
-            value_diff = (dct_block_lh[0, 1] + dct_block_hl[1, 0]) / 2.0
-            extracted_bits[i] = 1 if value_diff > 0 else 0
+        #确定提取区域：一层Haar分解后子带的尺寸为原图的一半（向上取整）
+        band_h, band_w = (pywt.dwt_coeff_len(n, 2, 'symmetric') for n in watermarked_img.shape[-2:])
+        embedding_h, embedding_w = _embedding_region(band_h, band_w)
+
+        #提取过程：使用与嵌入时相同的随机种子，一次取出全部2x2块
+        rows_lh, cols_lh, rows_hl, cols_hl = _embedding_coords(embedding_h, embedding_w, WATERMARK_W * WATERMARK_H, seed)
+        if _local_haar_ok(watermarked_img, embedding_h, embedding_w):
+            #只需这些块处的DWT系数：Haar是局部变换，直接由对应的4x4像素算出，不必分解整幅图像
+            blocks_lh = _haar_detail_blocks(watermarked_img, rows_lh, cols_lh)[0]
+            blocks_hl = _haar_detail_blocks(watermarked_img, rows_hl, cols_hl)[1]
+        else:
+            #图像分解：对带水印图像进行DWT
+            _, (high_pass_lh, high_pass_hl, _) = pywt.dwt2(watermarked_img, 'haar')
+            blocks_lh = high_pass_lh[_block_index(rows_lh, cols_lh)]
+            blocks_hl = high_pass_hl[_block_index(rows_hl, cols_hl)]
+        dct_lh = _block_dct(np.float32(blocks_lh))
+        dct_hl = _block_dct(np.float32(blocks_hl))
+
+        #根据DCT系数差值判断水印位
+        value_diff = (dct_lh[:, 0, 1] + dct_hl[:, 1, 0]) / np.float32(2.0)
+        extracted_bits = (value_diff > 0).astype(np.float32)
 
         #重塑为二维水印图像
         retrieved_wm = extracted_bits.reshape(WATERMARK_H, WATERMARK_W)
@@ -0,0 +1,261 @@
+import os
+import csv
+import time
+import queue
+import hashlib
+import threading
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import cv2
+import numpy as np
+from watermark import DwtDctEmbedder, EMBED_STRENGTH, WATERMARK_W, WATERMARK_H
+
+# 批量加水印：给每个接收者一份带各自水印的副本，用于泄露溯源。
+# 作业以载体为单位：(载体路径, [(接收者ID, 水印图像路径或None), ...])，同一载体只做一次DWT，
+# 每个接收者只重算受影响的像素块（见DwtDctEmbedder.prepare_carrier/insert_prepared）。
+# workers=0时在本进程内以 解码线程 -> 嵌入 -> 编码写出线程 的流水线运行，两级队列均有界；
+# workers>0时每个作业整体交给进程池，在途作业数有界，各进程的读写与计算相互重叠。
+# 输出为 <out_dir>/<接收者ID>/<载体文件名><ext>。
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+STAGES = ('解码', 'DWT', '嵌入', '编码写出')
+PER_JOB = 64  #每个作业最多包含的接收者数，接收者很多时把同一载体拆成多个作业以便并行
+
+
+def recipient_digest(recipient_id):
+    """接收者水印的打包形式：ID的SHAKE-256摘要，1024位"""
+    return hashlib.shake_256(recipient_id.encode()).digest(WATERMARK_W * WATERMARK_H // 8)
+
+
+def recipient_watermark(recipient_id):
+    """
+    由接收者ID导出的32x32二值水印：recipient_digest展开为1024位，值为0/255
+    """
+    bits = np.unpackbits(np.frombuffer(recipient_digest(recipient_id), dtype=np.uint8))
+    return bits.reshape(WATERMARK_H, WATERMARK_W) * 255
+
+
+def _check_recipient(recipient_id):
+    #接收者ID用作输出子目录名
+    if not recipient_id or recipient_id in ('.', '..') or '/' in recipient_id or os.sep in recipient_id:
+        raise ValueError(f"非法的接收者ID: {recipient_id!r}")
+    return recipient_id
+
+
+def _split(image_path, recipients):
+    for i in range(0, len(recipients), PER_JOB):
+        yield image_path, recipients[i:i + PER_JOB]
+
+
+def directory_jobs(directory, recipients):
+    """目录中的每幅图像 × 每个接收者（水印由ID导出）"""
+    recipients = [(_check_recipient(r), None) for r in recipients]
+    jobs = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(IMAGE_EXTS):
+            jobs.extend(_split(os.path.join(directory, name), recipients))
+    return jobs
+
+
+def load_manifest(path):
+    """
+    CSV清单，每行 image,recipient[,watermark]；相对路径相对于清单所在目录，可有表头。
+    同一载体的各行合并为作业，保持首次出现的顺序。
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    grouped = {}
+    with open(path, newline='') as f:
+        for i, row in enumerate(csv.reader(f)):
+            if not row or (i == 0 and row[0].strip().lower() == 'image'): continue
+            image = os.path.join(base, row[0].strip())
+            mark = os.path.join(base, row[2].strip()) if len(row) > 2 and row[2].strip() else None
+            grouped.setdefault(image, []).append((_check_recipient(row[1].strip()), mark))
+    jobs = []
+    for image, recipients in grouped.items():
+        jobs.extend(_split(image, recipients))
+    return jobs
+
+
+@lru_cache(maxsize=256)
+def _load_mark(recipient_id, wm_path):
+    if wm_path is None: return recipient_watermark(recipient_id)
+    mark = cv2.imread(wm_path, cv2.IMREAD_GRAYSCALE)
+    if mark is None: raise ValueError(f"无法读取水印图像: {wm_path}")
+    return mark
+
+
+def _read(image_path):
+    image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    if image is None: raise ValueError(f"无法读取载体图像: {image_path}")
+    return image
+
+
+def _output_path(out_dir, image_path, recipient_id, ext):
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(out_dir, recipient_id, stem + ext)
+
+
+def _write(path, image):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not cv2.imwrite(path, image): raise ValueError(f"无法写出图像: {path}")
+
+
+def _embed_recipients(embedder, image, recipients, channel, timings):
+    """
+    对一幅已解码的载体依次生成每个接收者的副本；彩色图像只在channel通道（默认蓝色）嵌入。
+    奇数尺寸时IDWT结果比原图多一行/列，截回原尺寸。
+    """
+    start = time.perf_counter()
+    carrier = image if image.ndim == 2 else image[:, :, channel]
+    prepared = embedder.prepare_carrier(carrier)
+    timings['DWT'] += time.perf_counter() - start
+    h, w = carrier.shape
+    for recipient_id, wm_path in recipients:
+        start = time.perf_counter()
+        marked = embedder.insert_prepared(prepared, _load_mark(recipient_id, wm_path))[:h, :w]
+        if image.ndim == 2:
+            output = marked
+        else:
+            output = image.copy()
+            output[:, :, channel] = marked
+        timings['嵌入'] += time.perf_counter() - start
+        yield recipient_id, output
+
+
+def _process_job(image_path, recipients, out_dir, strength, channel, ext):
+    #进程池入口：解码、嵌入、编码写出一个作业，返回(图像数, 各阶段耗时)
+    timings = dict.fromkeys(STAGES, 0.0)
+    embedder = DwtDctEmbedder(strength)
+    start = time.perf_counter()
+    image = _read(image_path)
+    timings['解码'] += time.perf_counter() - start
+    count = 0
+    for recipient_id, output in _embed_recipients(embedder, image, recipients, channel, timings):
+        start = time.perf_counter()
+        _write(_output_path(out_dir, image_path, recipient_id, ext), output)
+        timings['编码写出'] += time.perf_counter() - start
+        count += 1
+    return count, timings
+
+
+def _run_pipeline(jobs, out_dir, embedder, channel, ext, queue_size, timings):
+    decoded, encoded = queue.Queue(queue_size), queue.Queue(queue_size * PER_JOB)
+    errors = []
+    stop = threading.Event()  #嵌入阶段出错时置位：不再有人取decoded，读线程须自行退出
+
+    def put(item):
+        #有界队列满时定期检查stop，避免读线程永远阻塞在put上
+        while not stop.is_set():
+            try:
+                decoded.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def reader():
+        try:
+            for image_path, recipients in jobs:
+                if stop.is_set(): return
+                start = time.perf_counter()
+                image = _read(image_path)
+                timings['解码'] += time.perf_counter() - start
+                put((image_path, recipients, image))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(None)
+
+    def writer():
+        #出错后继续取空队列，避免嵌入端阻塞
+        while (item := encoded.get()) is not None:
+            if errors: continue
+            start = time.perf_counter()
+            try:
+                _write(*item)
+            except Exception as e:
+                errors.append(e)
+            timings['编码写出'] += time.perf_counter() - start
+
+    threads = [threading.Thread(target=reader, daemon=True), threading.Thread(target=writer, daemon=True)]
+    for t in threads: t.start()
+    count = 0
+    try:
+        while (item := decoded.get()) is not None:
+            image_path, recipients, image = item
+            if errors: continue
+            for recipient_id, output in _embed_recipients(embedder, image, recipients, channel, timings):
+                encoded.put((_output_path(out_dir, image_path, recipient_id, ext), output))
+                count += 1
+    finally:
+        #正常结束时读线程已放入None；嵌入出错时通知读线程停止，原异常照常抛出
+        stop.set()
+        encoded.put(None)
+        for t in threads: t.join()
+    if errors: raise errors[0]
+    return count
+
+
+def run_batch(jobs, out_dir, workers=0, strength=EMBED_STRENGTH, channel=0, ext='.png', queue_size=None):
+    """
+    执行批量嵌入，返回报告：作业数、图像数、总耗时、图像/秒，以及各阶段耗时之和。
+    queue_size为在途作业（workers>0）或已解码载体（workers=0）的上限，默认2·max(1, workers)。
+    """
+    jobs = list(jobs)
+    queue_size = queue_size or 2 * max(1, workers)
+    timings = dict.fromkeys(STAGES, 0.0)
+    start = time.perf_counter()
+    if not workers:
+        count = _run_pipeline(jobs, out_dir, DwtDctEmbedder(strength), channel, ext, queue_size, timings)
+    else:
+        count = 0
+
+        def collect(futures):
+            nonlocal count
+            for f in futures:
+                n, stage_times = f.result()
+                count += n
+                for k, v in stage_times.items(): timings[k] += v
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for image_path, recipients in jobs:
+                if len(pending) >= queue_size:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending.add(pool.submit(_process_job, image_path, recipients, out_dir, strength, channel, ext))
+            collect(pending)
+    elapsed = time.perf_counter() - start
+    return {'作业': len(jobs), '图像': count, '耗时': elapsed, '图像/秒': count / elapsed if elapsed else 0.0,
+            '各阶段': timings}
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="为每个接收者批量生成带水印的图像副本")
+    parser.add_argument('source', help="载体目录（每幅图像 × 每个接收者）或CSV清单（image,recipient[,watermark]）")
+    parser.add_argument('--out', required=True, help="输出目录")
+    parser.add_argument('--recipients', nargs='+', default=[], help="接收者ID（source为目录时使用）")
+    parser.add_argument('--recipients-file', help="每行一个接收者ID的文件")
+    parser.add_argument('--workers', type=int, default=0, help="进程数，0为单进程流水线")
+    parser.add_argument('--strength', type=float, default=EMBED_STRENGTH)
+    parser.add_argument('--channel', type=int, default=0, help="彩色图像中嵌入的通道，0为蓝色")
+    parser.add_argument('--ext', default='.png', help="输出格式，建议无损格式")
+    parser.add_argument('--queue', type=int, default=None, help="队列上限")
+    args = parser.parse_args()
+    if os.path.isdir(args.source):
+        recipients = list(args.recipients)
+        if args.recipients_file:
+            with open(args.recipients_file) as f:
+                recipients.extend(line.strip() for line in f if line.strip())
+        if not recipients: parser.error("source为目录时需要--recipients或--recipients-file")
+        jobs = directory_jobs(args.source, recipients)
+    else:
+        jobs = load_manifest(args.source)
+    report = run_batch(jobs, args.out, args.workers, args.strength, args.channel, args.ext, args.queue)
+    print(f"作业 {report['作业']}  图像 {report['图像']}  耗时 {report['耗时']:.2f} s  {report['图像/秒']:.1f} 图像/秒")
+    for stage, seconds in report['各阶段'].items():
+        print(f"  {stage}: {seconds:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
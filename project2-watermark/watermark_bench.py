@@ -0,0 +1,242 @@
+import os
+import time
+import tempfile
+import cv2
+import numpy as np
+import pywt
+import watermark
+
+SIZES = {'512²': (512, 512), '2048²': (2048, 2048), '8K': (4320, 7680)}
+
+
+def _host(shape, seed=0):
+    #平滑的随机灰度图，代替真实载体
+    noise = np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (9, 9), 3)
+
+
+def _mark(seed=1):
+    return np.random.default_rng(seed).integers(0, 256, (watermark.WATERMARK_H, watermark.WATERMARK_W), dtype=np.uint8)
+
+
+def _legacy_insert(embedder, carrier_img, wm_img):
+    #原实现：逐位4次randint、两次cv2.dct/cv2.idct，仅作对照与逐位一致性检查
+    wm_bits = embedder._preprocess_watermark(wm_img)
+    low_pass_ll, (high_pass_lh, high_pass_hl, high_pass_hh) = pywt.dwt2(carrier_img, 'haar')
+    embedding_h, embedding_w = watermark._embedding_region(*high_pass_lh.shape)
+    np.random.seed(watermark.RANDOM_SEED)
+    for bit_value in wm_bits:
+        rh_lh, rw_lh = np.random.randint(0, embedding_h - 1), np.random.randint(0, embedding_w - 1)
+        rh_hl, rw_hl = np.random.randint(0, embedding_h - 1), np.random.randint(0, embedding_w - 1)
+        block_lh = cv2.dct(np.float32(high_pass_lh[rh_lh:rh_lh + 2, rw_lh:rw_lh + 2]))
+        block_hl = cv2.dct(np.float32(high_pass_hl[rh_hl:rh_hl + 2, rw_hl:rw_hl + 2]))
+        sign = 1 if bit_value == 1 else -1
+        block_lh[0, 1] += sign * embedder.strength
+        block_hl[1, 0] += sign * embedder.strength
+        high_pass_lh[rh_lh:rh_lh + 2, rw_lh:rw_lh + 2] = cv2.idct(block_lh)
+        high_pass_hl[rh_hl:rh_hl + 2, rw_hl:rw_hl + 2] = cv2.idct(block_hl)
+    final_image = pywt.idwt2((low_pass_ll, (high_pass_lh, high_pass_hl, high_pass_hh)), 'haar')
+    return np.clip(final_image, 0, 255).astype(np.uint8)
+
+
+def _legacy_retrieve(embedder, watermarked_img):
+    _, (high_pass_lh, high_pass_hl, _) = pywt.dwt2(watermarked_img, 'haar')
+    embedding_h, embedding_w = watermark._embedding_region(*high_pass_lh.shape)
+    bits = np.zeros(watermark.WATERMARK_W * watermark.WATERMARK_H, dtype=np.float32)
+    np.random.seed(watermark.RANDOM_SEED)
+    for i in range(bits.size):
+        rh_lh, rw_lh = np.random.randint(0, embedding_h - 1), np.random.randint(0, embedding_w - 1)
+        rh_hl, rw_hl = np.random.randint(0, embedding_h - 1), np.random.randint(0, embedding_w - 1)
+        block_lh = cv2.dct(np.float32(high_pass_lh[rh_lh:rh_lh + 2, rw_lh:rw_lh + 2]))
+        block_hl = cv2.dct(np.float32(high_pass_hl[rh_hl:rh_hl + 2, rw_hl:rw_hl + 2]))
+        bits[i] = 1 if (block_lh[0, 1] + block_hl[1, 0]) / 2.0 > 0 else 0
+    return bits.reshape(watermark.WATERMARK_H, watermark.WATERMARK_W).astype(np.uint8) * 255
+
+
+def _timed(fn, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def bench_blocks(sizes=tuple(SIZES), repeat=3):
+    print("--- 单张图像嵌入/提取耗时：逐位cv2.dct（原实现） vs 向量化2x2块DCT ---")
+    embedder = watermark.DwtDctEmbedder()
+    wm = _mark()
+    for name in sizes:
+        host = _host(SIZES[name])
+        _, dwt_t = _timed(pywt.dwt2, host, 'haar', repeat=repeat)
+        old, old_embed = _timed(_legacy_insert, embedder, host, wm, repeat=repeat)
+        new, new_embed = _timed(embedder.insert_watermark, host, wm, repeat=repeat)
+        assert np.array_equal(old, new), "嵌入结果与原实现不一致"
+        old_wm, old_extract = _timed(_legacy_retrieve, embedder, new, repeat=repeat)
+        new_wm, new_extract = _timed(embedder.retrieve_watermark, new, repeat=repeat)
+        assert np.array_equal(old_wm, new_wm), "提取结果与原实现不一致"
+        print(f"{name:<6} 嵌入 {old_embed * 1e3:8.1f} -> {new_embed * 1e3:8.1f} ms  "
+              f"提取 {old_extract * 1e3:8.1f} -> {new_extract * 1e3:8.1f} ms  (一次整图DWT {dwt_t * 1e3:6.1f} ms)")
+
+
+def _naive_batch(jobs, out_dir):
+    #对照：每个接收者都重新解码载体并调用insert_watermark，顺序执行
+    import watermark_batch
+    embedder = watermark.DwtDctEmbedder()
+    count = 0
+    for image_path, recipients in jobs:
+        for recipient_id, _ in recipients:
+            image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+            h, w = image.shape[:2]
+            image[:, :, 0] = embedder.insert_watermark(image[:, :, 0], watermark_batch.recipient_watermark(recipient_id))[:h, :w]
+            path = watermark_batch._output_path(out_dir, image_path, recipient_id, '.png')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            cv2.imwrite(path, image)
+            count += 1
+    return count
+
+
+def bench_batch(hosts=8, recipients=16, shape=(1080, 1920), workers=(0, 1, 2)):
+    print(f"--- 批量加水印：{hosts}幅{shape[1]}x{shape[0]}载体 × {recipients}个接收者 ---")
+    import watermark_batch
+    path = tempfile.mkdtemp()
+    host_dir = os.path.join(path, 'hosts')
+    os.makedirs(host_dir)
+    for i in range(hosts):
+        cv2.imwrite(os.path.join(host_dir, f"host{i}.jpg"), cv2.merge([_host(shape, seed=3 * i + c) for c in range(3)]))
+    jobs = watermark_batch.directory_jobs(host_dir, [f"recipient{i}" for i in range(recipients)])
+    start = time.perf_counter()
+    count = _naive_batch(jobs, os.path.join(path, 'naive'))
+    naive = time.perf_counter() - start
+    print(f"逐张insert_watermark     {count / naive:8.1f} 图像/秒")
+    print(f"本机CPU核数 {os.cpu_count()}")
+    for w in workers:
+        report = watermark_batch.run_batch(jobs, os.path.join(path, f"out{w}"), workers=w)
+        assert report['图像'] == count
+        stages = '  '.join(f"{k} {v:.2f}s" for k, v in report['各阶段'].items())
+        label = "单进程流水线" if w == 0 else f"{w}个工作进程"
+        print(f"{label:<12} 复用DWT {report['图像/秒']:8.1f} 图像/秒  ({stages})")
+
+
+def bench_registry(sizes=(10 ** 4, 10 ** 5, 10 ** 6), queries=50, bers=(0.1, 0.3)):
+    print(f"--- 泄露溯源：在n个接收者中查找与带噪提取水印最近的（top-5，每组{queries}次查询） ---")
+    import leak_registry
+    from watermark_batch import recipient_watermark
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        registry = leak_registry.RecipientRegistry()
+        start = time.perf_counter()
+        registry.add_many(f"recipient{i}" for i in range(n))
+        registry.search(recipient_watermark("recipient0"))
+        build = time.perf_counter() - start
+        for ber in bers:
+            targets = [f"recipient{i}" for i in rng.integers(0, n, queries)]
+            noisy = [leak_registry.mark_bits(recipient_watermark(t)) ^ (rng.random(leak_registry.MARK_BITS) < ber)
+                     for t in targets]
+            row, hits = [], []
+            for exhaustive in (True, False):
+                start = time.perf_counter()
+                results = [registry.search(q, k=5, exhaustive=exhaustive) for q in noisy]
+                row.append((time.perf_counter() - start) / queries)
+                hits.append(sum(r[0].recipient_id == t for r, t in zip(results, targets)))
+            confidence = np.mean([r[0].confidence for r in results])
+            print(f"n={n:<8} BER {ber:.2f}  全量扫描 {row[0] * 1e3:8.2f} ms 命中 {hits[0]}/{queries}  "
+                  f"MIH {row[1] * 1e3:8.2f} ms 命中 {hits[1]}/{queries}  平均置信度 {confidence:.4f}  "
+                  f"(登记+建索引 {build:.1f} s)")
+
+
+def bench_robustness(shape=(1024, 1024), workers=(0, 1, 2)):
+    print(f"--- 鲁棒性基准：{shape[1]}x{shape[0]}彩色载体上的完整参数扫描 ---")
+    import watermark_robustness
+    host = cv2.merge([_host(shape, seed=c) for c in range(3)])
+    print(f"本机CPU核数 {os.cpu_count()}")
+    rows = None
+    for w in workers:
+        report = watermark_robustness.run_benchmark(host, _mark(), workers=w)
+        meta = report['meta']
+        label = "单进程顺序" if w == 0 else f"{w}个工作进程"
+        print(f"{label:<10} {len(report['results'])}个用例 {meta['seconds']:6.2f} s  {meta['cases_per_sec']:5.1f} 用例/秒")
+        rows = report['results']
+    robust = [r['case'] for r in rows if r['ber'] < 10]
+    print(f"BER < 10% 的用例: {', '.join(robust)}")
+
+
+def _peak_rss(mode, src, dst, queue):
+    #在新进程中运行，回传(耗时, 峰值常驻内存MB)；mode为idle（只导入）、full（整幅载入）或tiled（分块）
+    #ru_maxrss在exec后仍保留父进程的峰值，改读本进程的VmHWM
+    import watermark_tiled
+    start = time.perf_counter()
+    if mode == 'full':
+        host = np.load(src)
+        np.save(dst, watermark.DwtDctEmbedder().insert_watermark(host, _mark())[:host.shape[0], :host.shape[1]])
+    elif mode == 'tiled':
+        watermark_tiled.embed_file(src, dst, _mark())
+    with open('/proc/self/status') as f:
+        peak = next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+    queue.put((time.perf_counter() - start, peak / 1024))
+
+
+def bench_tiled(shape=(8192, 8192), damaged=0.25):
+    print(f"--- 分块内存映射嵌入：{shape[1]}x{shape[0]}灰度载体（.npy） ---")
+    import multiprocessing
+    import watermark_tiled
+    #临时目录连同其中的.npy（载体与两份输出）在结束时删除
+    with tempfile.TemporaryDirectory() as path:
+        src = os.path.join(path, 'host.npy')
+        host = np.lib.format.open_memmap(src, mode='w+', dtype=np.uint8, shape=shape)
+        for i, r in enumerate(range(0, shape[0], watermark_tiled.TILE)):
+            host[r:r + watermark_tiled.TILE] = _host((min(watermark_tiled.TILE, shape[0] - r), shape[1]), seed=i)
+        host.flush()
+        del host
+        ctx = multiprocessing.get_context('spawn')
+        for mode in ('idle', 'tiled', 'full'):
+            queue = ctx.Queue()
+            child = ctx.Process(target=_peak_rss, args=(mode, src, os.path.join(path, f"{mode}.npy"), queue))
+            child.start()
+            child.join()
+            if child.exitcode:
+                print(f"{mode:<6} 失败（退出码 {child.exitcode}，可能是内存不足）")
+                continue
+            seconds, rss = queue.get()
+            speed = '' if mode == 'idle' else f"{seconds:6.2f} s  {shape[0] * shape[1] / 1e6 / seconds:6.1f} 百万像素/秒  "
+            print(f"{mode:<6} {speed}峰值常驻内存 {rss:8.1f} MB")
+        out = np.load(os.path.join(path, 'tiled.npy'), mmap_mode='r+')
+        truth = (_mark() > 127).astype(np.uint8)
+        tiles = list(watermark_tiled.tile_grid(shape))
+        rng = np.random.default_rng(0)
+        for _, _, r0, r1, c0, c1 in [tiles[k] for k in rng.choice(len(tiles), int(len(tiles) * damaged), replace=False)]:
+            out[r0:r1, c0:c1] = rng.integers(0, 256, (r1 - r0, c1 - c0), dtype=np.uint8)
+        start = time.perf_counter()
+        bers = [watermark.evaluate_performance(truth, m // 255)[1] for *_, m in watermark_tiled.tile_marks(out)]
+        voted = watermark.evaluate_performance(truth, watermark_tiled.retrieve_tiled(out) // 255)[1]
+        print(f"{len(tiles)}块中{int(len(tiles) * damaged)}块被噪声替换：单块BER中位数 {np.median(bers):.2f}%  "
+              f"最差 {max(bers):.2f}%  表决后 {voted:.2f}%  (两次提取 {time.perf_counter() - start:.2f} s)")
+
+        del out  #删除目录前释放映射
+
+BENCHES = {
+    'blocks': bench_blocks,
+    'batch': bench_batch,
+    'registry': bench_registry,
+    'robustness': bench_robustness,
+    'tiled': bench_tiled,
+}
+
+
+def main_cli():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('names', nargs='*', help=f"要运行的测试 {list(BENCHES)}，默认全部运行")
+    parser.add_argument('--sizes', nargs='+', default=list(SIZES), choices=list(SIZES), help="图像尺寸")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHES)
+    if unknown: parser.error(f"未知测试: {sorted(unknown)}")
+    for name in args.names or list(BENCHES):
+        if name == 'blocks':
+            bench_blocks(args.sizes)
+        else:
+            BENCHES[name]()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,238 @@
+import os
+import csv
+import json
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from skimage.metrics import peak_signal_noise_ratio as psnr, structural_similarity as ssim
+from watermark import DwtDctEmbedder, EMBED_STRENGTH, WATERMARK_W, WATERMARK_H, evaluate_performance
+
+# 水印鲁棒性基准：对带水印图像施加一组参数化攻击（可组合），并行地提取水印并统计
+# BER、准确率、PSNR、SSIM（攻击后图像相对带水印图像）以及攻击/提取耗时。
+# 用例写作 "攻击:参数"，多个攻击以+串联，如 "jpeg:50+noise:5"；结果保存在内存中，
+# 可写为CSV或JSON报告，也可选择把攻击后的图像与提取出的水印写入目录。
+
+
+def _rotate(img, angle):
+    h, w = img.shape[:2]
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(img, matrix, (w, h))
+
+
+def _crop(img, ratio):
+    #保留中心ratio比例的区域并缩放回原尺寸
+    h, w = img.shape[:2]
+    top, left = int(h * (1 - ratio) / 2), int(w * (1 - ratio) / 2)
+    return cv2.resize(img[top:h - top, left:w - left], (w, h))
+
+
+def _jpeg(img, quality):
+    ok, encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    return cv2.imdecode(encoded, cv2.IMREAD_UNCHANGED)
+
+
+def _noise(img, sigma, seed=0):
+    noise = np.random.default_rng(seed).normal(0, sigma, img.shape).astype(np.float32)
+    return np.clip(img.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+
+
+def _scale(img, factor):
+    #缩放后再缩放回原尺寸
+    h, w = img.shape[:2]
+    small = cv2.resize(img, (max(1, round(w * factor)), max(1, round(h * factor))))
+    return cv2.resize(small, (w, h))
+
+
+def _translate(img, shift):
+    h, w = img.shape[:2]
+    return cv2.warpAffine(img, np.float32([[1, 0, shift], [0, 1, shift]]), (w, h))
+
+
+def _contrast(img, alpha):
+    #参数只控制alpha，亮度偏移beta固定为10（与原main_execution_flow一致）
+    return cv2.convertScaleAbs(img, alpha=alpha, beta=10)
+
+
+def _flip(img, code):
+    return cv2.flip(img, int(code))
+
+
+ATTACKS = {
+    'rotate': _rotate,
+    'crop': _crop,
+    'jpeg': _jpeg,
+    'noise': _noise,
+    'scale': _scale,
+    'translate': _translate,
+    'contrast': _contrast,
+    'flip': _flip,
+}
+
+# 原main_execution_flow中的五种攻击；contrast:a 为 alpha=a、beta=10 的线性变换，beta不在用例语法中
+BASIC_CASES = ['flip:1', 'translate:10', 'crop:0.8', 'contrast:1.5', 'noise:15']
+
+# 默认参数扫描
+SWEEP = (BASIC_CASES
+         + [f'rotate:{a}' for a in (1, 5, 15, 45)]
+         + [f'crop:{r}' for r in (0.9, 0.7, 0.5)]
+         + [f'jpeg:{q}' for q in (90, 70, 50, 30)]
+         + [f'noise:{s}' for s in (5, 30)]
+         + [f'scale:{f}' for f in (0.5, 0.75, 1.5)]
+         + ['jpeg:75+noise:5', 'rotate:5+crop:0.9', 'scale:0.5+jpeg:70'])
+
+FIELDS = ('case', 'ber', 'accuracy', 'psnr', 'ssim', 'attack_ms', 'extract_ms')
+
+
+def parse_case(case):
+    """'jpeg:50+noise:5' -> [('jpeg', 50.0), ('noise', 5.0)]"""
+    steps = []
+    for part in case.split('+'):
+        name, _, value = part.strip().partition(':')
+        if name not in ATTACKS: raise ValueError(f"未知的攻击: {name}")
+        try:
+            steps.append((name, float(value)))
+        except ValueError:
+            raise ValueError(f"用例格式错误: {part}") from None
+    return steps
+
+
+def apply_case(img, case):
+    for name, value in parse_case(case):
+        img = ATTACKS[name](img, value)
+    return img
+
+
+def _similarity(reference, img):
+    if reference.shape != img.shape: return math.nan, math.nan
+    channel_axis = 2 if img.ndim == 3 else None
+    return (psnr(reference, img, data_range=255),
+            ssim(reference, img, data_range=255, channel_axis=channel_axis))
+
+
+_STATE = {}
+
+
+def _init_worker(watermarked, true_wm, strength, channel, dump_dir):
+    #进程池初始化：带水印图像与真值水印每个进程只传一次
+    _STATE.update(watermarked=watermarked, true_wm=true_wm, embedder=DwtDctEmbedder(strength),
+                  channel=channel, dump_dir=dump_dir)
+
+
+def _run_case(case):
+    state = _STATE
+    watermarked = state['watermarked']
+    start = time.perf_counter()
+    attacked = apply_case(watermarked, case)
+    attack_t = time.perf_counter() - start
+    start = time.perf_counter()
+    carrier = attacked if attacked.ndim == 2 else attacked[:, :, state['channel']]
+    retrieved = state['embedder'].retrieve_watermark(carrier)
+    extract_t = time.perf_counter() - start
+    accuracy, ber_rate = evaluate_performance(state['true_wm'], (retrieved > 127).astype(np.uint8))
+    psnr_value, ssim_value = _similarity(watermarked, attacked)
+    if state['dump_dir']:
+        name = case.replace(':', '_').replace('+', '__')
+        cv2.imwrite(os.path.join(state['dump_dir'], f"attacked_{name}.png"), attacked)
+        cv2.imwrite(os.path.join(state['dump_dir'], f"extracted_{name}.png"), retrieved)
+    return {'case': case, 'ber': float(ber_rate), 'accuracy': float(accuracy), 'psnr': float(psnr_value),
+            'ssim': float(ssim_value), 'attack_ms': attack_t * 1e3, 'extract_ms': extract_t * 1e3}
+
+
+def run_benchmark(host, wm_img, cases=SWEEP, workers=0, strength=EMBED_STRENGTH, channel=0, dump_dir=None):
+    """
+    嵌入一次水印后运行全部用例，返回报告字典：
+    meta（嵌入耗时、嵌入后PSNR/SSIM、总耗时、用例/秒）与results（每个用例一行，字段见FIELDS）。
+    """
+    for case in cases: parse_case(case)
+    embedder = DwtDctEmbedder(strength)
+    start = time.perf_counter()
+    carrier = host if host.ndim == 2 else host[:, :, channel]
+    h, w = carrier.shape
+    marked = embedder.insert_watermark(carrier, wm_img)[:h, :w]
+    if host.ndim == 2:
+        watermarked = marked
+    else:
+        watermarked = host.copy()
+        watermarked[:, :, channel] = marked
+    embed_t = time.perf_counter() - start
+    true_wm = (cv2.resize(wm_img, (WATERMARK_W, WATERMARK_H)) > 127).astype(np.uint8)
+    if dump_dir:
+        os.makedirs(dump_dir, exist_ok=True)
+        cv2.imwrite(os.path.join(dump_dir, "watermarked.png"), watermarked)
+    start = time.perf_counter()
+    args = (watermarked, true_wm, strength, channel, dump_dir)
+    if not workers:
+        _init_worker(*args)
+        results = [_run_case(case) for case in cases]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=args) as pool:
+            results = list(pool.map(_run_case, cases))
+    elapsed = time.perf_counter() - start
+    embed_psnr, embed_ssim = _similarity(host, watermarked)
+    meta = {'shape': list(host.shape), 'strength': strength, 'workers': workers, 'embed_ms': embed_t * 1e3,
+            'embed_psnr': float(embed_psnr), 'embed_ssim': float(embed_ssim), 'seconds': elapsed,
+            'cases_per_sec': len(cases) / elapsed if elapsed else 0.0}
+    return {'meta': meta, 'results': results}
+
+
+def _finite(value):
+    #JSON不支持inf/nan（如未受攻击时PSNR为inf），写为null
+    return value if not isinstance(value, float) or math.isfinite(value) else None
+
+
+def write_report(report, path):
+    """按扩展名写出.json（含meta）或.csv（每个用例一行）"""
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            for row in report['results']:
+                writer.writerow({k: f"{v:.4f}" if isinstance(v, float) else v for k, v in row.items()})
+    else:
+        clean = {'meta': {k: _finite(v) for k, v in report['meta'].items()},
+                 'results': [{k: _finite(v) for k, v in row.items()} for row in report['results']]}
+        with open(path, 'w') as f:
+            json.dump(clean, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="水印鲁棒性基准测试")
+    parser.add_argument('--host', default="host.jpg")
+    parser.add_argument('--watermark', default="watermark.jpg", help="水印图像；给出--recipient时忽略")
+    parser.add_argument('--recipient', help="使用由接收者ID导出的水印")
+    parser.add_argument('--cases', nargs='+', default=None, help="用例，如 rotate:5 jpeg:50+noise:5；默认为完整扫描")
+    parser.add_argument('--basic', action='store_true', help="只运行原有的五种攻击")
+    parser.add_argument('--workers', type=int, default=0)
+    parser.add_argument('--strength', type=float, default=EMBED_STRENGTH)
+    parser.add_argument('--out', help="报告路径（.json或.csv）")
+    parser.add_argument('--dump', help="写出攻击后图像与提取水印的目录")
+    args = parser.parse_args()
+    cases = args.cases or (BASIC_CASES if args.basic else SWEEP)
+    try:
+        for case in cases: parse_case(case)
+    except ValueError as e:
+        parser.error(str(e))
+    host = cv2.imread(args.host, cv2.IMREAD_COLOR)
+    if args.recipient:
+        from watermark_batch import recipient_watermark
+        wm_img = recipient_watermark(args.recipient)
+    else:
+        wm_img = cv2.imread(args.watermark, cv2.IMREAD_GRAYSCALE)
+    if host is None or wm_img is None:
+        print("错误：无法加载图像文件，请检查路径。")
+        return
+    report = run_benchmark(host, wm_img, cases, args.workers, args.strength, dump_dir=args.dump)
+    meta = report['meta']
+    print(f"嵌入 {meta['embed_ms']:.1f} ms  PSNR {meta['embed_psnr']:.2f} dB  SSIM {meta['embed_ssim']:.4f}")
+    for row in report['results']:
+        print(f"{row['case']:<20} BER {row['ber']:6.2f}%  PSNR {row['psnr']:6.2f} dB  SSIM {row['ssim']:.4f}  "
+              f"攻击 {row['attack_ms']:7.1f} ms  提取 {row['extract_ms']:6.1f} ms")
+    print(f"{len(cases)}个用例 {meta['seconds']:.2f} s  {meta['cases_per_sec']:.1f} 用例/秒")
+    if args.out: write_report(report, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import mmap
+import time
+import hashlib
+import numpy as np
+from watermark import DwtDctEmbedder, EMBED_STRENGTH, RANDOM_SEED, WATERMARK_W, WATERMARK_H, _embedding_region
+
+# 分块加水印：面向无法整幅载入内存的超大图像（扫描件、卫星图块）。
+# 源图像可以是np.memmap、np.load(..., mmap_mode='r')，或任何支持shape与[r0:r1, c0:c1]切片的分块读取器；
+# 输出是同尺寸、支持切片赋值的数组，通常是np.lib.format.open_memmap创建的.npy。
+# 每块独立做DWT并嵌入一份完整水印，嵌入坐标的种子由块号导出，各块布局互不相同；输出逐块写入，
+# 写完一块即把映射中对应行的页写回并交还内核，常驻内存只取决于块大小，与图像尺寸无关。
+# 提取时每块各取出一份水印，逐位多数表决，部分块被破坏时仍可恢复。
+#
+# 块的起点都是偶数，块内的Haar分解与对整幅图像分解的结果一致；最后一块不足半块时并入前一块。
+
+TILE = 1024  #默认块边长（像素）
+
+
+def _tile_edges(n, tile):
+    #沿一个方向的分块边界
+    starts = list(range(0, n, tile))
+    if len(starts) > 1 and n - starts[-1] < tile // 2: starts.pop()
+    return starts + [n]
+
+
+def tile_grid(shape, tile=TILE):
+    """按行优先顺序给出每块的(块行号, 块列号, r0, r1, c0, c1)"""
+    if tile % 2 or tile < 2 * max(WATERMARK_H, WATERMARK_W): raise ValueError("块边长须为偶数且不小于水印尺寸的两倍")
+    rows, cols = _tile_edges(shape[0], tile), _tile_edges(shape[1], tile)
+    for i, (r0, r1) in enumerate(zip(rows, rows[1:])):
+        for j, (c0, c1) in enumerate(zip(cols, cols[1:])):
+            yield i, j, r0, r1, c0, c1
+
+
+def _tile_seed(seed, i, j):
+    #每块嵌入坐标的种子，np.random.seed要求小于2**32
+    digest = hashlib.sha256(f"{seed}:{i}:{j}".encode()).digest()
+    return int.from_bytes(digest[:4], 'little')
+
+
+def _can_embed(h, w):
+    #子带（尺寸为块的一半，向上取整）中须容得下水印
+    return all(_embedding_region((h + 1) // 2, (w + 1) // 2))
+
+
+def _release(array, r0, r1):
+    """
+    把memmap第r0..r1行所在的页写回文件，并从本进程的映射中丢弃；
+    之后再访问会从文件（页缓存）重新读入。不是memmap、或是写时复制（mode='c'）的映射时什么也不做。
+    """
+    mm = getattr(array, '_mmap', None)
+    if mm is None or array.base is not mm or array.mode == 'c' or not array.flags.c_contiguous: return
+    skip = array.offset % mmap.ALLOCATIONGRANULARITY  #映射从对齐的位置开始
+    start, end = skip + r0 * array.strides[0], skip + r1 * array.strides[0]
+    start -= start % mmap.PAGESIZE
+    end = min(len(mm), end - end % -mmap.PAGESIZE)
+    if array.flags.writeable: mm.flush(start, end - start)
+    if hasattr(mm, 'madvise'): mm.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+
+def embed_tiled(source, out, wm_img, tile=TILE, strength=EMBED_STRENGTH, channel=0, seed=RANDOM_SEED):
+    """
+    逐块读出source、嵌入水印并写入out，返回嵌入了水印的块数。
+    彩色图像只在channel通道嵌入；太小而容不下水印的块原样复制。
+    """
+    if tuple(source.shape) != tuple(out.shape): raise ValueError("输出与源图像的尺寸不一致")
+    if source.dtype != np.uint8: raise ValueError("只支持uint8图像")
+    embedder = DwtDctEmbedder(strength)
+    marked = 0
+    for i, j, r0, r1, c0, c1 in tile_grid(source.shape[:2], tile):
+        block = np.array(source[r0:r1, c0:c1])
+        carrier = block if block.ndim == 2 else block[:, :, channel]
+        h, w = carrier.shape
+        if _can_embed(h, w):
+            carrier[...] = embedder.insert_watermark(carrier, wm_img, _tile_seed(seed, i, j))[:h, :w]
+            marked += 1
+        out[r0:r1, c0:c1] = block
+        _release(out, r0, r1)
+        _release(source, r0, r1)
+    return marked
+
+
+def tile_marks(source, tile=TILE, strength=EMBED_STRENGTH, channel=0, seed=RANDOM_SEED):
+    """
+    逐块提取水印，产生(块行号, 块列号, 32x32水印)。
+    memmap上的块是视图，提取只读取嵌入块所在的像素，不会读入整块。
+    """
+    embedder = DwtDctEmbedder(strength)
+    for i, j, r0, r1, c0, c1 in tile_grid(source.shape[:2], tile):
+        view = source[r0:r1, c0:c1]
+        carrier = view if view.ndim == 2 else view[:, :, channel]
+        if not _can_embed(*carrier.shape): continue
+        yield i, j, embedder.retrieve_watermark(carrier, _tile_seed(seed, i, j))
+        _release(source, r0, r1)
+
+
+def retrieve_tiled(source, tile=TILE, strength=EMBED_STRENGTH, channel=0, seed=RANDOM_SEED):
+    """
+    各块提取结果逐位多数表决，得票恰好一半时取0；返回与retrieve_watermark相同形式的水印（0/255）
+    """
+    votes = np.zeros((WATERMARK_H, WATERMARK_W), dtype=np.int64)
+    count = 0
+    for _, _, mark in tile_marks(source, tile, strength, channel, seed):
+        votes += mark > 127
+        count += 1
+    if not count: raise ValueError("图像太小，没有可提取水印的块")
+    return (2 * votes > count).astype(np.uint8) * 255
+
+
+def embed_file(src_path, dst_path, wm_img, **kwargs):
+    """
+    .npy文件之间的分块嵌入：源文件以只读方式映射，输出文件按源的形状和类型创建后逐块写入。
+    其余参数同embed_tiled。
+    """
+    source = np.load(src_path, mmap_mode='r')
+    out = np.lib.format.open_memmap(dst_path, mode='w+', dtype=source.dtype, shape=source.shape)
+    try:
+        return embed_tiled(source, out, wm_img, **kwargs)
+    finally:
+        out.flush()
+
+
+def main():
+    import argparse
+    import cv2
+    parser = argparse.ArgumentParser(description="超大图像的分块水印嵌入与提取（.npy文件，内存映射）")
+    parser.add_argument('mode', choices=['embed', 'extract'])
+    parser.add_argument('source', help="源.npy文件，形状为(高, 宽)或(高, 宽, 通道)")
+    parser.add_argument('--out', help="embed：输出.npy；extract：提取出的水印图像")
+    parser.add_argument('--watermark', help="水印图像（embed时必需，extract时用于计算BER）")
+    parser.add_argument('--recipient', help="使用由接收者ID导出的水印，代替--watermark")
+    parser.add_argument('--tile', type=int, default=TILE)
+    parser.add_argument('--strength', type=float, default=EMBED_STRENGTH)
+    parser.add_argument('--channel', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=RANDOM_SEED)
+    args = parser.parse_args()
+    wm_img = None
+    if args.recipient:
+        from watermark_batch import recipient_watermark
+        wm_img = recipient_watermark(args.recipient)
+    elif args.watermark:
+        wm_img = cv2.imread(args.watermark, cv2.IMREAD_GRAYSCALE)
+        if wm_img is None: parser.error(f"无法读取水印图像: {args.watermark}")
+    options = dict(tile=args.tile, strength=args.strength, channel=args.channel, seed=args.seed)
+    start = time.perf_counter()
+    if args.mode == 'embed':
+        if wm_img is None or not args.out: parser.error("embed需要--out以及--watermark或--recipient")
+        marked = embed_file(args.source, args.out, wm_img, **options)
+        elapsed = time.perf_counter() - start
+        shape = np.load(args.source, mmap_mode='r').shape
+        print(f"{marked}块已嵌入  {elapsed:.2f} s  {shape[0] * shape[1] / 1e6 / elapsed:.1f} 百万像素/秒")
+    else:
+        retrieved = retrieve_tiled(np.load(args.source, mmap_mode='r'), **options)
+        print(f"提取完成 {time.perf_counter() - start:.2f} s")
+        if wm_img is not None:
+            from watermark import evaluate_performance
+            true_wm = (cv2.resize(wm_img, (WATERMARK_W, WATERMARK_H)) > 127).astype(np.uint8)
+            accuracy, ber_rate = evaluate_performance(true_wm, (retrieved > 127).astype(np.uint8))
+            print(f"准确率={accuracy:.2f}%, 误码率（BER）={ber_rate:.2f}%")
+        if args.out: cv2.imwrite(args.out, retrieved)
+
+
+if __name__ == "__main__":
+    main()
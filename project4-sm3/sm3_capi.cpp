@@ -0,0 +1,64 @@
+//SM3压缩函数的C接口，供Python(ctypes)调用
+//编译：g++ -O3 -shared -fPIC -o libsm3.so sm3_capi.cpp
+//复用SM3_optimazation.cpp中的消息扩展与压缩函数；其中的演示main()改名以免冲突。
+//注意：该文件的SmState默认常量与并行合并方式不符合标准，这里显式使用标准IV与Tj，并严格按分组顺序迭代。
+#include <cstdint>
+#include <cstring>
+
+#define main sm3_optimazation_demo_main
+#include "SM3_optimazation.cpp"
+#undef main
+
+static const uint32_t SM3_IV[8] = {
+    0x7380166FU, 0x4914B2B9U, 0x172442D7U, 0xDA8A0600U,
+    0xA96F30BCU, 0x163138AAU, 0xE38DEE4DU, 0xB0FB0E4EU,
+};
+
+extern "C" {
+
+//用标准IV初始化8个字的状态
+void sm3_init(uint32_t* state) {
+    std::memcpy(state, SM3_IV, sizeof(SM3_IV));
+}
+
+//依次压缩nblocks个64字节分组，state原地更新
+void sm3_compress_blocks(uint32_t* state, const unsigned char* data, size_t nblocks) {
+    SmState ctx;
+    ctx.t0 = 0x79CC4519U;
+    ctx.t1 = 0x7A879D8AU;
+    std::memcpy(ctx.v, state, sizeof(ctx.v));
+    std::vector<unsigned int> w(68), w1(64);
+    for (size_t i = 0; i < nblocks; ++i) {
+        expand_message(data + i * 64, w, w1);
+        compress_block(ctx, w, w1);
+    }
+    std::memcpy(state, ctx.v, sizeof(ctx.v));
+}
+
+//一次性计算SM3摘要，out为32字节
+void sm3_digest(const unsigned char* data, size_t len, unsigned char* out) {
+    uint32_t state[8];
+    sm3_init(state);
+    size_t full = len / 64;
+    sm3_compress_blocks(state, data, full);
+
+    unsigned char tail[128] = {0};
+    size_t rest = len - full * 64;
+    std::memcpy(tail, data + full * 64, rest);
+    tail[rest] = 0x80;
+    size_t tail_len = (rest + 1 + 8 <= 64) ? 64 : 128;
+    uint64_t bits = static_cast<uint64_t>(len) * 8;
+    for (int i = 0; i < 8; ++i) {
+        tail[tail_len - 1 - i] = static_cast<unsigned char>(bits >> (i * 8));
+    }
+    sm3_compress_blocks(state, tail, tail_len / 64);
+
+    for (int i = 0; i < 8; ++i) {
+        out[i * 4] = static_cast<unsigned char>(state[i] >> 24);
+        out[i * 4 + 1] = static_cast<unsigned char>(state[i] >> 16);
+        out[i * 4 + 2] = static_cast<unsigned char>(state[i] >> 8);
+        out[i * 4 + 3] = static_cast<unsigned char>(state[i]);
+    }
+}
+
+}
@@ -1,6 +1,8 @@
 import secrets
 import binascii
-from gmssl import sm3, func
+from sm3_backend import sm3_digest
+from sm2_curve import scalar_mult, g_mult, g_table, multi_scalar_mul, pippenger_msm_jac, jac_add, lift_x, to_affine, batch_to_affine
+from sm2_cache import make_cache, PublicKeyTables
 
 C1 = 0x787968B4FA32C3FD2417842E73BBFEFF2F3C848B6831D7E0EC65228B3937E498
 C2 = 0x63E4C6D3B23B0C849CF84241484BFE48F61D59A5B16BA06E6E12D1DA27C5249A
@@ -9,6 +11,12 @@ C4 = 0x8542D69E4C044F18E8B92435BF6FF7DD297720630485628D5AE74EE7C32E79B7
 C5 = 0x421DEBD61B62EAB6746434EBC3CC315E32220B3BADD50BDC4C4E6C147FEDD43D
 C6 = 0x0680512BCBB42C07D47349D2153B70C4E5D7FDFCBFA36EA1A85841B9E46E09A2
 G = (C5, C6)
+BATCH_SECURITY = 128
+ZA_CACHE_SIZE = 4096
+
+#(uid, 公钥) -> ZA；公钥预计算表默认关闭，由enable_pk_tables()开启
+_ZA_CACHE = make_cache('sm2.za', ZA_CACHE_SIZE)
+_PK_TABLES = None
 
 def _x_op(x, y):
     if len(x) != len(y):
@@ -18,6 +26,10 @@ def _x_op(x, y):
         r |= a ^ b
     return r == 0
 
+def _xor_op(data, key):
+    n = len(data)
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(key, 'big')).to_bytes(n, 'big')
+
 def _y_op(v, m):
     if v == 0: return 0
     x, y, a, b = 1, 0, v % m, m
@@ -43,12 +55,96 @@ def _z_op(p1, p2):
 def _a_op(k, p):
     if not 0 < k < C4:
         raise ValueError("error")
-    r, cp = (0, 0), p
-    while k:
-        if k & 1: r = _z_op(r, cp)
-        cp = _z_op(cp, cp)
-        k >>= 1
-    return r
+    if p == G: return g_mult(k)
+    return scalar_mult(k, p)
+
+def enable_pk_tables(capacity=64, min_uses=8):
+    global _PK_TABLES
+    _PK_TABLES = PublicKeyTables(capacity, min_uses) if capacity else None
+
+def cache_stats():
+    return {
+        'za': _ZA_CACHE.stats(),
+        'pk_tables': _PK_TABLES.stats() if _PK_TABLES else None,
+    }
+
+def _za_op(uid_str, p_x, p_y):
+    key = (uid_str, p_x, p_y)
+    h = _ZA_CACHE.get(key)
+    if h is not None: return h
+    uid_b = uid_str.encode('utf-8')
+    l_uid = len(uid_b) * 8
+    d_hash = b''.join([
+        l_uid.to_bytes(2, 'big'), uid_b,
+        C1.to_bytes(32, 'big'), C2.to_bytes(32, 'big'),
+        C5.to_bytes(32, 'big'), C6.to_bytes(32, 'big'),
+        p_x.to_bytes(32, 'big'), p_y.to_bytes(32, 'big')
+    ])
+    h = sm3_digest(d_hash)
+    _ZA_CACHE.put(key, h)
+    return h
+
+def _e_op(msg_str, user_id, p_key):
+    h = _za_op(user_id, p_key[0], p_key[1])
+    h_input = h + msg_str.encode('utf-8')
+    return int.from_bytes(sm3_digest(h_input), 'big')
+
+def _v_op(e, r, s, p_key):
+    t = (r + s) % C4
+    if t == 0: return False
+    table = _PK_TABLES.lookup(p_key) if _PK_TABLES else None
+    if table is not None:
+        res_p = to_affine(jac_add(g_table().mult_jac(s), table.mult_jac(t)))
+    else:
+        res_p = multi_scalar_mul([(s, G), (t, p_key)])
+    c_r = (e + res_p[0]) % C4
+    return _x_op(r.to_bytes(32, 'big'), c_r.to_bytes(32, 'big'))
+
+def _batch_check(entries):
+    #随机线性组合：sum z_i*(s_i*G + t_i*P_i - R_i) == O，z_i取128位随机奇数
+    g_coef, pk_coef, pairs = 0, {}, []
+    for _, e, r, s, p_key, r_pt in entries:
+        z = secrets.randbits(BATCH_SECURITY) | 1
+        g_coef = (g_coef + z * s) % C4
+        pk_coef[p_key] = (pk_coef.get(p_key, 0) + z * (r + s)) % C4
+        pairs.append((z, (r_pt[0], -r_pt[1] % C3)))
+    pairs.extend((k, p_key) for p_key, k in pk_coef.items())
+    acc = jac_add(g_table().mult_jac(g_coef), pippenger_msm_jac(pairs))
+    return acc[2] == 0
+
+def _bisect(entries, results):
+    if not entries: return
+    if len(entries) == 1:
+        idx, e, r, s, p_key, _ = entries[0]
+        results[idx] = _v_op(e, r, s, p_key)
+        return
+    if _batch_check(entries):
+        for en in entries: results[en[0]] = True
+        return
+    mid = len(entries) // 2
+    _bisect(entries[:mid], results)
+    _bisect(entries[mid:], results)
+
+def verify_batch(items):
+    """
+    批量验签，items为[(msg, uid, pubkey, sig), ...]，返回与逐个调用verify相同的布尔列表。
+    sig为process(..., recoverable=True)产生的(r, s, v)时由r恢复R点参与一次多标量乘；
+    组合校验失败则二分定位无效签名。(r, s)形式的签名无法确定R的符号，逐个验证。
+    """
+    results = [False] * len(items)
+    entries = []
+    for idx, (msg_str, user_id, p_key, sig) in enumerate(items):
+        r, s = sig[0], sig[1]
+        if not (0 < r < C4 and 0 < s < C4): continue
+        e = _e_op(msg_str, user_id, p_key)
+        if (r + s) % C4 == 0: continue
+        r_pt = lift_x((r - e) % C4, sig[2]) if len(sig) > 2 else None
+        if r_pt is None:
+            results[idx] = _v_op(e, r, s, p_key)
+        else:
+            entries.append((idx, e, r, s, p_key, r_pt))
+    _bisect(entries, results)
+    return results
 
 class Processor:
     def __init__(self, key_data=None):
@@ -64,21 +160,11 @@ class Processor:
         return d_k, p_k
 
     def _c_op(self, uid_str, p_x, p_y):
-        uid_b = uid_str.encode('utf-8')
-        l_uid = len(uid_b) * 8
-        d_hash = b''.join([
-            l_uid.to_bytes(2, 'big'), uid_b,
-            C1.to_bytes(32, 'big'), C2.to_bytes(32, 'big'),
-            C5.to_bytes(32, 'big'), C6.to_bytes(32, 'big'),
-            p_x.to_bytes(32, 'big'), p_y.to_bytes(32, 'big')
-        ])
-        h_res = sm3.sm3_hash(func.bytes_to_list(d_hash))
-        return bytes.fromhex(h_res)
-
-    def process(self, msg_str, user_id):
-        h = self._c_op(user_id, self.p_key[0], self.p_key[1])
-        h_input = h + msg_str.encode('utf-8')
-        e = int(sm3.sm3_hash(func.bytes_to_list(h_input)), 16)
+        return _za_op(uid_str, p_x, p_y)
+
+    def process(self, msg_str, user_id, recoverable=False):
+        #recoverable=True时额外返回kG的y坐标奇偶位v，供verify_batch恢复R点
+        e = _e_op(msg_str, user_id, self.p_key)
         while True:
             k = secrets.randbelow(C4 - 1) + 1
             pk = _a_op(k, G)
@@ -88,30 +174,38 @@ class Processor:
             s_inv = _y_op(1 + self.d_key, C4)
             s = (s_inv * (k - r * self.d_key)) % C4
             if s != 0:
-                return (r, s)
+                return (r, s, pk[1] & 1) if recoverable else (r, s)
+
+    def process_batch(self, msgs, user_id, recoverable=False):
+        #批量签名：各k*G保持Jacobian坐标，一次批量求逆统一转为仿射坐标
+        e_list = [_e_op(msg_str, user_id, self.p_key) for msg_str in msgs]
+        s_inv = _y_op(1 + self.d_key, C4)
+        sigs = [None] * len(msgs)
+        todo = list(range(len(msgs)))
+        while todo:
+            ks = [secrets.randbelow(C4 - 1) + 1 for _ in todo]
+            pts = batch_to_affine([g_table().mult_jac(k) for k in ks])
+            retry = []
+            for i, k, pk in zip(todo, ks, pts):
+                r = (e_list[i] + pk[0]) % C4
+                s = (s_inv * (k - r * self.d_key)) % C4
+                if r == 0 or r + k == C4 or s == 0:
+                    retry.append(i)
+                    continue
+                sigs[i] = (r, s, pk[1] & 1) if recoverable else (r, s)
+            todo = retry
+        return sigs
 
     def verify(self, msg_str, user_id, sig):
-        r, s = sig
+        r, s = sig[0], sig[1]
         if not (0 < r < C4 and 0 < s < C4): return False
-        h = self._c_op(user_id, self.p_key[0], self.p_key[1])
-        h_input = h + msg_str.encode('utf-8')
-        e = int(sm3.sm3_hash(func.bytes_to_list(h_input)), 16)
-        t = (r + s) % C4
-        ps = _a_op(s, G)
-        pt = _a_op(t, self.p_key)
-        res_p = _z_op(ps, pt)
-        c_r = (e + res_p[0]) % C4
-        return _x_op(r.to_bytes(32, 'big'), c_r.to_bytes(32, 'big'))
+        return _v_op(_e_op(msg_str, user_id, self.p_key), r, s, self.p_key)
 
     def _d_op(self, z, klen):
-        c, dk = 1, b''
         l_bytes = (klen + 7) // 8
-        while len(dk) < l_bytes:
-            in_data = z + c.to_bytes(4, 'big')
-            h_out = bytes.fromhex(sm3.sm3_hash(func.bytes_to_list(in_data)))
-            dk += h_out
-            c += 1
-        return dk[:l_bytes]
+        blocks = [sm3_digest(z + c.to_bytes(4, 'big'))
+                  for c in range(1, (l_bytes + 31) // 32 + 1)]
+        return b''.join(blocks)[:l_bytes]
 
     def secret_encode(self, data: bytes):
         if self.p_key == (0, 0): raise ValueError("error")
@@ -123,9 +217,9 @@ class Processor:
         xb, yb = x2.to_bytes(32, 'big'), y2.to_bytes(32, 'big')
         kdf_out = self._d_op(xb + yb, len(data) * 8)
         if all(b == 0 for b in kdf_out): raise ValueError("error")
-        c2 = bytes(p ^ t for p, t in zip(data, kdf_out))
+        c2 = _xor_op(data, kdf_out)
         c3_in = xb + data + yb
-        c3 = bytes.fromhex(sm3.sm3_hash(func.bytes_to_list(c3_in)))
+        c3 = sm3_digest(c3_in)
         c1_bytes = x1.to_bytes(32, 'big') + y1.to_bytes(32, 'big')
         return c1_bytes + c3 + c2
 
@@ -142,9 +236,9 @@ class Processor:
         xb, yb = x2.to_bytes(32, 'big'), y2.to_bytes(32, 'big')
         kdf_out = self._d_op(xb + yb, len(c2) * 8)
         if all(b == 0 for b in kdf_out): raise ValueError("error")
-        d_text = bytes(c ^ k for c, k in zip(c2, kdf_out))
+        d_text = _xor_op(c2, kdf_out)
         c3_in = xb + d_text + yb
-        c3_c = bytes.fromhex(sm3.sm3_hash(func.bytes_to_list(c3_in)))
+        c3_c = sm3_digest(c3_in)
         if not _x_op(c3_c, c3): raise ValueError("error")
         return d_text
 
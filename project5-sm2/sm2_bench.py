@@ -0,0 +1,308 @@
+import os
+import time
+import secrets
+import tempfile
+import sm2
+import sm2_curve
+import sm2_cache
+from sm2 import Processor, C4, G, _z_op
+
+
+def _legacy_a_op(k, p):
+    #原仿射坐标二进制展开实现，每次点加/倍点都要求一次模逆，仅作对照
+    if not 0 < k < C4:
+        raise ValueError("error")
+    r, cp = (0, 0), p
+    while k:
+        if k & 1: r = _z_op(r, cp)
+        cp = _z_op(cp, cp)
+        k >>= 1
+    return r
+
+
+def _legacy_multi(pairs):
+    res = (0, 0)
+    for k, p in pairs:
+        res = _z_op(res, _legacy_a_op(k, p))
+    return res
+
+
+def _timeit(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds
+
+
+def _run_ops(p, rounds):
+    msg, uid = "benchmark message", "user01"
+    sig = p.process(msg, uid)
+    cipher = p.secret_encode(b"benchmark payload" * 4)
+    return {
+        'keygen': _timeit(p._b_op, rounds),
+        'process': _timeit(lambda: p.process(msg, uid), rounds),
+        'verify': _timeit(lambda: p.verify(msg, uid, sig), rounds),
+        'secret_encode': _timeit(lambda: p.secret_encode(b"benchmark payload" * 4), rounds),
+        'secret_decode': _timeit(lambda: p.secret_decode(cipher), rounds),
+    }
+
+
+def bench_scalar_mult(rounds=20):
+    print("--- 标量乘：仿射 vs Jacobian+wNAF ---")
+    p = Processor()
+    fast = _run_ops(p, rounds)
+    saved = sm2._a_op, sm2.multi_scalar_mul
+    sm2._a_op, sm2.multi_scalar_mul = _legacy_a_op, _legacy_multi
+    try:
+        legacy = _run_ops(p, rounds)
+    finally:
+        sm2._a_op, sm2.multi_scalar_mul = saved
+    for name in fast:
+        print(f"{name:<14} 仿射 {legacy[name] * 1e3:8.2f} ms  "
+              f"Jacobian {fast[name] * 1e3:8.2f} ms  加速比 {legacy[name] / fast[name]:5.1f}x")
+    k = secrets.randbelow(C4 - 1) + 1
+    assert _legacy_a_op(k, G) == sm2._a_op(k, G)
+
+
+def bench_fixed_base(rounds=200):
+    print("--- 固定基点G：wNAF vs 预计算窗口表 ---")
+    start = time.perf_counter()
+    table = sm2_curve.FixedBaseTable(G)
+    build = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'g_table.bin')
+        table.save(path)
+        start = time.perf_counter()
+        sm2_curve.FixedBaseTable.load(path, G)
+        load = time.perf_counter() - start
+        size = os.path.getsize(path)
+    print(f"建表 {build * 1e3:.1f} ms  从磁盘加载 {load * 1e3:.1f} ms  文件 {size // 1024} KB")
+    ks = [secrets.randbelow(C4 - 1) + 1 for _ in range(rounds)]
+    assert all(table.mult(k) == sm2_curve.scalar_mult(k, G) for k in ks[:10])
+    start = time.perf_counter()
+    for k in ks: sm2_curve.scalar_mult(k, G)
+    var_t = (time.perf_counter() - start) / rounds
+    start = time.perf_counter()
+    for k in ks: table.mult(k)
+    fix_t = (time.perf_counter() - start) / rounds
+    print(f"k*G  wNAF {var_t * 1e3:.2f} ms  查表 {fix_t * 1e3:.2f} ms  加速比 {var_t / fix_t:.1f}x")
+
+
+def bench_multi_scalar(rounds=100):
+    print("--- 验签中的 sG + tP：分别标量乘 vs Straus交错多标量乘 ---")
+    p = Processor()
+    pairs = [(secrets.randbelow(C4 - 1) + 1, secrets.randbelow(C4 - 1) + 1) for _ in range(rounds)]
+    start = time.perf_counter()
+    sep = [_z_op(sm2._a_op(s, G), sm2._a_op(t, p.p_key)) for s, t in pairs]
+    sep_t = (time.perf_counter() - start) / rounds
+    start = time.perf_counter()
+    joint = [sm2_curve.multi_scalar_mul([(s, G), (t, p.p_key)]) for s, t in pairs]
+    joint_t = (time.perf_counter() - start) / rounds
+    assert sep == joint
+    print(f"SM2 分别计算 {sep_t * 1e3:.2f} ms  交错计算 {joint_t * 1e3:.2f} ms  加速比 {sep_t / joint_t:.1f}x")
+
+    from ecpy.curves import Curve
+    curve = Curve.get_curve('secp256k1')
+    g, q = curve.generator, curve.generator * 7
+    pairs = [(secrets.randbelow(curve.order), secrets.randbelow(curve.order)) for _ in range(rounds // 5)]
+    start = time.perf_counter()
+    for u1, u2 in pairs: (u1 * g + u2 * q).x
+    sep_t = (time.perf_counter() - start) / len(pairs)
+    start = time.perf_counter()
+    for u1, u2 in pairs:
+        sm2_curve.multi_scalar_mul([(u1, (g.x, g.y)), (u2, (q.x, q.y))], mod=curve.field, a=curve.a)
+    joint_t = (time.perf_counter() - start) / len(pairs)
+    print(f"secp256k1 ecpy {sep_t * 1e3:.2f} ms  交错计算 {joint_t * 1e3:.2f} ms  加速比 {sep_t / joint_t:.1f}x")
+
+
+def bench_verify_batch(sizes=(1, 16, 256, 4096), n_keys=16):
+    print("--- 批量验签：逐个verify vs verify_batch（每签名均摊耗时） ---")
+    procs = [Processor() for _ in range(n_keys)]
+    items = []
+    for i in range(max(sizes)):
+        p = procs[i % n_keys]
+        msg = f"ingest record {i}"
+        items.append((msg, "user01", p.p_key, p.process(msg, "user01", recoverable=True)))
+    loop_n = min(max(sizes), 256)
+    start = time.perf_counter()
+    for msg, uid, p_key, sig in items[:loop_n]:
+        Processor((0, p_key)).verify(msg, uid, sig)
+    loop_t = (time.perf_counter() - start) / loop_n
+    for n in sizes:
+        start = time.perf_counter()
+        res = sm2.verify_batch(items[:n])
+        batch_t = (time.perf_counter() - start) / n
+        assert all(res)
+        print(f"批大小 {n:<5} 逐个 {loop_t * 1e3:6.2f} ms/签名  批量 {batch_t * 1e3:6.2f} ms/签名  "
+              f"加速比 {loop_t / batch_t:4.1f}x")
+
+
+def bench_key_cache(rounds=100, n_keys=4):
+    print("--- ZA缓存与公钥预计算表：重复(uid, 公钥)的验签 ---")
+    procs = [Processor() for _ in range(n_keys)]
+    items = [(f"m{i}", procs[i % n_keys]) for i in range(rounds)]
+    items = [(msg, p, p.process(msg, "user01")) for msg, p in items]
+
+    def run():
+        start = time.perf_counter()
+        assert all(p.verify(msg, "user01", sig) for msg, p, sig in items)
+        return (time.perf_counter() - start) / rounds
+
+    sm2._ZA_CACHE.clear()
+    #单槽缓存作为无缓存的对照；直接构造而不用make_cache，以免替换登记表中的sm2.za
+    saved, sm2._ZA_CACHE = sm2._ZA_CACHE, sm2_cache.LRUCache(1)
+    no_cache = run()
+    sm2._ZA_CACHE = saved
+    za_only = run()
+    sm2.enable_pk_tables(capacity=n_keys, min_uses=1)
+    run()
+    tables = run()
+    print(f"无缓存 {no_cache * 1e3:.2f} ms  ZA缓存 {za_only * 1e3:.2f} ms  ZA缓存+公钥表 {tables * 1e3:.2f} ms")
+    print("统计:", sm2.cache_stats())
+    sm2.enable_pk_tables(0)
+
+
+def bench_batch_inverse(sizes=(16, 256, 4096)):
+    print("--- 模逆：逐个pow(x, -1, m) vs Montgomery批量求逆 ---")
+    for n in sizes:
+        vals = [secrets.randbelow(C4 - 1) + 1 for _ in range(n)]
+        start = time.perf_counter()
+        single = [pow(v, -1, C4) for v in vals]
+        single_t = time.perf_counter() - start
+        start = time.perf_counter()
+        batch = sm2_curve.batch_inverse(vals, C4)
+        batch_t = time.perf_counter() - start
+        assert single == batch
+        print(f"n={n:<5} 逐个 {single_t / n * 1e6:6.2f} us/个  批量 {batch_t / n * 1e6:6.2f} us/个  "
+              f"加速比 {single_t / batch_t:4.1f}x")
+    p = Processor()
+    msgs = [f"m{i}" for i in range(64)]
+    start = time.perf_counter()
+    for m in msgs: p.process(m, "user01")
+    single_t = time.perf_counter() - start
+    start = time.perf_counter()
+    p.process_batch(msgs, "user01")
+    batch_t = time.perf_counter() - start
+    print(f"签名64条 逐个 {single_t * 1e3:.1f} ms  process_batch {batch_t * 1e3:.1f} ms")
+
+
+def bench_parallel(jobs=256, max_workers=None):
+    print("--- ParallelProcessor：工作进程数与吞吐量 ---")
+    from sm2_parallel import ParallelProcessor
+    max_workers = max_workers or os.cpu_count()
+    msgs = [f"m{i}" for i in range(jobs)]
+    key = Processor()
+    base = None
+    for workers in sorted({1, 2, 4, 8, 16, max_workers} & set(range(1, max_workers + 1))):
+        with ParallelProcessor((key.d_key, key.p_key), workers=workers) as pp:
+            pp.process_many(msgs[:workers], "user01")
+            start = time.perf_counter()
+            sigs = pp.process_many(msgs, "user01")
+            assert all(pp.verify_many(msgs, "user01", sigs))
+            rate = 2 * jobs / (time.perf_counter() - start)
+        base = base or rate
+        print(f"进程数 {workers:<3} {rate:8.1f} 次签名+验签/秒  相对单进程 {rate / base:4.2f}x")
+
+
+def bench_stream(size_mb=1, chunk_size=1 << 16):
+    print(f"--- 流式加解密：{size_mb} MB 文件 ---")
+    import sm2_stream
+    p = Processor()
+    with tempfile.TemporaryDirectory() as tmp:
+        src, enc, dec = (os.path.join(tmp, name) for name in ('plain', 'cipher', 'decoded'))
+        with open(src, 'wb') as f:
+            for _ in range(size_mb * 16):
+                f.write(os.urandom(1 << 16))
+        rss = _rss_mb()
+        start = time.perf_counter()
+        sm2_stream.encrypt_file(p.p_key, src, enc, chunk_size)
+        enc_t = time.perf_counter() - start
+        start = time.perf_counter()
+        sm2_stream.decrypt_file(p.d_key, enc, dec, chunk_size)
+        dec_t = time.perf_counter() - start
+        with open(src, 'rb') as a, open(dec, 'rb') as b:
+            assert a.read() == b.read()
+    print(f"加密 {size_mb / enc_t:.3f} MB/s  解密 {size_mb / dec_t:.3f} MB/s  RSS增量 {_rss_mb() - rss:.1f} MB")
+
+
+def bench_sm3(rounds=2000):
+    print("--- SM3后端：200字节消息与1MB数据 ---")
+    import sm3_backend
+    current = sm3_backend.BACKEND
+    small, big = os.urandom(200), os.urandom(1 << 20)
+    for name in sm3_backend.available_backends():
+        sm3_backend.use_backend(name)
+        n = rounds if name != 'gmssl' else rounds // 20
+        start = time.perf_counter()
+        for _ in range(n): sm3_backend.sm3_digest(small)
+        small_t = (time.perf_counter() - start) / n
+        data = big if name != 'gmssl' else big[:1 << 14]
+        start = time.perf_counter()
+        h = sm3_backend.new()
+        for i in range(0, len(data), 4096): h.update(data[i:i + 4096])
+        h.digest()
+        rate = len(data) / 2 ** 20 / (time.perf_counter() - start)
+        print(f"{name:<8} 200B摘要 {small_t * 1e6:8.1f} us  增量吞吐 {rate:8.2f} MB/s")
+    sm3_backend.use_backend(current)
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_memory(signatures=1_000_000, samples=10):
+    print(f"--- 长时间签名的内存占用（sm2_poc，{signatures} 次签名） ---")
+    import sm2_poc
+    from sm2_cache import registry_stats
+    proc = sm2_poc.DataProcessor()
+    params = sm2_poc._get_params()
+    data = {'d': params['d'], 'p': params['p'], 'msg': "payload", 'uid': "user01"}
+    step = max(signatures // samples, 1)
+    start = time.perf_counter()
+    for i in range(1, signatures + 1):
+        proc.process_sm2_data(data)
+        if i % step == 0:
+            print(f"{i:>9} 次  RSS {_rss_mb():7.1f} MB  {i / (time.perf_counter() - start):7.1f} 签名/秒")
+    for name, st in registry_stats().items():
+        print(f"{name:<24} {st}")
+
+
+BENCHES = {
+    'scalar': bench_scalar_mult,
+    'fixed': bench_fixed_base,
+    'multi': bench_multi_scalar,
+    'batch': bench_verify_batch,
+    'keycache': bench_key_cache,
+    'inverse': bench_batch_inverse,
+    'parallel': bench_parallel,
+    'stream': bench_stream,
+    'sm3': bench_sm3,
+    'memory': bench_memory,
+}
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('names', nargs='*', help=f"要运行的测试 {list(BENCHES)}，默认除memory外全部运行")
+    parser.add_argument('--signatures', type=int, default=1_000_000, help="memory测试的签名次数")
+    parser.add_argument('--stream-mb', type=int, default=1, help="stream测试的文件大小(MB)")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHES)
+    if unknown: parser.error(f"未知测试: {sorted(unknown)}")
+    for name in args.names or [n for n in BENCHES if n != 'memory']:
+        if name == 'memory':
+            bench_memory(args.signatures)
+        elif name == 'stream':
+            bench_stream(args.stream_mb)
+        else:
+            BENCHES[name]()
+
+
+if __name__ == "__main__":
+    main()
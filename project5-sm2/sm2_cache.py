@@ -0,0 +1,179 @@
+import threading
+from collections import OrderedDict
+from sm2_curve import FixedBaseTable
+
+
+class _BoundedCache:
+    """
+    容量有限的缓存基类：加锁保证多线程安全，并统计命中/未命中/淘汰次数。
+    子类只需实现 _lookup / _store。
+    """
+
+    policy = None
+
+    def __init__(self, capacity):
+        if capacity <= 0: raise ValueError("error")
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            found, value = self._lookup(key)
+            if not found:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'policy': self.policy, 'capacity': self.capacity, 'size': len(self),
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+class LRUCache(_BoundedCache):
+    """满时淘汰最久未使用的条目。"""
+
+    policy = 'lru'
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self._data = OrderedDict()
+
+    def _lookup(self, key):
+        if key not in self._data: return False, None
+        self._data.move_to_end(key)
+        return True, self._data[key]
+
+    def _store(self, key, value):
+        if key in self._data:
+            self._data.move_to_end(key)
+        elif len(self._data) >= self.capacity:
+            self._data.popitem(last=False)
+            self.evictions += 1
+        self._data[key] = value
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class LFUCache(_BoundedCache):
+    """满时淘汰使用次数最少的条目，次数相同时淘汰其中最久未使用的；各操作均为O(1)。"""
+
+    policy = 'lfu'
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self._data = {}
+        self._freq = {}
+        self._buckets = {}
+        self._min_freq = 0
+
+    def _touch(self, key):
+        f = self._freq[key]
+        bucket = self._buckets[f]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[f]
+            if self._min_freq == f: self._min_freq = f + 1
+        self._freq[key] = f + 1
+        self._buckets.setdefault(f + 1, OrderedDict())[key] = None
+
+    def _lookup(self, key):
+        if key not in self._data: return False, None
+        self._touch(key)
+        return True, self._data[key]
+
+    def _store(self, key, value):
+        if key in self._data:
+            self._data[key] = value
+            self._touch(key)
+            return
+        if len(self._data) >= self.capacity:
+            bucket = self._buckets[self._min_freq]
+            old, _ = bucket.popitem(last=False)
+            if not bucket: del self._buckets[self._min_freq]
+            del self._data[old], self._freq[old]
+            self.evictions += 1
+        self._data[key] = value
+        self._freq[key] = 1
+        self._buckets.setdefault(1, OrderedDict())[key] = None
+        self._min_freq = 1
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._freq.clear()
+            self._buckets.clear()
+            self._min_freq = 0
+
+
+_POLICIES = {'lru': LRUCache, 'lfu': LFUCache}
+#按名字登记的缓存，便于统一查看统计或调整容量
+_REGISTRY = {}
+
+
+def make_cache(name, capacity, policy='lru'):
+    """创建并登记一个缓存；同名缓存已存在时替换为新的容量/策略。"""
+    if policy not in _POLICIES: raise ValueError("error")
+    cache = _POLICIES[policy](capacity)
+    _REGISTRY[name] = cache
+    return cache
+
+
+def registry_stats():
+    return {name: cache.stats() for name, cache in _REGISTRY.items()}
+
+
+class PublicKeyTables:
+    """
+    公钥的固定基预计算表缓存。建表约等于二十次普通标量乘，
+    因此公钥被使用min_uses次后才建表，之后 t*P 只需查表做加法。
+    """
+
+    def __init__(self, capacity=64, min_uses=8):
+        self.tables = LRUCache(capacity)
+        self._uses = LRUCache(capacity * 16)
+        self.min_uses = min_uses
+        self._lock = threading.Lock()
+
+    def lookup(self, p_key):
+        table = self.tables.get(p_key)
+        if table is not None: return table
+        with self._lock:
+            uses = self._uses.get(p_key, 0) + 1
+            if uses < self.min_uses:
+                self._uses.put(p_key, uses)
+                return None
+            #计数清零：被淘汰后需重新攒够min_uses次才再次建表，避免容量不足时反复建表
+            self._uses.put(p_key, 0)
+        table = FixedBaseTable(p_key)
+        self.tables.put(p_key, table)
+        return table
+
+    def stats(self):
+        return self.tables.stats()
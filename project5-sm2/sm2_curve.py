@@ -0,0 +1,358 @@
+import os
+
+#SM2曲线的Jacobian坐标点运算
+#仿射点用(x, y)表示，(0, 0)为无穷远点，与sm2.py保持一致；
+#Jacobian点用(X, Y, Z)表示，对应仿射点(X/Z^2, Y/Z^3)，Z == 0为无穷远点
+#点运算默认使用SM2参数，传入mod/a即可用于其他短Weierstrass曲线
+
+P = 0x8542D69E4C044F18E8B92435BF6FF7DE457283915C45517D722EDB8B08F1DFC3
+A = 0x787968B4FA32C3FD2417842E73BBFEFF2F3C848B6831D7E0EC65228B3937E498
+B = 0x63E4C6D3B23B0C849CF84241484BFE48F61D59A5B16BA06E6E12D1DA27C5249A
+N = 0x8542D69E4C044F18E8B92435BF6FF7DD297720630485628D5AE74EE7C32E79B7
+G = (0x421DEBD61B62EAB6746434EBC3CC315E32220B3BADD50BDC4C4E6C147FEDD43D,
+     0x0680512BCBB42C07D47349D2153B70C4E5D7FDFCBFA36EA1A85841B9E46E09A2)
+
+INFINITY = (1, 1, 0)
+WNAF_WIDTH = 5
+#G的奇数倍表只需算一次，可以用更宽的窗口
+G_WNAF_WIDTH = 7
+COMB_WIDTH = 4
+#若设置该环境变量，G的固定基表从此文件加载，文件不存在时生成后写入
+G_TABLE_ENV = 'SM2_G_TABLE'
+
+
+def to_jacobian(pt):
+    if pt == (0, 0): return INFINITY
+    return (pt[0], pt[1], 1)
+
+
+def to_affine(pt, mod=P):
+    #整个标量乘只在这里做一次模逆
+    x, y, z = pt
+    if z == 0: return (0, 0)
+    zi = pow(z, -1, mod)
+    zi2 = zi * zi % mod
+    return (x * zi2 % mod, y * zi2 * zi % mod)
+
+
+def batch_inverse(values, m):
+    """
+    Montgomery批量求逆：一次模逆加3(n-1)次乘法求出全部元素的逆。
+    与_y_op一致，值为0的元素结果为0；其余元素须与m互素。
+    """
+    prefix, acc = [], 1
+    for v in values:
+        prefix.append(acc)
+        if v % m: acc = acc * v % m
+    inv = pow(acc, -1, m)
+    out = [0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        v = values[i] % m
+        if v:
+            out[i] = inv * prefix[i] % m
+            inv = inv * v % m
+    return out
+
+
+def batch_to_affine(points, mod=P):
+    #批量把Jacobian点转为仿射坐标，所有点共用一次模逆
+    out = []
+    for (x, y, z), zi in zip(points, batch_inverse([pt[2] for pt in points], mod)):
+        if z == 0:
+            out.append((0, 0))
+            continue
+        zi2 = zi * zi % mod
+        out.append((x * zi2 % mod, y * zi2 * zi % mod))
+    return out
+
+
+def jac_neg(pt, mod=P):
+    return (pt[0], -pt[1] % mod, pt[2])
+
+
+def jac_double(pt, mod=P, a=A):
+    x, y, z = pt
+    if z == 0 or y == 0: return INFINITY
+    yy = y * y % mod
+    s = 4 * x * yy % mod
+    zz = z * z % mod
+    m = (3 * x * x + a * zz * zz) % mod
+    x3 = (m * m - 2 * s) % mod
+    y3 = (m * (s - x3) - 8 * yy * yy) % mod
+    z3 = 2 * y * z % mod
+    return (x3, y3, z3)
+
+
+def jac_add(p1, p2, mod=P, a=A):
+    x1, y1, z1 = p1
+    x2, y2, z2 = p2
+    if z1 == 0: return p2
+    if z2 == 0: return p1
+    z1z1 = z1 * z1 % mod
+    z2z2 = z2 * z2 % mod
+    u1 = x1 * z2z2 % mod
+    u2 = x2 * z1z1 % mod
+    s1 = y1 * z2 * z2z2 % mod
+    s2 = y2 * z1 * z1z1 % mod
+    h = (u2 - u1) % mod
+    r = (s2 - s1) % mod
+    if h == 0:
+        if r == 0: return jac_double(p1, mod, a)
+        return INFINITY
+    hh = h * h % mod
+    hhh = h * hh % mod
+    v = u1 * hh % mod
+    x3 = (r * r - hhh - 2 * v) % mod
+    y3 = (r * (v - x3) - s1 * hhh) % mod
+    z3 = h * z1 * z2 % mod
+    return (x3, y3, z3)
+
+
+def jac_add_affine(p1, q, mod=P, a=A):
+    #混合加法：q为仿射点，省去与Z2相关的乘法
+    x1, y1, z1 = p1
+    x2, y2 = q
+    if z1 == 0: return (x2, y2, 1)
+    z1z1 = z1 * z1 % mod
+    u2 = x2 * z1z1 % mod
+    s2 = y2 * z1 * z1z1 % mod
+    h = (u2 - x1) % mod
+    r = (s2 - y1) % mod
+    if h == 0:
+        if r == 0: return jac_double(p1, mod, a)
+        return INFINITY
+    hh = h * h % mod
+    hhh = h * hh % mod
+    v = x1 * hh % mod
+    x3 = (r * r - hhh - 2 * v) % mod
+    y3 = (r * (v - x3) - y1 * hhh) % mod
+    z3 = h * z1 % mod
+    return (x3, y3, z3)
+
+
+def is_on_curve(pt):
+    x, y = pt
+    return (y * y - x * x * x - A * x - B) % P == 0
+
+
+def wnaf(k, w=WNAF_WIDTH):
+    #宽度为w的NAF编码，低位在前，非零位均为奇数且|d| < 2^(w-1)
+    digits = []
+    full, half = 1 << w, 1 << (w - 1)
+    while k:
+        if k & 1:
+            d = k & (full - 1)
+            if d >= half: d -= full
+            k -= d
+        else:
+            d = 0
+        digits.append(d)
+        k >>= 1
+    return digits
+
+
+def _odd_multiples(pt, w, mod=P, a=A):
+    #[P, 3P, 5P, ..., (2^(w-1)-1)P]
+    table = [pt]
+    dbl = jac_double(pt, mod, a)
+    for _ in range((1 << (w - 2)) - 1):
+        table.append(jac_add(table[-1], dbl, mod, a))
+    return table
+
+
+def scalar_mult_jac(k, pt, w=WNAF_WIDTH):
+    if k == 0 or pt == (0, 0): return INFINITY
+    #奇数倍表批量转为仿射坐标，主循环中全部使用混合加法
+    table = batch_to_affine(_odd_multiples(to_jacobian(pt), w))
+    res = INFINITY
+    for d in reversed(wnaf(k, w)):
+        res = jac_double(res)
+        if d > 0:
+            res = jac_add_affine(res, table[d >> 1])
+        elif d < 0:
+            q = table[-d >> 1]
+            res = jac_add_affine(res, (q[0], P - q[1]))
+    return res
+
+
+def scalar_mult(k, pt, w=WNAF_WIDTH):
+    return to_affine(scalar_mult_jac(k, pt, w))
+
+
+_G_ODD = None
+
+
+def _g_odd_multiples():
+    global _G_ODD
+    if _G_ODD is None:
+        _G_ODD = batch_to_affine(_odd_multiples(to_jacobian(G), G_WNAF_WIDTH))
+    return _G_ODD
+
+
+def multi_scalar_mul_jac(pairs, mod=P, a=A, w=WNAF_WIDTH):
+    """
+    Straus交错wNAF多标量乘：计算 sum(k_i * P_i)，各项共用同一条倍点链。
+    pairs为[(k, (x, y)), ...]，k为非负整数。
+    """
+    terms, pending = [], []
+    for k, pt in pairs:
+        if k == 0 or pt == (0, 0): continue
+        if pt == G and mod == P:
+            terms.append((wnaf(k, G_WNAF_WIDTH), _g_odd_multiples()))
+        else:
+            table = _odd_multiples(to_jacobian(pt), w, mod, a)
+            terms.append((wnaf(k, w), table))
+            pending.append(table)
+    #所有非G项的奇数倍表一起做一次批量求逆
+    flat = batch_to_affine([pt for table in pending for pt in table], mod)
+    size = 1 << (w - 2)
+    for table, i in zip(pending, range(0, len(flat), size)):
+        table[:] = flat[i:i + size]
+    res = INFINITY
+    for i in range(max((len(t[0]) for t in terms), default=0) - 1, -1, -1):
+        res = jac_double(res, mod, a)
+        for digits, table in terms:
+            if i >= len(digits) or digits[i] == 0: continue
+            d = digits[i]
+            pt = table[abs(d) >> 1]
+            if d < 0: pt = (pt[0], mod - pt[1])
+            res = jac_add_affine(res, pt, mod, a)
+    return res
+
+
+def multi_scalar_mul(pairs, mod=P, a=A, w=WNAF_WIDTH):
+    return to_affine(multi_scalar_mul_jac(pairs, mod, a, w), mod)
+
+
+class FixedBaseTable:
+    """
+    固定基点的窗口预计算表：第i行保存 j * 2^(w*i) * base (1 <= j < 2^w)。
+    标量按w位分段后每段查表做一次混合加法，不需要倍点。
+    """
+
+    _MAGIC = b'SM2T'
+
+    def __init__(self, base, w=COMB_WIDTH, rows=None):
+        self.base = base
+        self.w = w
+        self.rows = rows if rows is not None else self._build(base, w)
+
+    @staticmethod
+    def _build(base, w):
+        rows = []
+        cur = to_jacobian(base)
+        for _ in range((N.bit_length() + w - 1) // w):
+            row = [cur]
+            for _ in range((1 << w) - 2):
+                row.append(jac_add(row[-1], cur))
+            rows.append(row)
+            for _ in range(w):
+                cur = jac_double(cur)
+        #整张表只做一次模逆
+        flat = batch_to_affine([pt for row in rows for pt in row])
+        per_row = (1 << w) - 1
+        return [flat[i:i + per_row] for i in range(0, len(flat), per_row)]
+
+    def mult_jac(self, k):
+        k %= N
+        mask = (1 << self.w) - 1
+        res = INFINITY
+        for row in self.rows:
+            d = k & mask
+            if d: res = jac_add_affine(res, row[d - 1])
+            k >>= self.w
+        return res
+
+    def mult(self, k):
+        return to_affine(self.mult_jac(k))
+
+    def save(self, path):
+        #先写同目录下的临时文件再改名，并发读取的进程不会看到写了一半的表
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(self._MAGIC + bytes([self.w]) + len(self.rows).to_bytes(2, 'big'))
+            for row in self.rows:
+                for x, y in row:
+                    f.write(x.to_bytes(32, 'big') + y.to_bytes(32, 'big'))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, base):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < 7 or data[:4] != cls._MAGIC: raise ValueError("error")
+        w = data[4]
+        n_rows = int.from_bytes(data[5:7], 'big')
+        per_row = (1 << w) - 1
+        if len(data) != 7 + n_rows * per_row * 64: raise ValueError("error")
+        rows, off = [], 7
+        for _ in range(n_rows):
+            row = []
+            for _ in range(per_row):
+                pt = (int.from_bytes(data[off:off + 32], 'big'), int.from_bytes(data[off + 32:off + 64], 'big'))
+                if not is_on_curve(pt): raise ValueError("error")
+                row.append(pt)
+                off += 64
+            rows.append(row)
+        if n_rows * w < N.bit_length() or rows[0][0] != base: raise ValueError("error")
+        return cls(base, w, rows)
+
+
+_G_TABLE = None
+
+
+def g_table():
+    #G的固定基表，sm2.py与sm2_zbc.py共用，首次使用时才构建
+    global _G_TABLE
+    if _G_TABLE is None:
+        path = os.environ.get(G_TABLE_ENV)
+        if path and os.path.exists(path):
+            _G_TABLE = FixedBaseTable.load(path, G)
+        else:
+            _G_TABLE = FixedBaseTable(G)
+            if path: _G_TABLE.save(path)
+    return _G_TABLE
+
+
+def g_mult(k):
+    return g_table().mult(k)
+
+
+def lift_x(x, parity):
+    #由x坐标与y的奇偶位恢复曲线上的点，x不在曲线上时返回None；SM2的p满足p ≡ 3 (mod 4)
+    if x >= P: return None
+    rhs = (x * x * x + A * x + B) % P
+    y = pow(rhs, (P + 1) // 4, P)
+    if y * y % P != rhs: return None
+    if y & 1 != parity: y = P - y
+    return (x, y)
+
+
+def _pippenger_window(n, bits):
+    return min(range(1, 17), key=lambda c: ((bits + c - 1) // c) * (n + (1 << (c + 1))))
+
+
+def pippenger_msm_jac(pairs, mod=P, a=A):
+    """
+    Pippenger桶算法多标量乘，适合项数很多的情形；点须为仿射坐标。
+    每个c位窗口把点按该窗口的数字放进桶里，再用后缀和一次性求出 sum(j * B_j)。
+    """
+    pairs = [(k, pt) for k, pt in pairs if k and pt != (0, 0)]
+    if not pairs: return INFINITY
+    bits = max(k.bit_length() for k, _ in pairs)
+    c = _pippenger_window(len(pairs), bits)
+    mask = (1 << c) - 1
+    res = INFINITY
+    for shift in range(((bits + c - 1) // c - 1) * c, -1, -c):
+        for _ in range(c):
+            res = jac_double(res, mod, a)
+        buckets = [INFINITY] * mask
+        for k, pt in pairs:
+            d = (k >> shift) & mask
+            if d: buckets[d - 1] = jac_add_affine(buckets[d - 1], pt, mod, a)
+        running = acc = INFINITY
+        for b in reversed(buckets):
+            running = jac_add(running, b, mod, a)
+            acc = jac_add(acc, running, mod, a)
+        res = jac_add(res, acc, mod, a)
+    return res
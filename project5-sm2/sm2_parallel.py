@@ -0,0 +1,91 @@
+import os
+import asyncio
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import sm2_curve
+from sm2 import Processor
+
+#每个工作进程各持有一个Processor；G的固定基表在进程启动时从父进程写出的文件加载
+_WORKER = None
+
+
+def _init_worker(key_data, table_path):
+    global _WORKER
+    if table_path: os.environ[sm2_curve.G_TABLE_ENV] = table_path
+    sm2_curve.g_table()
+    _WORKER = Processor(key_data)
+
+
+def _run_chunk(method, chunk):
+    fn = getattr(_WORKER, method)
+    return [fn(*args) for args in chunk]
+
+
+class ParallelProcessor:
+    """
+    多进程的Processor前端：把process/verify/secret_encode/secret_decode任务按块分发到
+    ProcessPoolExecutor，结果按输入顺序返回。所有工作进程共用同一密钥对。
+    """
+
+    METHODS = ('process', 'verify', 'secret_encode', 'secret_decode')
+
+    def __init__(self, key_data=None, workers=None, chunk_size=32):
+        self.local = Processor(key_data)
+        self.d_key, self.p_key = self.local.d_key, self.local.p_key
+        self.chunk_size = chunk_size
+        self._own_table = None
+        table_path = os.environ.get(sm2_curve.G_TABLE_ENV)
+        if not table_path:
+            fd, table_path = tempfile.mkstemp(suffix='.sm2t')
+            os.close(fd)
+            sm2_curve.g_table().save(table_path)
+            self._own_table = table_path
+        elif not os.path.exists(table_path):
+            #指定的表文件还不存在：在父进程中建好并写出一次，工作进程只加载，不会各自建表并发写同一文件
+            sm2_curve.g_table()
+            if not os.path.exists(table_path): sm2_curve.g_table().save(table_path)
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            initargs=((self.d_key, self.p_key), table_path))
+
+    def _submit(self, method, args_list):
+        if method not in self.METHODS: raise ValueError("error")
+        args_list = list(args_list)
+        return [self._pool.submit(_run_chunk, method, args_list[i:i + self.chunk_size])
+                for i in range(0, len(args_list), self.chunk_size)]
+
+    def map(self, method, args_list):
+        """args_list为各次调用的参数元组，返回与之一一对应的结果列表。"""
+        out = []
+        for fut in self._submit(method, args_list):
+            out.extend(fut.result())
+        return out
+
+    async def amap(self, method, args_list):
+        """map的asyncio版本，等待期间不阻塞事件循环。"""
+        chunks = await asyncio.gather(*(asyncio.wrap_future(f) for f in self._submit(method, args_list)))
+        return [res for chunk in chunks for res in chunk]
+
+    def process_many(self, msgs, user_id):
+        return self.map('process', [(m, user_id) for m in msgs])
+
+    def verify_many(self, msgs, user_id, sigs):
+        return self.map('verify', [(m, user_id, s) for m, s in zip(msgs, sigs)])
+
+    def secret_encode_many(self, datas):
+        return self.map('secret_encode', [(d,) for d in datas])
+
+    def secret_decode_many(self, ciphers):
+        return self.map('secret_decode', [(c,) for c in ciphers])
+
+    def close(self):
+        self._pool.shutdown()
+        if self._own_table:
+            os.remove(self._own_table)
+            self._own_table = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
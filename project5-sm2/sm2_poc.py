@@ -1,9 +1,11 @@
 import secrets
 import binascii
 from hashlib import sha256
-from gmssl import sm3, func
+from sm3_backend import sm3_digest
 import time
 import functools
+from sm2_curve import g_mult
+from sm2_cache import make_cache
 
 #参数表
 _CONFIG = {
@@ -17,24 +19,28 @@ _CONFIG = {
                 0x0680512BCBB42C07D47349D2153B70C4E5D7FDFCBFA36EA1A85841B9E46E09A2),
 }
 
-_CACHE_A = {}
-_CACHE_B = {}
+#缓存只保存会被重复使用的结果：(uid, 公钥)的Z值、常量的模逆（如签名中的(1+d)^-1）
+#以及非G点的倍点链；G的标量乘走sm2_curve共享的固定基表
+_H_CACHE = make_cache('sm2_poc.h', 4096)
+_INV_CACHE = make_cache('sm2_poc.inverse', 1024, 'lfu')
+_CHAIN_CACHE = make_cache('sm2_poc.doubling_chain', 64)
 
 
-def _core_op(v, m):
-    if (v, m) in _CACHE_A: return _CACHE_A[(v, m)]
+def _core_op(v, m, cached=False):
+    if cached:
+        res = _INV_CACHE.get((v, m))
+        if res is not None: return res
     if v == 0: return 0
     l, h, low, high = 1, 0, v % m, m
     while low > 1:
         r = high // low
         l, low, h, high = h - l * r, high - low * r, l, low
     res = l % m
-    _CACHE_A[(v, m)] = res
+    if cached: _INV_CACHE.put((v, m), res)
     return res
 
 
 def _vector_add(p1, p2):
-    if (p1, p2) in _CACHE_B: return _CACHE_B[(p1, p2)]
     if p1 == (0, 0): return p2
     if p2 == (0, 0): return p1
     x1, y1 = p1
@@ -50,21 +56,31 @@ def _vector_add(p1, p2):
     s %= mod
     x3 = (s * s - x1 - x2) % mod
     y3 = (s * (x1 - x3) - y1) % mod
-    res = (x3, y3)
-    _CACHE_B[(p1, p2)] = res
-    return res
+    return (x3, y3)
+
+
+def _doubling_chain(p, n):
+    #[p, 2p, 4p, ...]，至少n项
+    chain = _CHAIN_CACHE.get(p)
+    if chain is None or len(chain) < n:
+        chain = list(chain or [p])
+        while len(chain) < n:
+            chain.append(_vector_add(chain[-1], chain[-1]))
+        _CHAIN_CACHE.put(p, chain)
+    return chain
 
 
 def _vector_scale(s, p):
-    res, cur = (0, 0), p
-    while s:
-        if s & 1: res = _vector_add(res, cur)
-        cur = _vector_add(cur, cur)
-        s >>= 1
+    if p == _CONFIG['point_g']: return g_mult(s)
+    res = (0, 0)
+    for i, cur in enumerate(_doubling_chain(p, s.bit_length())):
+        if s >> i & 1: res = _vector_add(res, cur)
     return res
 
 
 def _calc_h(uid, px, py):
+    h = _H_CACHE.get((uid, px, py))
+    if h is not None: return h
     l = len(uid.encode('utf-8')) * 8
     comps = [
         l.to_bytes(2, 'big'), uid.encode('utf-8'),
@@ -73,7 +89,9 @@ def _calc_h(uid, px, py):
         px.to_bytes(32, 'big'), py.to_bytes(32, 'big')
     ]
     data = b''.join(comps)
-    return bytes.fromhex(sm3.sm3_hash(func.bytes_to_list(data)))
+    h = sm3_digest(data)
+    _H_CACHE.put((uid, px, py), h)
+    return h
 
 
 def _get_params():
@@ -91,14 +109,14 @@ class DataProcessor:
         msg, uid, k = data['msg'], data['uid'], data.get('k')
 
         h_val = _calc_h(uid, p[0], p[1])
-        e = int(sm3.sm3_hash(func.bytes_to_list(h_val + msg.encode('utf-8'))), 16)
+        e = int.from_bytes(sm3_digest(h_val + msg.encode('utf-8')), 'big')
 
         k_val = k if k else secrets.randbelow(_CONFIG['order'] - 1) + 1
         x_k = _vector_scale(k_val, _CONFIG['point_g'])[0]
         r = (e + x_k) % _CONFIG['order']
         if r == 0 or r + k_val == _CONFIG['order']: return None
 
-        s = (_core_op(1 + d, _CONFIG['order']) * (k_val - r * d)) % _CONFIG['order']
+        s = (_core_op(1 + d, _CONFIG['order'], cached=True) * (k_val - r * d)) % _CONFIG['order']
         return {'r': r, 's': s, 'k': k_val, 'e': e}
 
     def process_ecdsa_data(self, data):
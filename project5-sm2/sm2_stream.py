@@ -0,0 +1,130 @@
+import os
+import secrets
+from sm2 import _a_op, _x_op, _xor_op, C4, G
+from sm3_backend import new as sm3_new
+
+#流式SM2公钥加密/解密，密文格式与Processor.secret_encode相同：C1(64) || C3(32) || C2
+#KDF按计数器模式逐块产生密钥流，C3在数据流过时增量计算，内存占用与数据长度无关
+
+CHUNK_SIZE = 1 << 16
+
+
+class _KeyStream:
+    """
+    KDF(Z)的计数器模式密钥流：第i块为SM3(Z || ct_i)。Z恰为64字节，
+    因此先压缩Z得到中间状态，每块只需再压缩一次计数器所在的分组。
+    """
+
+    def __init__(self, z):
+        self._base = sm3_new(z)
+        self._ct = 1
+        self._buf = bytearray()
+        self.nonzero = False
+
+    def read(self, n):
+        blocks = []
+        for _ in range((n - len(self._buf) + 31) // 32):
+            h = self._base.copy()
+            h.update(self._ct.to_bytes(4, 'big'))
+            blocks.append(h.digest())
+            self._ct += 1
+        self._buf += b''.join(blocks)
+        out = bytes(self._buf[:n])
+        del self._buf[:n]
+        if not self.nonzero and out.count(0) != n: self.nonzero = True
+        return out
+
+
+class StreamEncryptor:
+    """
+    增量加密器：header为C1，update(chunk)返回对应的C2片段，finalize()返回C3。
+    写文件时先写C1和32字节占位，数据写完后再回填C3。
+    """
+
+    def __init__(self, p_key):
+        if p_key == (0, 0): raise ValueError("error")
+        k = secrets.randbelow(C4 - 1) + 1
+        x1, y1 = _a_op(k, G)
+        x2, y2 = _a_op(k, p_key)
+        xb, yb = x2.to_bytes(32, 'big'), y2.to_bytes(32, 'big')
+        self.header = x1.to_bytes(32, 'big') + y1.to_bytes(32, 'big')
+        self._yb = yb
+        self._ks = _KeyStream(xb + yb)
+        self._c3 = sm3_new(xb)
+
+    def update(self, data):
+        self._c3.update(data)
+        return _xor_op(data, self._ks.read(len(data)))
+
+    def finalize(self):
+        #与secret_encode一致：密钥流全为0（含明文为空）时报错
+        if not self._ks.nonzero: raise ValueError("error")
+        self._c3.update(self._yb)
+        return self._c3.digest()
+
+
+class StreamDecryptor:
+    """
+    增量解密器：用C1 || C3构造，update(chunk)返回明文片段，finalize()校验C3。
+    注意明文在校验前就已产出，调用方须在finalize()通过后才能信任这些数据。
+    """
+
+    def __init__(self, d_key, header):
+        if len(header) != 96: raise ValueError("error")
+        c1_p = (int.from_bytes(header[:32], 'big'), int.from_bytes(header[32:64], 'big'))
+        x2, y2 = _a_op(d_key, c1_p)
+        xb, yb = x2.to_bytes(32, 'big'), y2.to_bytes(32, 'big')
+        self._c3_expected = bytes(header[64:96])
+        self._yb = yb
+        self._ks = _KeyStream(xb + yb)
+        self._c3 = sm3_new(xb)
+
+    def update(self, data):
+        plain = _xor_op(data, self._ks.read(len(data)))
+        self._c3.update(plain)
+        return plain
+
+    def finalize(self):
+        if not self._ks.nonzero: raise ValueError("error")
+        self._c3.update(self._yb)
+        if not _x_op(self._c3.digest(), self._c3_expected): raise ValueError("error")
+
+
+def _chunks(f, chunk_size):
+    #复用同一块缓冲区读取，memoryview切片不产生拷贝
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    while True:
+        n = f.readinto(buf)
+        if not n: return
+        yield view[:n]
+
+
+def encrypt_file(p_key, src, dst, chunk_size=CHUNK_SIZE):
+    enc = StreamEncryptor(p_key)
+    with open(src, 'rb') as fi:
+        try:
+            with open(dst, 'wb') as fo:
+                fo.write(enc.header + bytes(32))
+                for chunk in _chunks(fi, chunk_size):
+                    fo.write(enc.update(chunk))
+                c3 = enc.finalize()
+                fo.seek(64)
+                fo.write(c3)
+        except ValueError:
+            os.remove(dst)
+            raise
+
+
+def decrypt_file(d_key, src, dst, chunk_size=CHUNK_SIZE):
+    #C3校验失败时删除已写出的明文文件
+    with open(src, 'rb') as fi:
+        dec = StreamDecryptor(d_key, fi.read(96))
+        try:
+            with open(dst, 'wb') as fo:
+                for chunk in _chunks(fi, chunk_size):
+                    fo.write(dec.update(chunk))
+            dec.finalize()
+        except ValueError:
+            os.remove(dst)
+            raise
@@ -1,5 +1,6 @@
 from ecpy.curves import Curve, Point
 import random
+from sm2_curve import multi_scalar_mul
 
 
 class OrbitalSystem:
@@ -71,8 +72,10 @@ class SimulationCore:
         u1 = (e * s_inv) % self.system.mass
         u2 = (r * s_inv) % self.system.mass
 
-        reconstructed_vector = u1 * self.system.initial_position + u2 * self.system.target_position
-        return reconstructed_vector.x % self.system.mass == r
+        curve = self.system.system
+        g, t = self.system.initial_position, self.system.target_position
+        rx, _ = multi_scalar_mul([(u1, (g.x, g.y)), (u2, (t.x, t.y))], mod=curve.field, a=curve.a)
+        return rx % self.system.mass == r
 
 
 class ResultReporter:
@@ -0,0 +1,170 @@
+import os
+import ctypes
+import hashlib
+
+#可插拔的SM3哈希后端：bytes输入/bytes输出，支持增量update()/digest()/copy()
+#导入时按 hashlib(OpenSSL) > 原生库(project4-sm3/libsm3.so) > gmssl 的顺序选用可用的最快实现，
+#也可用环境变量SM3_BACKEND强制指定；原生库编译方法见project4-sm3/sm3_capi.cpp
+
+BACKEND_ENV = 'SM3_BACKEND'
+LIB_ENV = 'SM3_LIB'
+_LIB_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'project4-sm3', 'libsm3.so')
+
+
+class _BlockSM3:
+    """分组缓冲与填充逻辑，压缩函数由子类实现。"""
+
+    digest_size = 32
+    block_size = 64
+
+    def __init__(self, data=b''):
+        self._v = self._new_state()
+        self._buf = bytearray()
+        self._len = 0
+        if data: self.update(data)
+
+    def update(self, data):
+        self._len += len(data)
+        buf = self._buf
+        buf += data
+        full = len(buf) - len(buf) % 64
+        if full:
+            self._v = self._compress(self._v, buf, full)
+            del buf[:full]
+
+    def copy(self):
+        other = self.__class__.__new__(self.__class__)
+        other._v = self._copy_state(self._v)
+        other._buf = bytearray(self._buf)
+        other._len = self._len
+        return other
+
+    def digest(self):
+        tail = bytearray(self._buf)
+        tail.append(0x80)
+        tail += bytes((56 - len(tail)) % 64) + (self._len * 8).to_bytes(8, 'big')
+        v = self._compress(self._copy_state(self._v), tail, len(tail))
+        return self._state_bytes(v)
+
+    def hexdigest(self):
+        return self.digest().hex()
+
+
+class GmsslSM3(_BlockSM3):
+    name = 'gmssl'
+
+    def _new_state(self):
+        return list(_gmssl_sm3.IV)
+
+    def _copy_state(self, v):
+        return list(v)
+
+    def _compress(self, v, data, nbytes):
+        for i in range(0, nbytes, 64):
+            v = _gmssl_sm3.sm3_cf(v, data[i:i + 64])
+        return v
+
+    def _state_bytes(self, v):
+        return b''.join(x.to_bytes(4, 'big') for x in v)
+
+
+class NativeSM3(_BlockSM3):
+    name = 'native'
+
+    def _new_state(self):
+        v = (ctypes.c_uint32 * 8)()
+        _lib.sm3_init(v)
+        return v
+
+    def _copy_state(self, v):
+        return (ctypes.c_uint32 * 8)(*v)
+
+    def _compress(self, v, data, nbytes):
+        _lib.sm3_compress_blocks(v, (ctypes.c_char * len(data)).from_buffer(data), nbytes // 64)
+        return v
+
+    def _state_bytes(self, v):
+        return b''.join(x.to_bytes(4, 'big') for x in v)
+
+
+def _load_gmssl():
+    global _gmssl_sm3
+    from gmssl import sm3
+    _gmssl_sm3 = sm3
+    return True
+
+
+def _load_native():
+    global _lib
+    lib = ctypes.CDLL(os.environ.get(LIB_ENV, _LIB_DEFAULT))
+    lib.sm3_init.argtypes = [ctypes.c_void_p]
+    lib.sm3_compress_blocks.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t]
+    lib.sm3_digest.argtypes = [ctypes.c_char_p, ctypes.c_size_t, ctypes.c_char_p]
+    _lib = lib
+    return True
+
+
+def _load_hashlib():
+    hashlib.new('sm3')
+    return True
+
+
+def _native_digest(data):
+    out = ctypes.create_string_buffer(32)
+    data = bytes(data)
+    _lib.sm3_digest(data, len(data), out)
+    return out.raw
+
+
+_BACKENDS = {
+    'hashlib': (_load_hashlib, lambda data=b'': hashlib.new('sm3', data), lambda data: hashlib.new('sm3', data).digest()),
+    'native': (_load_native, NativeSM3, _native_digest),
+    'gmssl': (_load_gmssl, GmsslSM3, lambda data: GmsslSM3(data).digest()),
+}
+_ORDER = ('hashlib', 'native', 'gmssl')
+_gmssl_sm3 = None
+_lib = None
+
+
+def available_backends():
+    names = []
+    for name in _ORDER:
+        try:
+            _BACKENDS[name][0]()
+        except (ImportError, OSError, ValueError, AttributeError):
+            continue
+        names.append(name)
+    return names
+
+
+def use_backend(name):
+    """切换当前后端，后端不可用时抛出异常。"""
+    global BACKEND, _factory, _digest
+    loader, factory, digest = _BACKENDS[name]
+    loader()
+    BACKEND, _factory, _digest = name, factory, digest
+
+
+def new(data=b''):
+    return _factory(data)
+
+
+def sm3_digest(data):
+    return _digest(data)
+
+
+def _select():
+    forced = os.environ.get(BACKEND_ENV)
+    for name in ([forced] if forced else _ORDER):
+        try:
+            use_backend(name)
+            return
+        except (ImportError, OSError, ValueError, AttributeError):
+            continue
+    raise ImportError("no SM3 backend available")
+
+
+BACKEND = None
+_factory = None
+_digest = None
+_select()
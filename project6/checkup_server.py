@@ -0,0 +1,132 @@
+import os
+import json
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Iterable, Tuple
+from psi_core import make_group
+from psi_encoding import make_tag
+
+# Password Checkup服务端：泄露凭据集合在入库时就用长期密钥b盲化为H(y)^b，按凭据哈希前缀分桶存盘。
+# 查询时客户端只透露前缀与H(x)^a，服务端返回(H(x)^a)^b和该前缀桶内的全部标签；
+# 客户端用a^-1解盲得到H(x)^b，在桶内比较。每次查询只读一个桶、做一次指数运算，与库大小无关。
+#
+# 目录结构：meta.json（群、前缀位数、标签长度）、server.key（长期密钥，仅属主可读）、
+#           buckets/<前缀十六进制>.bin（定长标签首尾相接，只追加）
+
+PREFIX_BITS = 16
+TAG_BYTES = 16
+
+
+def credential_prefix(credential: str, prefix_bits: int = PREFIX_BITS) -> int:
+    """凭据的哈希前缀，决定它落在哪个桶；与群上的哈希H无关"""
+    h = int.from_bytes(hashlib.sha256(credential.encode()).digest()[:4], 'big')
+    return h >> (32 - prefix_bits)
+
+
+class BreachStore:
+    """持久化的预盲化泄露库，支持增量insert与按桶查询"""
+
+    def __init__(self, path: str, group: str = 'modp', prefix_bits: int = PREFIX_BITS, tag_bytes: int = TAG_BYTES):
+        self.path = path
+        self._bucket_dir = os.path.join(path, 'buckets')
+        meta_path = os.path.join(path, 'meta.json')
+        key_path = os.path.join(path, 'server.key')
+        if os.path.exists(meta_path):
+            # 打开已有的库：参数以库中记录为准
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(key_path) as f:
+                self._secret = int(f.read(), 16)
+        else:
+            if not 1 <= prefix_bits <= 32: raise ValueError("prefix_bits须在1到32之间")
+            # 长期库需要固定的群参数，每次随机生成的dh群无法在重新打开时复现
+            if group == 'dh': raise ValueError("泄露库须使用固定的群（modp或sm2）")
+            meta = {'group': group, 'prefix_bits': prefix_bits, 'tag_bytes': tag_bytes}
+            os.makedirs(self._bucket_dir, exist_ok=True)
+            self._secret = make_group(group).random_exponent()
+            fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                f.write(hex(self._secret))
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f)
+        self.group_name = meta['group']
+        self.group = make_group(self.group_name)
+        self.prefix_bits = meta['prefix_bits']
+        self.tag_bytes = meta['tag_bytes']
+        self._lock = threading.Lock()
+
+    def _bucket_path(self, prefix: int) -> str:
+        return os.path.join(self._bucket_dir, f"{prefix:0{(self.prefix_bits + 3) // 4}x}.bin")
+
+    def _read_bucket(self, prefix: int) -> bytes:
+        try:
+            with open(self._bucket_path(prefix), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return b''
+
+    def insert(self, credentials: Iterable[str]) -> int:
+        """增量加入泄露凭据，已存在的跳过；返回新加入的条数。每个凭据一次指数运算，只改动涉及的桶"""
+        pending = defaultdict(list)
+        for cred in credentials:
+            blinded = self.group.process_element(cred, self._secret)
+            pending[credential_prefix(cred, self.prefix_bits)].append(make_tag(self.group, blinded, self.tag_bytes))
+        added = 0
+        with self._lock:
+            for prefix, tags in pending.items():
+                data = self._read_bucket(prefix)
+                w = self.tag_bytes
+                existing = {data[i:i + w] for i in range(0, len(data), w)}
+                fresh = []
+                for t in tags:
+                    if t not in existing:
+                        existing.add(t)
+                        fresh.append(t)
+                if fresh:
+                    with open(self._bucket_path(prefix), 'ab') as f:
+                        f.write(b''.join(fresh))
+                    added += len(fresh)
+        return added
+
+    def query(self, prefix: int, blinded) -> Tuple[object, bytes]:
+        """服务端应答：((H(x)^a)^b, 前缀桶内全部标签)"""
+        if not 0 <= prefix < 1 << self.prefix_bits: raise ValueError("前缀超出范围")
+        # 长期密钥b只作用于素数阶群中的元素，否则小阶元素或无效曲线上的点会逐步泄露b
+        if not self.group.is_element(blinded): raise ValueError("查询值不是群中的有效元素")
+        return self.group.exponentiate(blinded, self._secret), self._read_bucket(prefix)
+
+    def bucket_sizes(self) -> dict:
+        w = self.tag_bytes
+        return {name[:-4]: os.path.getsize(os.path.join(self._bucket_dir, name)) // w
+                for name in os.listdir(self._bucket_dir) if name.endswith('.bin')}
+
+    def __len__(self):
+        return sum(self.bucket_sizes().values())
+
+
+class CheckupClient:
+    """客户端：prepare()生成查询，check()用服务端应答判断凭据是否在泄露库中"""
+
+    def __init__(self, group: str = 'modp', prefix_bits: int = PREFIX_BITS, tag_bytes: int = TAG_BYTES):
+        self.group = make_group(group)
+        self.prefix_bits = prefix_bits
+        self.tag_bytes = tag_bytes
+        self._order = self.group.get_context()[1]
+
+    def prepare(self, credential: str) -> Tuple[int, object, int]:
+        """返回(前缀, H(x)^a, a)；a须留在本地供check使用"""
+        secret = self.group.random_exponent()
+        return (credential_prefix(credential, self.prefix_bits),
+                self.group.process_element(credential, secret), secret)
+
+    def check(self, response: Tuple[object, bytes], secret: int) -> bool:
+        double_blinded, bucket = response
+        # (H(x)^{ab})^{a^-1} = H(x)^b
+        tag = make_tag(self.group, self.group.exponentiate(double_blinded, pow(secret, -1, self._order)), self.tag_bytes)
+        w = self.tag_bytes
+        return any(bucket[i:i + w] == tag for i in range(0, len(bucket), w))
+
+    @classmethod
+    def for_store(cls, store: BreachStore) -> 'CheckupClient':
+        return cls(store.group_name, store.prefix_bits, store.tag_bytes)
@@ -1,168 +1,69 @@
-import random
-import hashlib
-from typing import List, Tuple, Dict
-from math import gcd
+from typing import List, Tuple
+from psi_core import CryptoCore, HiddenDataEngine, DiffieHellmanGroup, GROUPS, make_group, _SHUFFLER
+from psi_aggregate import Aggregator
+from psi_encoding import tag_length, make_tag, pack_tags, unpack_tags, build_index
 
-class CryptoCore:
-    
-    @staticmethod
-    def is_likely_prime(n: int, rounds: int = 128) -> bool:
-        """Miller-Rabin素性检测"""
-        if n in (2, 3): return True
-        if n < 2 or n % 2 == 0: return False
-        
-        # 分解n-1为d*2^s
-        d = n - 1
-        s = 0
-        while d % 2 == 0:
-            d //= 2
-            s += 1
-            
-        # 进行多轮测试
-        for _ in range(rounds):
-            a = random.randint(2, n - 2)
-            x = pow(a, d, n)
-            if x == 1 or x == n - 1:
-                continue
-            for _ in range(s - 1):
-                x = pow(x, 2, n)
-                if x == n - 1:
-                    break
-            else:
-                return False
-        return True
-    
-    @staticmethod
-    def generate_random_prime(size: int) -> int:
-        """生成指定位数的随机素数"""
-        while True:
-            candidate = random.getrandbits(size) | 1  # 确保是奇数
-            if CryptoCore.is_likely_prime(candidate):
-                return candidate
-    
-    @staticmethod
-    def modular_inverse(a: int, m: int) -> int:
-        """计算模逆元"""
-        return pow(a, -1, m)
-
-class HiddenDataEngine:
-    """基于Paillier的同态加密引擎"""
-    
-    def __init__(self, bit_length: int = 1024):
-        # 生成两个大素数
-        p1 = CryptoCore.generate_random_prime(bit_length // 2)
-        p2 = CryptoCore.generate_random_prime(bit_length // 2)
-        
-        self._N = p1 * p2  # 模数
-        self._N_squared = self._N * self._N
-        self._G = self._N + 1  # 固定生成元
-        
-        # 计算私钥参数
-        _lambda = (p1 - 1) * (p2 - 1) // gcd(p1 - 1, p2 - 1)
-        self._mu_secret = CryptoCore.modular_inverse(_lambda, self._N)
-        
-        self.key_public = self._N  # 公钥
-        self._key_private = (_lambda, self._mu_secret)  # 私钥
-    
-    def conceal(self, data: int) -> int:
-        """加密数据"""
-        rand_param = random.randint(1, self._N - 1)
-        while gcd(rand_param, self._N) != 1:
-            rand_param = random.randint(1, self._N - 1)
-        return (pow(self._G, data, self._N_squared) * pow(rand_param, self._N, self._N_squared)) % self._N_squared
-    
-    def unseal(self, encrypted_data: int) -> int:
-        """解密数据"""
-        _lambda, _mu = self._key_private
-        val = pow(encrypted_data, _lambda, self._N_squared)
-        l_func_val = (val - 1) // self._N
-        return (l_func_val * _mu) % self._N
-    
-    @staticmethod
-    def combine(c1: int, c2: int, mod_squared: int) -> int:
-        """同态加法：加密数据相加"""
-        return (c1 * c2) % mod_squared
-
-class DiffieHellmanGroup:
-    """Diffie-Hellman密钥交换组"""
-    
-    def __init__(self, key_length: int = 512):
-        # 生成安全素数p和子群阶q
-        while True:
-            prime_q = CryptoCore.generate_random_prime(key_length)
-            prime_p = 2 * prime_q + 1  # 确保p是安全素数
-            if CryptoCore.is_likely_prime(prime_p):
-                self._p = prime_p
-                self._q = prime_q
-                self._g = random.randint(2, prime_p - 2)  # 生成元
-                if pow(self._g, self._q, self._p) == 1:  # 验证生成元有效性
-                    break
-    
-    def get_context(self) -> Tuple[int, int, int]:
-        """获取DH参数(p, q, g)"""
-        return self._p, self._q, self._g
-    
-    def process_element(self, element: str, power: int) -> int:
-        """处理元素：H(element)^power mod p"""
-        hashed_val = int(hashlib.sha256(element.encode()).hexdigest(), 16)
-        return pow(pow(self._g, hashed_val % self._q, self._p), power, self._p)
-
-def collaborative_computation(data_provider_1: List[str], data_provider_2: List[Tuple[str, int]]):
-    """安全多方计算协议"""
+def collaborative_computation(data_provider_1: List[str], data_provider_2: List[Tuple[str, int]], group='dh', store=None,
+                              workers: int = 0, chunk_size: int = 256, index: str = None, fresh_key: bool = True):
+    """
+    安全多方计算协议；group为群后端名（见GROUPS）或已构造的群对象。
+    store为psi_params.ParamStore时复用其中已复核的DH参数，并为本次运行取一组预生成的Paillier密钥；
+    fresh_key=False时改为复用库中的同一组Paillier密钥（演示用）。
+    workers>0时各阶段的逐元素运算按chunk_size分块在进程池中执行（见psi_parallel.PhaseRunner）。
+    index为'set'/'cuckoo'/'bloom'时，方2把H(x)^{ab}截断为定长短标签发给方1，方1对标签建索引后逐个查询方2的元素
+    （见psi_encoding）；此时方1集合中的重复元素只计一次。
+    """
+    from psi_parallel import PhaseRunner
     
     print("--- 系统初始化阶段 ---")
-    shared_group = DiffieHellmanGroup()
-    P, Q, G = shared_group.get_context()
+    shared_group = make_group(group, store) if isinstance(group, str) else group
     
     # 各方生成秘密参数
-    secret_A = random.randint(1, Q - 1)  # 方1的秘密指数
-    secret_B = random.randint(1, Q - 1)  # 方2的秘密指数
-    secret_system = HiddenDataEngine()  # 同态加密系统
+    secret_A = shared_group.random_exponent()  # 方1的秘密指数
+    secret_B = shared_group.random_exponent()  # 方2的秘密指数
+    secret_system = store.paillier_engine(fresh=fresh_key) if store is not None else HiddenDataEngine()  # 同态加密系统
     public_param_N = secret_system.key_public
     print("初始化完毕。各方已拥有秘密参数。\n")
     
-    print("--- 阶段一：数据封装 ---")
-    # 方1处理自己的数据集
-    encrypted_set_A = [shared_group.process_element(item, secret_A) for item in data_provider_1]
-    random.shuffle(encrypted_set_A)  # 随机打乱顺序
-    print("方1已处理其集合。")
-    
-    print("--- 阶段二：交叉处理 ---")
-    # 方2处理方1的数据
-    cross_processed_A = [pow(val, secret_B, P) for val in encrypted_set_A]
-    shuffled_cross_A = cross_processed_A.copy()
-    random.shuffle(shuffled_cross_A)
-    
-    # 方2处理自己的数据集
-    processed_set_B = []
-    for item, value in data_provider_2:
-        _processed_item = shared_group.process_element(item, secret_B)
-        _concealed_value = secret_system.conceal(value)  # 加密数值
-        processed_set_B.append((_processed_item, _concealed_value))
-    random.shuffle(processed_set_B)
-    print("方2已完成对两组数据的交叉处理和封装。")
-    
-    print("--- 阶段三：数据匹配与汇总 ---")
-    # 方1处理方2的数据
-    final_processed_B = [(pow(h_val, secret_A, P), e_val) for h_val, e_val in processed_set_B]
-    
-    # 匹配相同项并累加加密值
-    matches_found = 0
-    final_sum_payloads = []
-    map_B = {h_val: e_val for h_val, e_val in final_processed_B}
-    
-    for val in shuffled_cross_A:
-        if val in map_B:
-            matches_found += 1
-            final_sum_payloads.append(map_B[val])
-    
-    # 同态累加所有匹配项的加密值
-    if not final_sum_payloads:
-        final_encrypted_sum = secret_system.conceal(0)
+    with PhaseRunner(shared_group, public_param_N, workers, chunk_size, secret_system) as runner:
+        print("--- 阶段一：数据封装 ---")
+        # 方1处理自己的数据集
+        encrypted_set_A = runner.process_elements(data_provider_1, secret_A)
+        _SHUFFLER.shuffle(encrypted_set_A)  # 随机打乱顺序
+        print("方1已处理其集合。")
+        
+        print("--- 阶段二：交叉处理 ---")
+        # 方2处理方1的数据
+        shuffled_cross_A = runner.exponentiate(encrypted_set_A, secret_B)
+        _SHUFFLER.shuffle(shuffled_cross_A)  # 原地打乱，不再保留未打乱的副本
+        if index is not None:
+            # 阶段三只需比较相等，方2只发送短标签
+            tag_len = tag_length(len(shuffled_cross_A), len(data_provider_2))
+            wire_A = pack_tags(make_tag(shared_group, val, tag_len) for val in shuffled_cross_A)
+        
+        # 方2处理自己的数据集：H(item)^secret_B 与 Enc(value)
+        processed_set_B = runner.process_and_conceal(data_provider_2, secret_B)
+        _SHUFFLER.shuffle(processed_set_B)
+        print("方2已完成对两组数据的交叉处理和封装。")
+        
+        print("--- 阶段三：数据匹配与汇总 ---")
+        # 方1处理方2的数据
+        final_h = runner.exponentiate([h_val for h_val, _ in processed_set_B], secret_A)
+        final_processed_B = [(h_val, e_val) for h_val, (_, e_val) in zip(final_h, processed_set_B)]
+    
+    # 匹配相同项，匹配项密文用树形归约同态累加（workers>0时并行）
+    if index is None:
+        map_B = dict(final_processed_B)
+        final_sum_payloads = [map_B[val] for val in shuffled_cross_A if val in map_B]
     else:
-        final_encrypted_sum = final_sum_payloads[0]
-        for i in range(1, len(final_sum_payloads)):
-            final_encrypted_sum = HiddenDataEngine.combine(final_encrypted_sum, final_sum_payloads[i], secret_system._N_squared)
+        tags_A = build_index(list(unpack_tags(wire_A, tag_len)), index, tag_len)
+        final_sum_payloads = [e_val for h_val, e_val in final_processed_B
+                              if make_tag(shared_group, h_val, tag_len) in tags_A]
+    matches_found = len(final_sum_payloads)
+    aggregator = Aggregator(secret_system._N_squared)
+    aggregator.add_many(final_sum_payloads, workers=workers)
+    # 方1只用公钥做一次重随机化，方2解密时看不出和是由哪些密文相乘得到的
+    final_encrypted_sum = aggregator.total(engine=HiddenDataEngine.from_public_key(public_param_N))
     
     print("方1已完成匹配和数据累加。")
     
@@ -183,8 +84,17 @@ if __name__ == "__main__":
         ("userF", 75)
     ]
     
-    # 执行安全计算
-    match_count, total_value = collaborative_computation(alpha_data, beta_data)
+    # 执行安全计算：参数从参数库加载并复用，只有首次运行（冷启动）时生成一次并存入
+    import time
+    from psi_params import ParamStore, DEFAULT_BITS
+    with ParamStore() as store:
+        for kind in ('dh', 'paillier'):
+            if not store.count(kind, DEFAULT_BITS[kind]):
+                print(f"参数库中没有{kind}参数，正在生成{DEFAULT_BITS[kind]}位参数（仅首次运行）...", flush=True)
+                start = time.perf_counter()
+                store.get(kind)
+                print(f"已生成并存入 {store.path}，用时 {time.perf_counter() - start:.1f} s\n")
+        match_count, total_value = collaborative_computation(alpha_data, beta_data, store=store, fresh_key=False)
     
     print("\n--- 最终核对 ---")
     print(f"预期匹配数量: 2")
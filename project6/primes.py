@@ -0,0 +1,200 @@
+import queue
+import random
+import secrets
+import multiprocessing
+from math import gcd
+from typing import List, Tuple
+
+# 素数生成：在随机起点后的一段候选窗口上做增量筛（每个小素数只求一次余数，随后按步长划掉倍数），
+# 幸存者再依次做Miller-Rabin；轮数按位长自适应，小于3.3e24的数用确定性底数。
+# 候选数由secrets生成并强制最高位为1，保证位长。
+
+
+def _small_primes(limit: int) -> List[int]:
+    """埃氏筛求limit以内的素数"""
+    flags = bytearray([1]) * limit
+    flags[0:2] = b'\x00\x00'
+    for i in range(2, int(limit ** 0.5) + 1):
+        if flags[i]:
+            flags[i * i::i] = bytearray(len(range(i * i, limit, i)))
+    return [i for i in range(limit) if flags[i]]
+
+
+SIEVE_LIMIT = 1 << 15
+SIEVE_PRIMES = _small_primes(SIEVE_LIMIT)
+SMALL_PRIMES = [r for r in SIEVE_PRIMES if r < 2000]
+# 2000以内小素数之积：与候选数求一次gcd即完成全部试除
+_SMALL_PRODUCT = 1
+for _r in SMALL_PRIMES:
+    _SMALL_PRODUCT *= _r
+
+# 前13个素数作底数时，Miller-Rabin对小于该界的数是确定性的
+_DETERMINISTIC_BOUND = 3317044064679887385961981
+_DETERMINISTIC_BASES = SMALL_PRIMES[:13]
+
+
+def mr_rounds(bits: int) -> int:
+    """
+    随机候选数的错误率低于约2^-80所需的Miller-Rabin轮数（OpenSSL 1.1.1 BN_prime_checks_for_size的取值）。
+    该表只对随机生成的候选数成立；检测外部给出、可能是精心构造的数时须显式指定足够多的轮数（如64）。
+    """
+    if bits >= 3747: return 3
+    if bits >= 1345: return 4
+    if bits >= 476: return 5
+    if bits >= 400: return 6
+    if bits >= 347: return 7
+    if bits >= 308: return 8
+    if bits >= 55: return 27
+    return 34
+
+
+def passes_sieve(n: int) -> bool:
+    """小素数试除：n有2000以内的素因子时返回False（n本身是小素数除外）"""
+    #边界含最大的小素数本身：原先用<，1999会被当作合数
+    if n <= SMALL_PRIMES[-1]: return n in SMALL_PRIMES
+    return gcd(n, _SMALL_PRODUCT) == 1
+
+
+def _miller_rabin(n: int, bases) -> bool:
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in bases:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def is_probable_prime(n: int, rounds: int = None) -> bool:
+    """先试除再做Miller-Rabin；rounds为None时按位长自适应（见mr_rounds，只适用于随机候选数）"""
+    if n in (2, 3): return True
+    if n < 2 or n % 2 == 0: return False
+    if not passes_sieve(n): return False
+    if n <= SMALL_PRIMES[-1]: return True
+    if n < _DETERMINISTIC_BOUND:
+        return _miller_rabin(n, _DETERMINISTIC_BASES)
+    rounds = rounds or mr_rounds(n.bit_length())
+    return _miller_rabin(n, (random.randint(2, n - 2) for _ in range(rounds)))
+
+
+def jacobi(a: int, n: int) -> int:
+    """
+    Jacobi符号(a/n)，n为正奇数；n为素数时即Legendre符号。
+    与欧拉判别法pow(a, (n-1)//2, n)结果一致，但只需类欧几里得的移位与取模，2048位时约快50倍
+    """
+    a %= n
+    result = 1
+    while a:
+        #(2/n) = -1 当且仅当 n ≡ 3, 5 (mod 8)
+        t = (a & -a).bit_length() - 1
+        a >>= t
+        if t & 1 and n & 7 in (3, 5): result = -result
+        #二次互反律：a与n都 ≡ 3 (mod 4)时变号
+        if a & n & 2: result = -result
+        a, n = n % a, a
+    return result if n == 1 else 0
+
+
+def _random_odd(bits: int) -> int:
+    return secrets.randbits(bits) | (1 << (bits - 1)) | 1
+
+
+def _sieve_window(start: int, window: int, safe: bool) -> bytearray:
+    """
+    候选数为 start + 2i (0 ≤ i < window)。对每个小素数r只算一次start mod r，
+    c ≡ 0 (mod r) 的i构成步长为r的等差数列，整段置0；safe时还要排除 2c+1 ≡ 0，即 c ≡ (r-1)/2 (mod r)。
+    """
+    flags = bytearray([1]) * window
+    for r in SIEVE_PRIMES[1:]:
+        inv2 = (r + 1) // 2
+        rem = start % r
+        i0 = (-rem) * inv2 % r
+        flags[i0::r] = bytes(len(range(i0, window, r)))
+        if safe:
+            i1 = ((r - 1) // 2 - rem) * inv2 % r
+            flags[i1::r] = bytes(len(range(i1, window, r)))
+    return flags
+
+
+def random_prime(bits: int) -> int:
+    """bits位（最高位为1）的随机素数"""
+    if bits < 16:
+        while True:
+            c = _random_odd(bits)
+            if is_probable_prime(c): return c
+    window = 4 * bits
+    while True:
+        start = _random_odd(bits)
+        flags = _sieve_window(start, window, False)
+        for i in range(window):
+            if not flags[i]: continue
+            c = start + 2 * i
+            if c.bit_length() != bits: break
+            if is_probable_prime(c): return c
+
+
+def _search_safe(q_bits: int, stop=None) -> Tuple[int, int]:
+    window = 8 * q_bits
+    while stop is None or not stop.is_set():
+        start = _random_odd(q_bits)
+        flags = _sieve_window(start, window, True)
+        for i in range(window):
+            if not flags[i]: continue
+            q = start + 2 * i
+            if q.bit_length() != q_bits: break
+            p = 2 * q + 1
+            # 先各做一轮快速排除；q为素数时，2^(p-1) ≡ 1 (mod p)即可由Pocklington判定p为素数
+            if not _miller_rabin(q, (2,)) or pow(2, p - 1, p) != 1:
+                continue
+            if is_probable_prime(q):
+                return p, q
+    return None
+
+
+def _safe_prime_worker(q_bits: int, stop, out):
+    res = _search_safe(q_bits, stop)
+    if res is not None:
+        out.put(res)
+        stop.set()
+
+
+def safe_prime(q_bits: int, workers: int = 1) -> Tuple[int, int]:
+    """
+    返回安全素数(p, q)，p = 2q+1，q为q_bits位素数。workers>1时多个进程各自独立搜索，
+    取最先找到的结果后通知其余进程停止。
+    """
+    if q_bits < 16 or workers <= 1:
+        if q_bits < 16:
+            while True:
+                q = _random_odd(q_bits)
+                if is_probable_prime(q) and is_probable_prime(2 * q + 1): return 2 * q + 1, q
+        return _search_safe(q_bits)
+    ctx = multiprocessing.get_context()
+    stop, out = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=_safe_prime_worker, args=(q_bits, stop, out), daemon=True) for _ in range(workers)]
+    for proc in procs: proc.start()
+    try:
+        #工作进程异常退出时不会放入结果，定期检查，避免永远阻塞
+        while True:
+            try:
+                return out.get(timeout=1)
+            except queue.Empty:
+                if any(proc.is_alive() for proc in procs): continue
+            #全部进程都已退出：结果可能在退出前刚放入，再取一次
+            try:
+                return out.get(timeout=1)
+            except queue.Empty:
+                raise RuntimeError("安全素数搜索进程全部异常退出") from None
+    finally:
+        stop.set()
+        for proc in procs:
+            proc.join(timeout=5)
+            if proc.is_alive(): proc.terminate()
@@ -0,0 +1,98 @@
+import threading
+from itertools import islice
+from typing import Dict, Hashable, Iterable
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Paillier密文的同态聚合：Enc(a)·Enc(b) = Enc(a+b) (mod N²)，乘法可交换，因此可任意分块、并行、分层归约
+CHUNK = 4096
+
+
+def _batches(iterable, size: int):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk: return
+        yield chunk
+
+
+def _pairwise(values, mod_squared: int) -> int:
+    """相邻两两相乘逐层归约；空输入返回1（即r=1时的Enc(0)）"""
+    values = list(values)
+    if not values: return 1
+    while len(values) > 1:
+        nxt = [values[i] * values[i + 1] % mod_squared for i in range(0, len(values) - 1, 2)]
+        if len(values) & 1: nxt.append(values[-1])
+        values = nxt
+    return values[0]
+
+
+def tree_reduce(ciphertexts: Iterable[int], mod_squared: int, workers: int = 0, chunk_size: int = CHUNK) -> int:
+    """
+    把任意长的密文迭代器归约为一个密文：每chunk_size个一块做树形归约，块结果再树形合并。
+    workers>0时各块在进程池中并行，同时在途的块不超过2·workers个，内存与输入长度无关。
+    """
+    partials = []
+    if not workers:
+        for chunk in _batches(ciphertexts, chunk_size):
+            partials.append(_pairwise(chunk, mod_squared))
+        return _pairwise(partials, mod_squared)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in _batches(ciphertexts, chunk_size):
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                partials.extend(f.result() for f in done)
+            pending.add(pool.submit(_pairwise, chunk, mod_squared))
+        partials.extend(f.result() for f in pending)
+    return _pairwise(partials, mod_squared)
+
+
+class Aggregator:
+    """
+    在线同态累加器：匹配项到达时即乘入对应的桶（如按类别分别求和），bucket=None为默认桶。
+    total()/totals()给出engine（公钥引擎即可）时，结果再乘一个新的Enc(0)重随机化，
+    这样解密方看不出结果由哪些密文相乘得到；空桶也因此得到正常的Enc(0)。
+    """
+
+    def __init__(self, mod_squared: int):
+        self._mod = mod_squared
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._counts = {}
+
+    def add(self, cipher: int, bucket: Hashable = None):
+        with self._lock:
+            prev = self._totals.get(bucket)
+            self._totals[bucket] = cipher if prev is None else prev * cipher % self._mod
+            self._counts[bucket] = self._counts.get(bucket, 0) + 1
+
+    def add_many(self, ciphers: Iterable[int], bucket: Hashable = None, workers: int = 0, chunk_size: int = CHUNK):
+        """批量加入同一个桶，用tree_reduce归约后再乘入"""
+        counter = [0]
+
+        def counted():
+            for c in ciphers:
+                counter[0] += 1
+                yield c
+
+        partial = tree_reduce(counted(), self._mod, workers, chunk_size)
+        if not counter[0]: return
+        with self._lock:
+            prev = self._totals.get(bucket)
+            self._totals[bucket] = partial if prev is None else prev * partial % self._mod
+            self._counts[bucket] = self._counts.get(bucket, 0) + counter[0]
+
+    def count(self, bucket: Hashable = None) -> int:
+        return self._counts.get(bucket, 0)
+
+    def buckets(self):
+        return list(self._totals)
+
+    def total(self, bucket: Hashable = None, engine=None) -> int:
+        value = self._totals.get(bucket, 1)
+        if engine is not None:
+            value = value * engine.conceal(0) % self._mod
+        return value
+
+    def totals(self, engine=None) -> Dict[Hashable, int]:
+        return {bucket: self.total(bucket, engine) for bucket in self.buckets()}
@@ -0,0 +1,374 @@
+import io
+import os
+import time
+import random
+import tempfile
+import contextlib
+import main
+
+
+def _datasets(n):
+    #两方各n个元素，一半重叠；返回 (方1集合, 方2集合, 预期匹配数, 预期总和)
+    half = n // 2
+    data_1 = [f"user{i}" for i in range(n)]
+    data_2 = [(f"user{i}", i % 1000) for i in range(half)] + [(f"other{i}", 1) for i in range(n - half)]
+    return data_1, data_2, half, sum(i % 1000 for i in range(half))
+
+
+def _quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def bench_groups(sizes=(1000,), groups=('dh', 'modp', 'sm2'), samples=200):
+    print("--- PSI群后端：单元素耗时与协议总耗时 ---")
+    for name in groups:
+        start = time.perf_counter()
+        group = main.make_group(name)
+        setup = time.perf_counter() - start
+        k = group.random_exponent()
+        items = [f"sample{i}" for i in range(samples)]
+        start = time.perf_counter()
+        blinded = [group.process_element(e, k) for e in items]
+        proc_t = (time.perf_counter() - start) / samples
+        start = time.perf_counter()
+        for v in blinded: group.exponentiate(v, k)
+        exp_t = (time.perf_counter() - start) / samples
+        print(f"[{name}] 建群 {setup:.2f} s  process_element {proc_t * 1e3:.3f} ms  exponentiate {exp_t * 1e3:.3f} ms")
+        for n in sizes:
+            data_1, data_2, matches, total = _datasets(n)
+            start = time.perf_counter()
+            res = _quiet(main.collaborative_computation, data_1, data_2, group=group)
+            elapsed = time.perf_counter() - start
+            assert res == (matches, total)
+            print(f"    n={n:<8} 协议总耗时 {elapsed:8.2f} s  每元素 {elapsed / n * 1e3:.3f} ms")
+
+
+def bench_params(dh_bits=512, paillier_bits=1024):
+    print("--- 参数准备：冷启动（现场生成） vs 热启动（从参数库加载并复核） ---")
+    from psi_params import ParamStore
+    with tempfile.TemporaryDirectory() as path:
+        timings = {}
+        for label, store in (('冷启动', ParamStore(path)), ('热启动', ParamStore(path))):
+            start = time.perf_counter()
+            store.dh_group(dh_bits)
+            dh_t = time.perf_counter() - start
+            start = time.perf_counter()
+            store.paillier_engine(paillier_bits)
+            pa_t = time.perf_counter() - start
+            timings[label] = dh_t + pa_t
+            print(f"{label} DH群({dh_bits}位) {dh_t:8.3f} s  Paillier({paillier_bits}位) {pa_t:8.3f} s")
+        start = time.perf_counter()
+        store.dh_group(dh_bits)
+        store.paillier_engine(paillier_bits)
+        cached = time.perf_counter() - start
+        print(f"同一进程再次加载（已复核） {cached * 1e3:.2f} ms  冷/热 {timings['冷启动'] / timings['热启动']:.1f}x")
+
+
+def _legacy_is_prime(n, rounds=128):
+    #原实现的素性检测：不做试除，直接128轮随机底数Miller-Rabin
+    if n in (2, 3): return True
+    if n < 2 or n % 2 == 0: return False
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for _ in range(rounds):
+        a = random.randint(2, n - 2)
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _legacy_prime(bits):
+    #原实现（优化前的CryptoCore.generate_random_prime）原样照搬，仅作对照；不依赖primes模块
+    while True:
+        candidate = random.getrandbits(bits) | 1
+        if _legacy_is_prime(candidate): return candidate
+
+
+def bench_primes(sizes=(512, 1024, 2048), trials=3, safe_bits=(256, 512), workers=(1, 2)):
+    print("--- 素数生成：平均耗时（原实现 vs 窗口增量筛+自适应轮数） ---")
+    import primes
+    for bits in sizes:
+        row = []
+        for fn in (_legacy_prime, primes.random_prime):
+            start = time.perf_counter()
+            for _ in range(trials):
+                #原实现不强制最高位，结果可能短于bits位
+                assert fn(bits).bit_length() == bits or fn is _legacy_prime
+            row.append((time.perf_counter() - start) / trials)
+        print(f"{bits:>5}位素数  原实现 {row[0]:8.3f} s  新实现 {row[1]:8.3f} s  "
+              f"加速 {row[0] / row[1]:5.1f}x  (M-R {primes.mr_rounds(bits)}轮)")
+    print(f"本机CPU核数 {os.cpu_count()}")
+    for bits in safe_bits:
+        for w in workers:
+            start = time.perf_counter()
+            for _ in range(trials):
+                p, q = primes.safe_prime(bits, w)
+                assert p == 2 * q + 1 and q.bit_length() == bits
+            print(f"{bits:>5}位安全素数(q)  {w}个进程 {(time.perf_counter() - start) / trials:8.3f} s")
+
+
+def bench_scaling(n=2000, workers=(0, 1, 2, 4), group='modp', chunk_size=256):
+    print(f"--- 多进程分块执行：n={n}，群{group}，每块{chunk_size}个元素 ---")
+    print(f"本机CPU核数 {os.cpu_count()}")
+    group = main.make_group(group)
+    data_1, data_2, matches, total = _datasets(n)
+    base = None
+    for w in workers:
+        start = time.perf_counter()
+        res = _quiet(main.collaborative_computation, data_1, data_2, group=group, workers=w, chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start
+        assert res == (matches, total)
+        base = base or elapsed
+        label = "单进程顺序" if w == 0 else f"{w}个工作进程"
+        print(f"{label:<10} {elapsed:8.2f} s  加速比 {base / elapsed:4.2f}x")
+
+
+def _stream_run(n, group, max_records):
+    #在独立进程中运行，返回(结果, 耗时, 该进程的峰值RSS MB)
+    import resource
+    import psi_stream
+    #溢出文件与打乱用的分桶都在临时目录中，结束时一并删除
+    with tempfile.TemporaryDirectory() as path:
+        data_1, data_2, _, _ = _datasets(n)
+        with open(os.path.join(path, 'p1.txt'), 'w') as f:
+            f.writelines(f"{x}\n" for x in data_1)
+        with open(os.path.join(path, 'p2.txt'), 'w') as f:
+            f.writelines(f"{x},{v}\n" for x, v in data_2)
+        del data_1, data_2
+        start = time.perf_counter()
+        res = psi_stream.streaming_computation(psi_stream.read_ids(os.path.join(path, 'p1.txt')),
+                                               psi_stream.read_pairs(os.path.join(path, 'p2.txt')),
+                                               group=group, workdir=path, max_records=max_records)
+        elapsed = time.perf_counter() - start
+    return res, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_stream(sizes=(1000, 4000), group='modp', max_records=1024):
+    print(f"--- 外存流式PSI：峰值内存与集合大小无关（每批至多{max_records}条记录在内存中） ---")
+    from concurrent.futures import ProcessPoolExecutor
+    for n in sizes:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            res, elapsed, rss = pool.submit(_stream_run, n, group, max_records).result()
+        _, _, matches, total = _datasets(n)
+        assert res == (matches, total)
+        print(f"n={n:<8} 耗时 {elapsed:8.2f} s  每元素 {elapsed / n * 1e3:.2f} ms  峰值RSS {rss:.1f} MB")
+
+
+def _legacy_conceal(engine, data):
+    #原实现：g^m与r^N各做一次模N²的模幂，仅作对照
+    r = random.randint(1, engine._N - 1)
+    return pow(engine._G, data, engine._N_squared) * pow(r, engine._N, engine._N_squared) % engine._N_squared
+
+
+def _legacy_unseal(engine, c):
+    _lambda, _mu = engine._key_private
+    return (pow(c, _lambda, engine._N_squared) - 1) // engine._N * _mu % engine._N
+
+
+def _per_sec(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds): fn()
+    return rounds / (time.perf_counter() - start)
+
+
+def bench_paillier(bits=1024, rounds=200):
+    print(f"--- Paillier({bits}位)：每秒加密/解密次数 ---")
+    engine = main.HiddenDataEngine(bits)
+    public = main.HiddenDataEngine.from_public_key(engine.key_public)
+    c = engine.conceal(12345)
+    assert _legacy_unseal(engine, c) == engine.unseal(c) == 12345
+    assert engine.unseal(_legacy_conceal(engine, 42)) == 42
+    rows = [
+        ("加密 原实现", _per_sec(lambda: _legacy_conceal(engine, 12345), rounds)),
+        ("加密 公钥方(g=N+1)", _per_sec(lambda: public.conceal(12345), rounds)),
+        ("加密 私钥方(CRT)", _per_sec(lambda: engine.conceal(12345), rounds)),
+    ]
+    engine.precompute_noise(rounds)
+    rows.append(("加密 噪声池在线阶段", _per_sec(lambda: engine.conceal(12345), rounds)))
+    rows.append(("解密 原实现", _per_sec(lambda: _legacy_unseal(engine, c), rounds)))
+    rows.append(("解密 CRT", _per_sec(lambda: engine.unseal(c), rounds)))
+    for label, rate in rows:
+        print(f"{label:<16} {rate:10.0f} 次/秒")
+
+
+def bench_aggregate(n=200_000, workers=(0, 2, 4), bits=1024):
+    print(f"--- 同态求和：{n}个密文（{2 * bits}位模数） ---")
+    import psi_aggregate
+    engine = main.HiddenDataEngine(bits)
+    mod = engine._N_squared
+    # 计时只关心模乘，用随机数代替真实密文；正确性另用少量真实密文检查
+    ciphers = [random.randrange(1, mod) for _ in range(n)]
+    vals = list(range(100))
+    assert engine.unseal(psi_aggregate.tree_reduce([engine.conceal(v) for v in vals], mod, 2, 16)) == sum(vals)
+    start = time.perf_counter()
+    acc = ciphers[0]
+    for c in ciphers[1:]:
+        acc = main.HiddenDataEngine.combine(acc, c, mod)
+    base = time.perf_counter() - start
+    print(f"逐个combine      {base:7.3f} s")
+    for w in workers:
+        start = time.perf_counter()
+        res = psi_aggregate.tree_reduce(iter(ciphers), mod, w)
+        elapsed = time.perf_counter() - start
+        assert res == acc
+        label = "树形归约 单进程" if w == 0 else f"树形归约 {w}进程"
+        print(f"{label:<14} {elapsed:7.3f} s  加速比 {base / elapsed:4.2f}x")
+    agg = psi_aggregate.Aggregator(mod)
+    start = time.perf_counter()
+    for i, c in enumerate(ciphers):
+        agg.add(c, bucket=i % 16)
+    online = time.perf_counter() - start
+    start = time.perf_counter()
+    agg.totals(engine=main.HiddenDataEngine.from_public_key(engine.key_public))
+    final = time.perf_counter() - start
+    print(f"在线累加到16个桶 {online:7.3f} s  最终重随机化16个桶 {final * 1e3:.1f} ms  (本机CPU核数 {os.cpu_count()})")
+
+
+def bench_encoding(n=100_000, lookups=50_000):
+    print(f"--- 盲化元素编码与匹配索引：n={n}（2048位MODP群） ---")
+    import sys
+    import psi_encoding
+    group = main.make_group('modp')
+    p = group.get_context()[0]
+    # 盲化后的元素在群中近似均匀，计时用随机群元素代替，省去n次模幂
+    values = [random.randrange(1, p) for _ in range(n)]
+    tag_len = psi_encoding.tag_length(n, n)
+    tags = [psi_encoding.make_tag(group, v, tag_len) for v in values]
+    probes = tags[:lookups // 2] + [psi_encoding.make_tag(group, random.randrange(1, p), tag_len)
+                                    for _ in range(lookups - lookups // 2)]
+    as_dict = dict.fromkeys(values, 0)
+    int_bytes = sum(sys.getsizeof(v) for v in values) / n
+    rows = [
+        ("Python int列表", int_bytes + 8, None),
+        ("dict(map_B式)", int_bytes + sys.getsizeof(as_dict) / n, None),
+        ("定长完整编码", group.element_size, None),
+        (f"{tag_len}字节短标签", tag_len, None),
+    ]
+    for kind in psi_encoding.INDEXES:
+        start = time.perf_counter()
+        index = psi_encoding.build_index(tags, kind, tag_len)
+        build = time.perf_counter() - start
+        size = (sys.getsizeof(index) + sum(sys.getsizeof(t) for t in tags)) / n if kind == 'set' else index.nbytes / n
+        rows.append((f"{kind}索引 (建 {build:.2f} s)", size, index))
+    probe_ints = values[:lookups // 2] + [random.randrange(1, p) for _ in range(lookups - lookups // 2)]
+    start = time.perf_counter()
+    hits = sum(v in as_dict for v in probe_ints)
+    dict_rate = lookups / (time.perf_counter() - start)
+    assert hits == lookups // 2
+    print(f"{'格式/索引':<22} {'字节/元素':>10} {'查询/秒':>12}")
+    for label, size, index in rows:
+        rate = ""
+        if index is not None:
+            start = time.perf_counter()
+            hits = sum(t in index for t in probes)
+            rate = f"{lookups / (time.perf_counter() - start):12.0f}"
+            assert hits >= lookups // 2
+        elif label.startswith("dict"):
+            rate = f"{dict_rate:12.0f}"
+        print(f"{label:<22} {size:10.1f} {rate}")
+
+
+def bench_net(sizes=(200, 1000), transports=('tcp', 'unix'), group='modp', batch=256):
+    print(f"--- 双进程PSI（{group}群，每批{batch}个元素）：各阶段完成时刻、通信量与吞吐 ---")
+    import psi_net
+    for transport in transports:
+        for n in sizes:
+            data_1, data_2, matches, total = _datasets(n)
+            res = psi_net.run_pair(data_1, data_2, transport, group, batch=batch)
+            assert res[:2] == (matches, total)
+            s1, s2 = res[2], res[3]
+            sent, recv = s1['发送字节'], s1['接收字节']
+            print(f"[{transport}] n={n:<7} 阶段一 {s1['阶段一']:7.2f} s  阶段二 {s2['阶段二']:7.2f} s  "
+                  f"阶段三 {s1['阶段三(接收与指数运算)']:7.2f} s  总计 {s1['总计']:7.2f} s")
+            print(f"{'':>6} 方1→方2 {sent / 1024:9.1f} KB  方2→方1 {recv / 1024:9.1f} KB  "
+                  f"每元素 {(sent + recv) / (2 * n):7.1f} B  吞吐 {2 * n / s1['总计']:7.1f} 元素/s")
+
+
+def bench_checkup(sizes=(1000, 4000), group='sm2', queries=20):
+    print(f"--- Password Checkup服务端：预盲化分桶库，单次查询耗时与库大小无关（{group}群） ---")
+    import checkup_server
+    with tempfile.TemporaryDirectory() as tmp:
+        store = checkup_server.BreachStore(os.path.join(tmp, 'breach'), group)
+        client = checkup_server.CheckupClient.for_store(store)
+        inserted = 0
+        for n in sizes:
+            start = time.perf_counter()
+            store.insert(f"user{i}:password{i}" for i in range(inserted, n))
+            insert_t = (time.perf_counter() - start) / max(1, n - inserted)
+            inserted = n
+            creds = [f"user{i}:password{i}" for i in range(0, n, max(1, n // queries))][:queries // 2]
+            #库比queries小时在库的凭据不足一半
+            present = len(creds)
+            creds += [f"nobody{i}" for i in range(queries - present)]
+            server_t = client_t = 0.0
+            hits = 0
+            for cred in creds:
+                start = time.perf_counter()
+                prefix, blinded, secret = client.prepare(cred)
+                mid = time.perf_counter()
+                response = store.query(prefix, blinded)
+                end = time.perf_counter()
+                hits += client.check(response, secret)
+                client_t += (mid - start) + (time.perf_counter() - end)
+                server_t += end - mid
+            assert hits == present
+            sizes_now = store.bucket_sizes().values()
+            # 原协议每次查询要把服务端全部n个元素重新哈希并指数运算一遍
+            naive = n * insert_t
+            print(f"库大小 {n:<8} 入库 {insert_t * 1e3:6.2f} ms/条  平均桶大小 {sum(sizes_now) / len(sizes_now):6.2f}  "
+                  f"查询 服务端 {server_t / queries * 1e3:6.2f} ms  客户端 {client_t / queries * 1e3:6.2f} ms  "
+                  f"(每次重新盲化全库约 {naive:7.1f} s)")
+
+
+BENCHES = {
+    'groups': bench_groups,
+    'params': bench_params,
+    'primes': bench_primes,
+    'scaling': bench_scaling,
+    'stream': bench_stream,
+    'paillier': bench_paillier,
+    'aggregate': bench_aggregate,
+    'encoding': bench_encoding,
+    'net': bench_net,
+    'checkup': bench_checkup,
+}
+
+
+def main_cli():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('names', nargs='*', help=f"要运行的测试 {list(BENCHES)}，默认全部运行")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000], help="集合大小，如 1000 10000 100000 1000000")
+    parser.add_argument('--groups', nargs='+', default=list(main.GROUPS), help="群后端")
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4], help="scaling测试的进程数，0为单进程顺序执行")
+    parser.add_argument('--chunk-size', type=int, default=256)
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHES)
+    if unknown: parser.error(f"未知测试: {sorted(unknown)}")
+    for name in args.names or list(BENCHES):
+        if name == 'groups':
+            bench_groups(args.sizes, args.groups)
+        elif name == 'scaling':
+            bench_scaling(args.sizes[0], args.workers, chunk_size=args.chunk_size)
+        elif name == 'checkup':
+            bench_checkup(args.sizes)
+        elif name == 'net':
+            bench_net(args.sizes)
+        elif name == 'stream':
+            bench_stream(args.sizes)
+        else:
+            BENCHES[name]()
+
+
+if __name__ == "__main__":
+    main_cli()
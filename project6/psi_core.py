@@ -0,0 +1,236 @@
+import os
+import sys
+import random
+import hashlib
+import secrets
+import threading
+from collections import deque
+from typing import List, Tuple
+from math import gcd
+
+# 复用project5-sm2中的模运算与曲线实现
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'project5-sm2'))
+from sm2_curve import batch_inverse
+from psi_group import ModpGroup, SM2Group
+import primes
+
+# 协议各模块共用的密码组件：素数与模运算（CryptoCore）、Paillier引擎（HiddenDataEngine）、DH群及群后端注册表。
+# main.py以脚本运行时模块名为__main__，其他模块若从main导入会得到它的第二份副本，因此共用部分放在这里。
+
+class CryptoCore:
+    
+    @staticmethod
+    def passes_sieve(n: int) -> bool:
+        """小素数筛：n有2000以内的素因子时返回False（n本身是小素数除外）"""
+        return primes.passes_sieve(n)
+    
+    @staticmethod
+    def is_likely_prime(n: int, rounds: int = 128) -> bool:
+        """
+        Miller-Rabin素性检测，先用小素数筛排除大部分合数。
+        默认轮数固定，适用于从文件加载等可能被构造的输入；rounds=None时按位长自适应，只适用于随机候选数
+        """
+        return primes.is_probable_prime(n, rounds)
+    
+    @staticmethod
+    def generate_random_prime(size: int) -> int:
+        """生成指定位数（最高位为1）的随机素数，候选窗口先经增量筛"""
+        return primes.random_prime(size)
+    
+    @staticmethod
+    def modular_inverse(a: int, m: int) -> int:
+        """计算模逆元"""
+        return pow(a, -1, m)
+    
+    @staticmethod
+    def batch_modular_inverse(values: List[int], m: int) -> List[int]:
+        """批量计算模逆元：Montgomery技巧，n个元素只需一次求逆和3(n-1)次乘法"""
+        return batch_inverse(values, m)
+
+class HiddenDataEngine:
+    """
+    基于Paillier的同态加密引擎（g = N+1）。
+    加密用 g^m = 1 + m·N (mod N²) 省去一次模幂；持有私钥时加密噪声r^N与解密都在p²、q²上分别计算再用CRT合并；
+    start_noise_pool()/precompute_noise()可预先算好r^N，conceal在线阶段只剩一次模乘。
+    """
+    
+    def __init__(self, bit_length: int = 1024, primes: Tuple[int, int] = None):
+        # 生成两个大素数；primes给出时直接使用（如从参数库加载）
+        if primes is None:
+            primes = (CryptoCore.generate_random_prime(bit_length // 2),
+                      CryptoCore.generate_random_prime(bit_length // 2))
+        p1, p2 = primes
+        self._primes = primes
+        
+        self._N = p1 * p2  # 模数
+        self._N_squared = self._N * self._N
+        self._G = self._N + 1  # 固定生成元
+        
+        # 计算私钥参数
+        _lambda = (p1 - 1) * (p2 - 1) // gcd(p1 - 1, p2 - 1)
+        self._mu_secret = CryptoCore.modular_inverse(_lambda, self._N)
+        
+        self.key_public = self._N  # 公钥
+        self._key_private = (_lambda, self._mu_secret)  # 私钥
+        
+        # CRT预计算：模p²/q²下的r^N指数（按φ(p²)=p(p-1)约简）、解密用的h_p/h_q、以及q²模p²与q模p的逆
+        self._crt = []
+        for pr in (p1, p2):
+            pr2 = pr * pr
+            h = CryptoCore.modular_inverse((pow(self._G, pr - 1, pr2) - 1) // pr, pr)
+            self._crt.append((pr, pr2, self._N % (pr * (pr - 1)), h))
+        self._inv_q_sq = CryptoCore.modular_inverse(p2 * p2, p1 * p1)
+        self._inv_q = CryptoCore.modular_inverse(p2, p1)
+        self._init_noise()
+    
+    @classmethod
+    def from_public_key(cls, public_key: int) -> 'HiddenDataEngine':
+        """只含公钥的引擎：可以conceal/combine，不能unseal"""
+        engine = cls.__new__(cls)
+        engine._N = public_key
+        engine._N_squared = public_key * public_key
+        engine._G = public_key + 1
+        engine.key_public = public_key
+        engine._key_private = None
+        engine._crt = None
+        engine._init_noise()
+        return engine
+    
+    def _init_noise(self):
+        self._noise = deque()
+        self._noise_capacity = 0
+        self._noise_cond = threading.Condition()
+        self._noise_thread = None
+        self._noise_stop = False
+    
+    def _fresh_noise(self) -> int:
+        """新的r^N mod N²"""
+        rand_param = secrets.randbelow(self._N - 1) + 1
+        while gcd(rand_param, self._N) != 1:
+            rand_param = secrets.randbelow(self._N - 1) + 1
+        if self._crt is None:
+            return pow(rand_param, self._N, self._N_squared)
+        (_, p_sq, e_p, _), (_, q_sq, e_q, _) = self._crt
+        x_p = pow(rand_param % p_sq, e_p, p_sq)
+        x_q = pow(rand_param % q_sq, e_q, q_sq)
+        return x_q + q_sq * ((x_p - x_q) * self._inv_q_sq % p_sq)
+    
+    def precompute_noise(self, count: int):
+        """离线阶段：同步预计算count个噪声值放入池中"""
+        for _ in range(count):
+            self._noise.append(self._fresh_noise())
+    
+    def start_noise_pool(self, capacity: int = 1024):
+        """启动后台线程，把噪声池补到capacity个；池空时conceal退回现算"""
+        self._noise_capacity = capacity
+        if self._noise_thread is not None: return
+        self._noise_stop = False
+        self._noise_thread = threading.Thread(target=self._refill_noise, daemon=True)
+        self._noise_thread.start()
+    
+    def stop_noise_pool(self):
+        if self._noise_thread is None: return
+        with self._noise_cond:
+            self._noise_stop = True
+            self._noise_cond.notify()
+        self._noise_thread.join()
+        self._noise_thread = None
+    
+    def _refill_noise(self):
+        while True:
+            with self._noise_cond:
+                while len(self._noise) >= self._noise_capacity and not self._noise_stop:
+                    self._noise_cond.wait()
+                if self._noise_stop: return
+            self._noise.append(self._fresh_noise())
+    
+    def _take_noise(self) -> int:
+        # 每个噪声值只用一次：popleft保证即使多线程加密也不会重复取用
+        try:
+            value = self._noise.popleft()
+        except IndexError:
+            return self._fresh_noise()
+        if self._noise_thread is not None:
+            with self._noise_cond:
+                self._noise_cond.notify()
+        return value
+    
+    def conceal(self, data: int) -> int:
+        """加密数据：(1 + m·N)·r^N mod N²"""
+        return (1 + data % self._N * self._N) * self._take_noise() % self._N_squared
+    
+    def unseal(self, encrypted_data: int) -> int:
+        """解密数据：m_p = L_p(c^(p-1) mod p²)·h_p mod p，q同理，再用CRT合并"""
+        if self._key_private is None: raise ValueError("只含公钥的引擎不能解密")
+        (p1, p_sq, _, h_p), (p2, q_sq, _, h_q) = self._crt
+        m_p = (pow(encrypted_data % p_sq, p1 - 1, p_sq) - 1) // p1 * h_p % p1
+        m_q = (pow(encrypted_data % q_sq, p2 - 1, q_sq) - 1) // p2 * h_q % p2
+        return m_q + p2 * ((m_p - m_q) * self._inv_q % p1)
+    
+    @staticmethod
+    def combine(c1: int, c2: int, mod_squared: int) -> int:
+        """同态加法：加密数据相加"""
+        return (c1 * c2) % mod_squared
+
+class DiffieHellmanGroup:
+    """Diffie-Hellman密钥交换组"""
+    
+    def __init__(self, key_length: int = 512, params: Tuple[int, int, int] = None, workers: int = 1):
+        # params给出(p, q, g)时直接使用（如从参数库加载）
+        if params is not None:
+            self._p, self._q, self._g = params
+            return
+        # 生成安全素数p=2q+1；workers>1时在多个进程中并行搜索
+        self._p, self._q = primes.safe_prime(key_length, workers)
+        # 生成元取q阶子群（二次剩余）中的元素，不合格时只重选g而不重新找素数
+        while True:
+            self._g = random.randint(2, self._p - 2)
+            if pow(self._g, self._q, self._p) == 1:  # 验证生成元有效性
+                break
+    
+    def get_context(self) -> Tuple[int, int, int]:
+        """获取DH参数(p, q, g)"""
+        return self._p, self._q, self._g
+    
+    def random_exponent(self) -> int:
+        return random.randint(1, self._q - 1)
+    
+    def process_element(self, element: str, power: int) -> int:
+        """处理元素：H(element)^power mod p，其中H(element)=g^(hash mod q)"""
+        hashed_val = int(hashlib.sha256(element.encode()).hexdigest(), 16)
+        # (g^h)^power = g^(h·power mod q)，合并为一次模幂
+        return pow(self._g, hashed_val * power % self._q, self._p)
+    
+    def exponentiate(self, value: int, power: int) -> int:
+        return pow(value, power, self._p)
+    
+    def is_element(self, value) -> bool:
+        """q阶子群（二次剩余）的元素，不含±1"""
+        return isinstance(value, int) and 1 < value < self._p - 1 and primes.jacobi(value, self._p) == 1
+    
+    @property
+    def element_size(self) -> int:
+        """群元素定长编码的字节数"""
+        return (self._p.bit_length() + 7) // 8
+    
+    def encode_element(self, value: int) -> bytes:
+        return value.to_bytes(self.element_size, 'big')
+    
+    def decode_element(self, data: bytes) -> int:
+        return int.from_bytes(data, 'big')
+
+# 可选的群后端：dh每次生成随机安全素数群（原实现），modp为RFC 3526固定群，sm2为SM2椭圆曲线群
+GROUPS = {
+    'dh': DiffieHellmanGroup,
+    'modp': ModpGroup,
+    'sm2': SM2Group,
+}
+
+def make_group(name: str = 'dh', store=None):
+    """store为psi_params.ParamStore时，dh群从参数库加载而不是现场生成"""
+    if name not in GROUPS: raise ValueError(f"未知的群后端: {name}")
+    if name == 'dh' and store is not None: return store.dh_group()
+    return GROUPS[name]()
+
+# 协议中的随机打乱使用系统熵源，排列不可由Mersenne Twister的输出推算
+_SHUFFLER = random.SystemRandom()
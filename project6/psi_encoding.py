@@ -0,0 +1,178 @@
+import math
+import hashlib
+from typing import Iterable, Iterator, List
+
+# 盲化元素的紧凑编码与成员索引。
+# 阶段三只需判断H(x)^{ab}是否相等，不再做群运算，因此可以只传输/存储它们的短标签：
+# 标签为群元素定长编码的BLAKE2b摘要截断，长度按集合大小选取，使任意两元素标签相撞的概率不超过2^-stat_bits。
+
+STAT_BITS = 40
+
+
+def tag_length(n1: int, n2: int, stat_bits: int = STAT_BITS) -> int:
+    """n1·n2对元素中出现标签碰撞的概率 ≤ n1·n2·2^-8L ≤ 2^-stat_bits 所需的最短字节数L"""
+    pairs = max(1, n1) * max(1, n2)
+    return math.ceil((stat_bits + math.log2(pairs)) / 8)
+
+
+def make_tag(group, value, length: int) -> bytes:
+    return hashlib.blake2b(group.encode_element(value), digest_size=length).digest()
+
+
+def pack_tags(tags: Iterable[bytes]) -> bytes:
+    """定长标签首尾相接，即传输/存储格式"""
+    return b''.join(tags)
+
+
+def unpack_tags(data: bytes, length: int) -> Iterator[bytes]:
+    if len(data) % length: raise ValueError("标签数据长度错误")
+    return (data[i:i + length] for i in range(0, len(data), length))
+
+
+def _two_hashes(tag: bytes):
+    h = int.from_bytes(hashlib.blake2b(tag, digest_size=16).digest(), 'big')
+    return h >> 64, h & ((1 << 64) - 1)
+
+
+class BloomFilter:
+    """
+    位数组Bloom过滤器，k个位置由双重哈希 h1 + i·h2 给出。有假阳性、无假阴性：
+    用于求和时假阳性会把不相交的值算进去，因此fp_rate应取足够小（默认2^-40），或仅作预筛后再精确比对。
+    """
+
+    def __init__(self, capacity: int, fp_rate: float = 2.0 ** -STAT_BITS):
+        capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.k = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, tag: bytes):
+        h1, h2 = _two_hashes(tag)
+        h2 |= 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.k)]
+
+    def add(self, tag: bytes):
+        bits = self._bits
+        for pos in self._positions(tag):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, tag: bytes) -> bool:
+        bits = self._bits
+        for pos in self._positions(tag):
+            if not bits[pos >> 3] >> (pos & 7) & 1:
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+class CuckooTable:
+    """
+    精确成员判定的布谷鸟哈希表：标签原样存在一块bytearray中，每个桶4个槽位，每个标签有两个候选桶。
+    插入失败（踢出链过长）时容量翻倍重建；装载率约0.9，每元素约 width/0.9 字节。
+    """
+
+    SLOTS = 4
+    MAX_KICKS = 500
+
+    def __init__(self, width: int, capacity: int = 1024):
+        self.width = width
+        n_buckets = 1
+        while n_buckets * self.SLOTS * 0.9 < max(1, capacity):
+            n_buckets <<= 1
+        self._init(n_buckets)
+
+    def _init(self, n_buckets: int):
+        self._mask = n_buckets - 1
+        self._data = bytearray(n_buckets * self.SLOTS * self.width)
+        self._fill = bytearray(n_buckets)
+        self.count = 0
+
+    def _buckets(self, tag: bytes):
+        h1, h2 = _two_hashes(tag)
+        return h1 & self._mask, h2 & self._mask
+
+    def _slot(self, bucket: int, i: int) -> int:
+        return (bucket * self.SLOTS + i) * self.width
+
+    def __contains__(self, tag: bytes) -> bool:
+        w, data = self.width, self._data
+        for b in self._buckets(tag):
+            for i in range(self._fill[b]):
+                off = self._slot(b, i)
+                if data[off:off + w] == tag:
+                    return True
+        return False
+
+    def _place(self, b: int, tag: bytes) -> bool:
+        if self._fill[b] >= self.SLOTS: return False
+        off = self._slot(b, self._fill[b])
+        self._data[off:off + self.width] = tag
+        self._fill[b] += 1
+        return True
+
+    def add(self, tag: bytes):
+        if len(tag) != self.width: raise ValueError("标签长度错误")
+        if tag in self: return
+        b1, b2 = self._buckets(tag)
+        if self._place(b1, tag) or self._place(b2, tag):
+            self.count += 1
+            return
+        # 两个桶都满：轮流踢出旧标签到它的另一个候选桶
+        b, w = b1, self.width
+        for n in range(self.MAX_KICKS):
+            off = self._slot(b, n % self.SLOTS)
+            tag, self._data[off:off + w] = bytes(self._data[off:off + w]), tag
+            c1, c2 = self._buckets(tag)
+            b = c2 if b == c1 else c1
+            if self._place(b, tag):
+                self.count += 1
+                return
+        # 踢出链过长：扩容重建，把手上的标签也放进去
+        self._grow(tag)
+
+    def _grow(self, pending: bytes):
+        old = list(self.tags())
+        self._init((self._mask + 1) * 2)
+        for t in old + [pending]:
+            self.add(t)
+
+    def tags(self) -> Iterator[bytes]:
+        w = self.width
+        for b in range(self._mask + 1):
+            for i in range(self._fill[b]):
+                off = self._slot(b, i)
+                yield bytes(self._data[off:off + w])
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._data) + len(self._fill)
+
+
+INDEXES = ('set', 'cuckoo', 'bloom')
+
+
+def build_index(tags: List[bytes], kind: str = 'cuckoo', width: int = None):
+    """按kind建立标签的成员索引：set为Python集合，cuckoo为精确的紧凑表，bloom为过滤器"""
+    if kind == 'set':
+        return set(tags)
+    if kind == 'cuckoo':
+        index = CuckooTable(width or (len(tags[0]) if tags else 1), len(tags))
+    elif kind == 'bloom':
+        index = BloomFilter(len(tags))
+    else:
+        raise ValueError(f"未知的索引类型: {kind}")
+    for t in tags:
+        index.add(t)
+    return index
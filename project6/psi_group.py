@@ -0,0 +1,133 @@
+import os
+import sys
+import hashlib
+import secrets
+from typing import Tuple
+
+# 复用project5-sm2中的曲线运算
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'project5-sm2'))
+import sm2_curve
+from primes import jacobi
+
+# 协议中的群只需提供四个操作（见collaborative_computation）：
+#   random_exponent()                 各方的秘密指数
+#   hash_to_group(element)            把字符串映射为群元素H(element)
+#   process_element(element, power)   H(element)^power
+#   exponentiate(value, power)        value^power
+#   is_element(value)                 value是否为素数阶群中的有效元素；对外部传入的值做指数运算前须先检查
+# 群元素须可哈希、可比较，阶段三直接用它们做字典键；
+# 流式模式（psi_stream）另需 element_size / encode_element / decode_element 做定长二进制编码。
+
+# RFC 3526 第14组：2048位安全素数，生成元2
+MODP_2048_P = int(
+    "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD1"
+    "29024E088A67CC74020BBEA63B139B22514A08798E3404DD"
+    "EF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245"
+    "E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED"
+    "EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3D"
+    "C2007CB8A163BF0598DA48361C55D39A69163FA8FD24CF5F"
+    "83655D23DCA3AD961C62F356208552BB9ED529077096966D"
+    "670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B"
+    "E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9"
+    "DE2BCBF6955817183995497CEA956AE515D2261898FA0510"
+    "15728E5A8AACAA68FFFFFFFFFFFFFFFF", 16)
+MODP_2048_G = 2
+
+
+class ModpGroup:
+    """固定的标准MODP群（RFC 3526），取p=2q+1的二次剩余子群，无需每次运行生成参数"""
+
+    name = 'modp'
+
+    def __init__(self, p: int = MODP_2048_P, g: int = MODP_2048_G, exponent_bits: int = 256):
+        self._p = p
+        self._q = (p - 1) // 2
+        self._g = g
+        # 短指数：2048位群的安全强度约110位，256位指数足够且把模幂开销降到约1/8
+        self._exponent_bits = exponent_bits
+        self._hash_len = (p.bit_length() + 7) // 8 + 16
+
+    def get_context(self) -> Tuple[int, int, int]:
+        """获取群参数(p, q, g)"""
+        return self._p, self._q, self._g
+
+    def random_exponent(self) -> int:
+        return secrets.randbits(self._exponent_bits - 1) | (1 << (self._exponent_bits - 1))
+
+    def hash_to_group(self, element: str) -> int:
+        """扩展哈希到比p多128位再取模，平方后落入q阶子群，只需一次模乘"""
+        data = element.encode()
+        digest = b''.join(hashlib.sha512(i.to_bytes(4, 'big') + data).digest()
+                          for i in range((self._hash_len + 63) // 64))
+        h = int.from_bytes(digest[:self._hash_len], 'big') % self._p
+        return h * h % self._p
+
+    def process_element(self, element: str, power: int) -> int:
+        """H(element)^power mod p，每个元素一次模幂"""
+        return pow(self.hash_to_group(element), power, self._p)
+
+    def exponentiate(self, value: int, power: int) -> int:
+        return pow(value, power, self._p)
+
+    def is_element(self, value) -> bool:
+        """q阶子群的元素：排除±1（p-1会把指数的奇偶性泄露出去）及子群外的值"""
+        #p = 2q+1时q阶子群即二次剩余，用Legendre符号判断，省去一次全长模幂
+        return isinstance(value, int) and 1 < value < self._p - 1 and jacobi(value, self._p) == 1
+
+    @property
+    def element_size(self) -> int:
+        return (self._p.bit_length() + 7) // 8
+
+    def encode_element(self, value: int) -> bytes:
+        return value.to_bytes(self.element_size, 'big')
+
+    def decode_element(self, data: bytes) -> int:
+        return int.from_bytes(data, 'big')
+
+
+class SM2Group:
+    """SM2曲线上的素数阶群（余因子为1），元素为仿射坐标(x, y)，指数运算即标量乘"""
+
+    name = 'sm2'
+    element_size = 64
+
+    def __init__(self):
+        self._n = sm2_curve.N
+
+    def get_context(self) -> Tuple[int, int, Tuple[int, int]]:
+        """获取群参数(p, n, G)"""
+        return sm2_curve.P, self._n, sm2_curve.G
+
+    def random_exponent(self) -> int:
+        return secrets.randbelow(self._n - 1) + 1
+
+    def hash_to_group(self, element: str) -> Tuple[int, int]:
+        """try-and-increment：对(计数器, element)哈希得到x和y的奇偶位，x不在曲线上时计数器加一重试"""
+        data = element.encode()
+        ctr = 0
+        while True:
+            digest = hashlib.sha512(ctr.to_bytes(4, 'big') + data).digest()
+            # 取384位再模p，使x近似均匀
+            pt = sm2_curve.lift_x(int.from_bytes(digest[:48], 'big') % sm2_curve.P, digest[-1] & 1)
+            if pt is not None:
+                return pt
+            ctr += 1
+
+    def process_element(self, element: str, power: int) -> Tuple[int, int]:
+        return sm2_curve.scalar_mult(power, self.hash_to_group(element))
+
+    def exponentiate(self, value: Tuple[int, int], power: int) -> Tuple[int, int]:
+        return sm2_curve.scalar_mult(power, value)
+
+    def is_element(self, value) -> bool:
+        """曲线上的有限点（余因子为1，即n阶群的元素）；不在曲线上的点会招致无效曲线攻击"""
+        if not (isinstance(value, tuple) and len(value) == 2 and all(isinstance(c, int) for c in value)):
+            return False
+        x, y = value
+        return value != (0, 0) and 0 <= x < sm2_curve.P and 0 <= y < sm2_curve.P and sm2_curve.is_on_curve(value)
+
+    def encode_element(self, value: Tuple[int, int]) -> bytes:
+        return value[0].to_bytes(32, 'big') + value[1].to_bytes(32, 'big')
+
+    def decode_element(self, data: bytes) -> Tuple[int, int]:
+        return int.from_bytes(data[:32], 'big'), int.from_bytes(data[32:64], 'big')
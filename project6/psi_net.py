@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import struct
+import asyncio
+import tempfile
+import multiprocessing
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Tuple
+from psi_core import HiddenDataEngine, make_group, _SHUFFLER
+from psi_parallel import PhaseRunner
+from psi_aggregate import Aggregator
+from psi_encoding import tag_length, make_tag, pack_tags, unpack_tags, build_index
+
+# 双进程PSI求和：方1（客户端）与方2（服务端）经TCP或Unix套接字通信。
+# 帧格式：4字节大端长度 || 1字节类型 || 负载。双方都按批流式发送，
+# 方2在方1仍在发送H(x)^a时就开始做(H(x)^a)^b，同时处理并发送自己的H(y)^b || Enc(v)。
+#   方2 -> 方1  HELLO   JSON {group, N}
+#   方1 -> 方2  A*      定长编码的H(x)^a，方1先打乱输入顺序再逐批盲化
+#   方1 -> 方2  A_END
+#   方2 -> 方1  B*      H(y)^b || Enc(v)，方2同样先打乱输入顺序
+#   方2 -> 方1  B_END
+#   方2 -> 方1  TAGS    1字节标签长度 || 打乱后的H(x)^{ab}短标签
+#   方1 -> 方2  SUM     重随机化后的Enc(Σv)
+#   方2 -> 方1  RESULT  解密后的和（仅供报告）
+MSG_HELLO, MSG_A, MSG_A_END, MSG_B, MSG_B_END, MSG_TAGS, MSG_SUM, MSG_RESULT = range(8)
+MAX_FRAME = 64 << 20
+BATCH = 256
+_HEADER = struct.Struct('>IB')
+
+
+class _Channel:
+    """长度前缀分帧，并统计收发字节数"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self.sent = 0
+        self.received = 0
+
+    async def send(self, kind: int, payload: bytes = b''):
+        self._writer.write(_HEADER.pack(len(payload), kind) + payload)
+        self.sent += _HEADER.size + len(payload)
+        await self._writer.drain()
+
+    async def recv(self, *expected: int) -> Tuple[int, bytes]:
+        length, kind = _HEADER.unpack(await self._reader.readexactly(_HEADER.size))
+        if length > MAX_FRAME: raise ValueError(f"帧过长: {length}")
+        if expected and kind not in expected: raise ValueError(f"意外的消息类型: {kind}")
+        payload = await self._reader.readexactly(length)
+        self.received += _HEADER.size + length
+        return kind, payload
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+def _batches(iterable, size: int):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk: return
+        yield chunk
+
+
+def _split(payload: bytes, width: int) -> List[bytes]:
+    if len(payload) % width: raise ValueError("记录长度错误")
+    return [payload[i:i + width] for i in range(0, len(payload), width)]
+
+
+def _decode_elements(group, records: List[bytes]) -> list:
+    """解码对方发来的群元素并逐个检查，遇到第一个无效值即中止；不检查就用秘密指数去乘方会泄露指数"""
+    values = [group.decode_element(r) for r in records]
+    for v in values:
+        if not group.is_element(v): raise ValueError("对方发送的值不是群中的有效元素")
+    return values
+
+
+async def _party_2(channel: _Channel, pairs: List[Tuple[str, int]], group, engine: HiddenDataEngine,
+                   workers: int, batch: int) -> dict:
+    loop = asyncio.get_running_loop()
+    stats = {}
+    start = time.perf_counter()
+    secret_B = group.random_exponent()
+    enc, ew = group.encode_element, group.element_size
+    cw = (engine._N_squared.bit_length() + 7) // 8
+    pairs = list(pairs)
+    _SHUFFLER.shuffle(pairs)
+    await channel.send(MSG_HELLO, json.dumps({'group': group.name, 'N': hex(engine.key_public)}).encode())
+    with PhaseRunner(group, engine.key_public, workers, batch, engine) as runner, ThreadPoolExecutor(2) as ex:
+
+        async def send_b():
+            for chunk in _batches(pairs, batch):
+                out = await loop.run_in_executor(ex, runner.process_and_conceal, chunk, secret_B)
+                await channel.send(MSG_B, b''.join(enc(h) + c.to_bytes(cw, 'big') for h, c in out))
+            await channel.send(MSG_B_END)
+            stats['B发送完毕'] = time.perf_counter() - start
+
+        b_task = asyncio.create_task(send_b())
+        cross = []
+        while True:
+            kind, payload = await channel.recv(MSG_A, MSG_A_END)
+            if kind == MSG_A_END: break
+            vals = await loop.run_in_executor(ex, _decode_elements, group, _split(payload, ew))
+            cross.extend(await loop.run_in_executor(ex, runner.exponentiate, vals, secret_B))
+        await b_task
+    _SHUFFLER.shuffle(cross)
+    tag_len = tag_length(len(cross), len(pairs))
+    await channel.send(MSG_TAGS, bytes([tag_len]) + pack_tags(make_tag(group, v, tag_len) for v in cross))
+    stats['阶段二'] = time.perf_counter() - start
+    _, payload = await channel.recv(MSG_SUM)
+    total = engine.unseal(int.from_bytes(payload, 'big'))
+    await channel.send(MSG_RESULT, total.to_bytes((total.bit_length() + 8) // 8, 'big'))
+    stats['总计'] = time.perf_counter() - start
+    stats['发送字节'], stats['接收字节'] = channel.sent, channel.received
+    return stats
+
+
+async def _party_1(channel: _Channel, items: List[str], group_name: str, workers: int, batch: int,
+                   index: str = 'set') -> Tuple[int, int, dict]:
+    loop = asyncio.get_running_loop()
+    stats = {}
+    start = time.perf_counter()
+    _, payload = await channel.recv(MSG_HELLO)
+    hello = json.loads(payload)
+    if hello['group'] != group_name: raise ValueError(f"群不一致: {hello['group']} != {group_name}")
+    group = make_group(group_name)
+    public_key = int(hello['N'], 16)
+    public = HiddenDataEngine.from_public_key(public_key)
+    enc, ew = group.encode_element, group.element_size
+    cw = (public._N_squared.bit_length() + 7) // 8
+    secret_A = group.random_exponent()
+    items = list(items)
+    _SHUFFLER.shuffle(items)
+    with PhaseRunner(group, public_key, workers, batch) as runner, ThreadPoolExecutor(2) as ex:
+
+        async def send_a():
+            for chunk in _batches(items, batch):
+                out = await loop.run_in_executor(ex, runner.process_elements, chunk, secret_A)
+                await channel.send(MSG_A, b''.join(enc(v) for v in out))
+            await channel.send(MSG_A_END)
+            stats['阶段一'] = time.perf_counter() - start
+
+        a_task = asyncio.create_task(send_a())
+        received_b = []
+        tags = None
+        b_done = False
+        while not (b_done and tags is not None):
+            kind, payload = await channel.recv(MSG_B, MSG_B_END, MSG_TAGS)
+            if kind == MSG_B:
+                recs = _split(payload, ew + cw)
+                vals = await loop.run_in_executor(ex, _decode_elements, group, [r[:ew] for r in recs])
+                hs = await loop.run_in_executor(ex, runner.exponentiate, vals, secret_A)
+                received_b.extend((h, r[ew:]) for h, r in zip(hs, recs))
+            elif kind == MSG_B_END:
+                b_done = True
+            else:
+                tag_len = payload[0]
+                tags = build_index(list(unpack_tags(payload[1:], tag_len)), index, tag_len)
+        await a_task
+    stats['阶段三(接收与指数运算)'] = time.perf_counter() - start
+    aggregator = Aggregator(public._N_squared)
+    for h, cipher in received_b:
+        if make_tag(group, h, tag_len) in tags:
+            aggregator.add(int.from_bytes(cipher, 'big'))
+    await channel.send(MSG_SUM, aggregator.total(engine=public).to_bytes(cw, 'big'))
+    stats['匹配与求和'] = time.perf_counter() - start
+    _, payload = await channel.recv(MSG_RESULT)
+    stats['总计'] = time.perf_counter() - start
+    stats['发送字节'], stats['接收字节'] = channel.sent, channel.received
+    return aggregator.count(), int.from_bytes(payload, 'big'), stats
+
+
+async def serve(pairs: Iterable[Tuple[str, int]], address, group: str = 'modp', workers: int = 0,
+                batch: int = BATCH, engine: HiddenDataEngine = None, on_ready=None) -> dict:
+    """
+    方2：在address（(host, port)为TCP，字符串为Unix套接字路径）上接受一个方1连接并完成一次协议，返回统计。
+    on_ready(实际监听地址)在开始监听后调用，便于端口为0时告知对方。
+    """
+    group = make_group(group)
+    engine = engine or HiddenDataEngine()
+    pairs = list(pairs)
+    done = asyncio.get_running_loop().create_future()
+
+    async def handle(reader, writer):
+        channel = _Channel(reader, writer)
+        if done.done():
+            # 每次serve只服务一个方1
+            await channel.close()
+            return
+        try:
+            done.set_result(await _party_2(channel, pairs, group, engine, workers, batch))
+        except Exception as e:
+            done.set_exception(e)
+        finally:
+            await channel.close()
+
+    if isinstance(address, str):
+        server = await asyncio.start_unix_server(handle, path=address)
+        bound = address
+    else:
+        server = await asyncio.start_server(handle, *address)
+        bound = server.sockets[0].getsockname()[:2]
+    if on_ready: on_ready(bound)
+    try:
+        async with server:
+            return await done
+    finally:
+        if isinstance(address, str) and os.path.exists(address): os.remove(address)
+
+
+async def connect(items: Iterable[str], address, group: str = 'modp', workers: int = 0,
+                  batch: int = BATCH, index: str = 'set') -> Tuple[int, int, dict]:
+    """方1：连接方2完成一次协议，返回(匹配数, 匹配项数值之和, 统计)"""
+    if isinstance(address, str):
+        reader, writer = await asyncio.open_unix_connection(address)
+    else:
+        reader, writer = await asyncio.open_connection(*address)
+    channel = _Channel(reader, writer)
+    try:
+        return await _party_1(channel, list(items), group, workers, batch, index)
+    finally:
+        await channel.close()
+
+
+def _server_process(pairs, address, group, workers, batch, queue):
+    stats = asyncio.run(serve(pairs, address, group, workers, batch, on_ready=queue.put))
+    queue.put(stats)
+
+
+def run_pair(items: List[str], pairs: List[Tuple[str, int]], transport: str = 'tcp', group: str = 'modp',
+             workers: int = 0, batch: int = BATCH):
+    """在本机启动方2进程，当前进程作为方1，返回(匹配数, 和, 方1统计, 方2统计)"""
+    tmp = None
+    if transport == 'unix':
+        tmp = tempfile.mkdtemp()
+        address = os.path.join(tmp, 'psi.sock')
+    elif transport == 'tcp':
+        address = ('127.0.0.1', 0)
+    else:
+        raise ValueError(f"未知的传输方式: {transport}")
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_server_process, args=(pairs, address, group, workers, batch, queue))
+    proc.start()
+    try:
+        bound = queue.get(timeout=120)
+        address = bound if isinstance(bound, str) else tuple(bound)
+        matches, total, stats_1 = asyncio.run(connect(items, address, group, workers, batch))
+        stats_2 = queue.get(timeout=120)
+    finally:
+        proc.join(timeout=10)
+        if proc.is_alive(): proc.terminate()
+        if tmp:
+            if os.path.exists(address): os.remove(address)
+            os.rmdir(tmp)
+    return matches, total, stats_1, stats_2
+
+
+def main():
+    import argparse
+    from psi_stream import read_ids, read_pairs
+    parser = argparse.ArgumentParser(description="双进程PSI求和")
+    parser.add_argument('role', choices=['server', 'client'])
+    parser.add_argument('input', help="server为 标识符,数值 文件；client为每行一个标识符的文件")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9009)
+    parser.add_argument('--unix', help="使用Unix套接字路径代替TCP")
+    parser.add_argument('--group', default='modp', choices=['modp', 'sm2'])
+    parser.add_argument('--workers', type=int, default=0)
+    parser.add_argument('--batch', type=int, default=BATCH)
+    args = parser.parse_args()
+    address = args.unix or (args.host, args.port)
+    if args.role == 'server':
+        stats = asyncio.run(serve(read_pairs(args.input), address, args.group, args.workers, args.batch,
+                                  on_ready=lambda a: print(f"监听 {a}")))
+    else:
+        matches, total, stats = asyncio.run(connect(read_ids(args.input), address, args.group,
+                                                    args.workers, args.batch))
+        print(f"匹配项数量: {matches}")
+        print(f"匹配项关联值总和: {total}")
+    for k, v in stats.items():
+        print(f"{k}: {v:.3f} s" if isinstance(v, float) else f"{k}: {v}")
+
+
+if __name__ == "__main__":
+    main()
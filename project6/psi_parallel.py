@@ -0,0 +1,89 @@
+from concurrent.futures import ProcessPoolExecutor
+from psi_core import HiddenDataEngine
+
+# PSI各阶段的逐元素运算（哈希到群+指数运算、Paillier加密）按块分发到进程池，结果按输入顺序拼回。
+# 工作进程只持有群参数和Paillier公钥；秘密指数随任务下发，不在进程间共享其他状态。
+_STATE = None
+
+
+def _make_state(group, public_key):
+    return group, HiddenDataEngine.from_public_key(public_key)
+
+
+def _init_worker(group, public_key):
+    global _STATE
+    _STATE = _make_state(group, public_key)
+
+
+def _run(fn, chunk, *args):
+    return fn(_STATE, chunk, *args)
+
+
+def _process_chunk(state, items, power):
+    group = state[0]
+    return [group.process_element(item, power) for item in items]
+
+
+def _exponentiate_chunk(state, values, power):
+    group = state[0]
+    return [group.exponentiate(val, power) for val in values]
+
+
+def _conceal_chunk(state, pairs, power):
+    group, engine = state
+    return [(group.process_element(item, power), engine.conceal(value)) for item, value in pairs]
+
+
+class PhaseRunner:
+    """
+    分块、保序地执行PSI各阶段。workers为0时在当前进程内顺序执行（与原实现相同），
+    否则使用workers个进程，每个任务处理chunk_size个元素。
+    输出顺序与输入一致，打乱顺序仍由协议在汇总结果后完成，因此任务完成的先后不会泄露排列。
+    顺序执行时可传入持有私钥的engine，加密走CRT与噪声池。
+    """
+
+    def __init__(self, group, public_key: int, workers: int = 0, chunk_size: int = 256, engine=None):
+        if chunk_size <= 0: raise ValueError("chunk_size必须为正数")
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._pool = None
+        self._state = None
+        if workers:
+            self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                             initargs=(group, public_key))
+        else:
+            self._state = (group, engine) if engine is not None else _make_state(group, public_key)
+
+    def _map(self, fn, items, *args) -> list:
+        items = list(items)
+        if self._pool is None:
+            return fn(self._state, items, *args)
+        futures = [self._pool.submit(_run, fn, items[i:i + self.chunk_size], *args)
+                   for i in range(0, len(items), self.chunk_size)]
+        out = []
+        for fut in futures:
+            out.extend(fut.result())
+        return out
+
+    def process_elements(self, items, power: int) -> list:
+        """[H(item)^power]"""
+        return self._map(_process_chunk, items, power)
+
+    def exponentiate(self, values, power: int) -> list:
+        """[value^power]"""
+        return self._map(_exponentiate_chunk, values, power)
+
+    def process_and_conceal(self, pairs, power: int) -> list:
+        """[(H(item)^power, Enc(value))]"""
+        return self._map(_conceal_chunk, pairs, power)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
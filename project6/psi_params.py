@@ -0,0 +1,162 @@
+import os
+import json
+import hashlib
+import threading
+from math import gcd
+from typing import Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from psi_core import CryptoCore, DiffieHellmanGroup, HiddenDataEngine
+
+# 参数库：把DH群参数与Paillier密钥存成JSON文件，协议运行时直接加载，省去每次的素数搜索
+# 目录默认为 ~/.cache/psi_params，可用环境变量PSI_PARAMS_DIR指定
+PARAMS_ENV = 'PSI_PARAMS_DIR'
+_DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'psi_params')
+KINDS = ('dh', 'paillier')
+DEFAULT_BITS = {'dh': 512, 'paillier': 1024}
+
+
+def generate_params(kind: str, bits: int) -> Dict[str, int]:
+    """生成一组新参数：dh为(p, q, g)，paillier为两个素数(p1, p2)"""
+    if kind == 'dh':
+        p, q, g = DiffieHellmanGroup(bits).get_context()
+        return {'p': p, 'q': q, 'g': g}
+    if kind == 'paillier':
+        p1, p2 = HiddenDataEngine(bits)._primes
+        return {'p1': p1, 'p2': p2}
+    raise ValueError(f"未知的参数类型: {kind}")
+
+
+def vet_params(kind: str, bits: int, params: Dict[str, int]) -> bool:
+    """加载时的复核：结构关系与素性都成立才使用"""
+    if kind == 'dh':
+        p, q, g = params['p'], params['q'], params['g']
+        return (p == 2 * q + 1 and q.bit_length() == bits and 1 < g < p - 1 and pow(g, q, p) == 1
+                and CryptoCore.is_likely_prime(q) and CryptoCore.is_likely_prime(p))
+    if kind == 'paillier':
+        p1, p2 = params['p1'], params['p2']
+        return (p1 != p2 and p1.bit_length() == bits // 2 and p2.bit_length() == bits // 2
+                and gcd(p1 * p2, (p1 - 1) * (p2 - 1)) == 1
+                and CryptoCore.is_likely_prime(p1) and CryptoCore.is_likely_prime(p2))
+    return False
+
+
+def _write_atomic(path: str, text: str, private: bool):
+    #先写临时文件再改名，读者不会看到写了一半的文件；Paillier私钥文件仅属主可读
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600 if private else 0o644)
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _generate_into(directory: str, kind: str, bits: int) -> str:
+    #后台进程入口：生成一组参数并写入参数库
+    return ParamStore(directory).save(kind, bits, generate_params(kind, bits))
+
+
+class ParamStore:
+    """
+    参数/密钥库。文件名为 <kind>-<bits>-<指纹>.json；
+    get()默认复用已有参数，fresh=True时取走一组（用后删除），适合一次性的Paillier密钥。
+    库为空时当场生成（冷启动），refill()可在后台进程中预先生成（之后均为热启动）。
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.environ.get(PARAMS_ENV) or _DEFAULT_DIR
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.Lock()
+        # 本进程内已复核过的文件指纹，避免重复做素性检测
+        self._vetted = set()
+        self._pool = None
+
+    def _files(self, kind: str, bits: int) -> List[str]:
+        prefix = f"{kind}-{bits}-"
+        names = sorted(n for n in os.listdir(self.path) if n.startswith(prefix) and n.endswith('.json'))
+        return [os.path.join(self.path, n) for n in names]
+
+    def count(self, kind: str, bits: int) -> int:
+        return len(self._files(kind, bits))
+
+    def save(self, kind: str, bits: int, params: Dict[str, int]) -> str:
+        if kind not in KINDS: raise ValueError(f"未知的参数类型: {kind}")
+        text = json.dumps({'kind': kind, 'bits': bits, 'params': {k: hex(v) for k, v in params.items()}})
+        fingerprint = hashlib.sha256(text.encode()).hexdigest()[:16]
+        path = os.path.join(self.path, f"{kind}-{bits}-{fingerprint}.json")
+        _write_atomic(path, text, kind == 'paillier')
+        self._vetted.add(fingerprint)
+        return path
+
+    def load(self, path: str, kind: str, bits: int) -> Dict[str, int]:
+        """
+        读取并按请求的kind、bits复核一个参数文件；文件名与内容中的类型、位数须与请求一致，
+        否则（以及格式或复核不通过时）抛出ValueError
+        """
+        if not os.path.basename(path).startswith(f"{kind}-{bits}-"): raise ValueError(f"参数文件名与请求不符: {path}")
+        with open(path) as f:
+            text = f.read()
+        try:
+            doc = json.loads(text)
+            params = {k: int(v, 16) for k, v in doc['params'].items()}
+            matches = doc['kind'] == kind and doc['bits'] == bits
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise ValueError(f"参数文件格式错误: {path}")
+        # 只信任请求的类型与位数：文件自述的bits不能用来降低复核标准
+        if not matches: raise ValueError(f"参数文件内容与请求不符: {path}")
+        fingerprint = hashlib.sha256(text.encode()).hexdigest()[:16]
+        if fingerprint not in self._vetted:
+            try:
+                ok = vet_params(kind, bits, params)
+            except KeyError:
+                raise ValueError(f"参数文件格式错误: {path}")
+            if not ok: raise ValueError(f"参数复核失败: {path}")
+            self._vetted.add(fingerprint)
+        return params
+
+    def get(self, kind: str, bits: int = None, fresh: bool = False) -> Dict[str, int]:
+        bits = bits or DEFAULT_BITS[kind]
+        with self._lock:
+            for path in self._files(kind, bits):
+                try:
+                    params = self.load(path, kind, bits)
+                except ValueError:
+                    continue
+                if fresh:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        # 已被其他进程取走
+                        continue
+                return params
+        # 冷启动：库中没有可用参数，当场生成；复用模式下顺便存入库中
+        params = generate_params(kind, bits)
+        if not fresh: self.save(kind, bits, params)
+        return params
+
+    def dh_group(self, bits: int = None) -> DiffieHellmanGroup:
+        p = self.get('dh', bits)
+        return DiffieHellmanGroup(params=(p['p'], p['q'], p['g']))
+
+    def paillier_engine(self, bits: int = None, fresh: bool = False) -> HiddenDataEngine:
+        bits = bits or DEFAULT_BITS['paillier']
+        p = self.get('paillier', bits, fresh)
+        return HiddenDataEngine(bits, primes=(p['p1'], p['p2']))
+
+    def refill(self, kind: str, bits: int = None, target: int = 4, workers: int = 1):
+        """后台补足到target组参数，返回各生成任务的Future；不阻塞调用方"""
+        bits = bits or DEFAULT_BITS[kind]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=workers)
+        missing = max(0, target - self.count(kind, bits))
+        return [self._pool.submit(_generate_into, self.path, kind, bits) for _ in range(missing)]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
@@ -0,0 +1,170 @@
+import os
+import shutil
+import tempfile
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+from psi_core import HiddenDataEngine, make_group, _SHUFFLER
+from psi_parallel import PhaseRunner
+from psi_aggregate import Aggregator
+
+# 流式/外存模式的PSI求和：双方输入来自文件或迭代器，中间结果以定长二进制记录写到磁盘，
+# 打乱和求交都在外存上完成，内存中同时存在的记录数不超过max_records，与集合大小无关。
+# 记录格式：群元素用group.encode_element定长编码；方2的记录为 元素 || 定长大端Paillier密文。
+
+FANOUT = 64             # 外存打乱/分区时每层的桶数，须整除256
+MAX_RECORDS = 1 << 15   # 内存中一次处理的最大记录数
+BATCH = 1024            # 读写与进程池调度的批大小
+
+
+def read_ids(path: str) -> Iterator[str]:
+    """方1的输入文件：每行一个标识符"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line: yield line
+
+
+def read_pairs(path: str) -> Iterator[Tuple[str, int]]:
+    """方2的输入文件：每行 标识符,数值"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                item, value = line.rsplit(',', 1)
+                yield item, int(value)
+
+
+def _batches(iterable, size: int) -> Iterator[list]:
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk: return
+        yield chunk
+
+
+def _read_records(path: str, width: int, batch: int = BATCH) -> Iterator[List[bytes]]:
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(width * batch)
+            if not data: return
+            if len(data) % width: raise ValueError(f"记录文件长度错误: {path}")
+            yield [data[i:i + width] for i in range(0, len(data), width)]
+
+
+def _count(path: str, width: int) -> int:
+    return os.path.getsize(path) // width
+
+
+def _scatter(src: str, width: int, workdir: str, index) -> List[str]:
+    #按index(记录列表)给出的桶号把src的记录分到FANOUT个文件
+    bucket_dir = tempfile.mkdtemp(dir=workdir)
+    paths = [os.path.join(bucket_dir, f"{i}.bin") for i in range(FANOUT)]
+    files = [open(p, 'wb') for p in paths]
+    try:
+        for recs in _read_records(src, width):
+            for r, i in zip(recs, index(recs)):
+                files[i].write(r)
+    finally:
+        for f in files: f.close()
+    return paths
+
+
+def _shuffle_into(src: str, out, width: int, max_records: int, workdir: str):
+    if _count(src, width) <= max_records:
+        recs = [r for recs in _read_records(src, width) for r in recs]
+        _SHUFFLER.shuffle(recs)
+        out.write(b''.join(recs))
+        return
+    # 每条记录独立均匀地落入一个桶，桶内再均匀打乱，按桶顺序拼接即为均匀随机排列
+    paths = _scatter(src, width, workdir, lambda recs: [b % FANOUT for b in os.urandom(len(recs))])
+    for p in paths:
+        _shuffle_into(p, out, width, max_records, workdir)
+        os.remove(p)
+    os.rmdir(os.path.dirname(paths[0]))
+
+
+def external_shuffle(src: str, dst: str, width: int, max_records: int = MAX_RECORDS, workdir: str = None):
+    """把src中宽width的定长记录均匀随机打乱后写到dst，内存中至多max_records条记录"""
+    with open(dst, 'wb') as out:
+        _shuffle_into(src, out, width, max_records, workdir or os.path.dirname(os.path.abspath(dst)))
+
+
+def _hash_join(a_path: str, b_path: str, key_width: int, b_width: int,
+               acc: Aggregator, max_records: int, workdir: str, depth: int = 0):
+    """
+    A为键记录(H^{ab})，B为 键||密文 记录。B侧不超过max_records时建字典、流式扫描A；
+    否则两侧按键的同一字节分区后逐对递归。群元素编码的低位字节近似均匀，第depth层取倒数第depth+1个字节。
+    """
+    if _count(b_path, b_width) <= max_records or depth >= key_width:
+        table = {}
+        for recs in _read_records(b_path, b_width):
+            for r in recs:
+                table[r[:key_width]] = r[key_width:]
+        for recs in _read_records(a_path, key_width):
+            for k in recs:
+                if k in table: acc.add(int.from_bytes(table[k], 'big'))
+        return
+    index = lambda recs: [r[key_width - 1 - depth] % FANOUT for r in recs]
+    a_parts = _scatter(a_path, key_width, workdir, index)
+    b_parts = _scatter(b_path, b_width, workdir, index)
+    for a_part, b_part in zip(a_parts, b_parts):
+        _hash_join(a_part, b_part, key_width, b_width, acc, max_records, workdir, depth + 1)
+        os.remove(a_part)
+        os.remove(b_part)
+    os.rmdir(os.path.dirname(a_parts[0]))
+    os.rmdir(os.path.dirname(b_parts[0]))
+
+
+def streaming_computation(source_1: Iterable[str], source_2: Iterable[Tuple[str, int]], group='modp', store=None,
+                          workdir: str = None, workers: int = 0, batch: int = BATCH, max_records: int = MAX_RECORDS):
+    """
+    collaborative_computation的外存版本，返回(匹配数, 匹配项数值之和)。
+    source_1/source_2可以是列表、生成器或read_ids/read_pairs读出的文件流；
+    中间文件放在workdir下的临时目录中，结束后删除。
+    """
+    shared_group = make_group(group, store) if isinstance(group, str) else group
+    secret_A = shared_group.random_exponent()
+    secret_B = shared_group.random_exponent()
+    secret_system = store.paillier_engine(fresh=True) if store is not None else HiddenDataEngine()
+    enc, dec = shared_group.encode_element, shared_group.decode_element
+    ew = shared_group.element_size
+    cw = (secret_system._N_squared.bit_length() + 7) // 8
+    tmp = tempfile.mkdtemp(prefix='psi_stream_', dir=workdir)
+    path = lambda name: os.path.join(tmp, name)
+    try:
+        with PhaseRunner(shared_group, secret_system.key_public, workers, batch, secret_system) as runner:
+            # 阶段一：方1对自己的集合求H(x)^a并打乱
+            with open(path('a1'), 'wb') as f:
+                for chunk in _batches(source_1, batch):
+                    f.write(b''.join(enc(v) for v in runner.process_elements(chunk, secret_A)))
+            external_shuffle(path('a1'), path('a1s'), ew, max_records, tmp)
+            os.remove(path('a1'))
+
+            # 阶段二：方2求(H(x)^a)^b并打乱；对自己的集合求 H(y)^b || Enc(v) 并打乱
+            with open(path('a2'), 'wb') as f:
+                for recs in _read_records(path('a1s'), ew, batch):
+                    f.write(b''.join(enc(v) for v in runner.exponentiate([dec(r) for r in recs], secret_B)))
+            os.remove(path('a1s'))
+            external_shuffle(path('a2'), path('a2s'), ew, max_records, tmp)
+            os.remove(path('a2'))
+            with open(path('b1'), 'wb') as f:
+                for chunk in _batches(source_2, batch):
+                    f.write(b''.join(enc(h) + c.to_bytes(cw, 'big')
+                                     for h, c in runner.process_and_conceal(chunk, secret_B)))
+            external_shuffle(path('b1'), path('b1s'), ew + cw, max_records, tmp)
+            os.remove(path('b1'))
+
+            # 阶段三：方1求(H(y)^b)^a，与方2返回的集合做外存哈希连接并累加匹配项密文
+            with open(path('b2'), 'wb') as f:
+                for recs in _read_records(path('b1s'), ew + cw, batch):
+                    hs = runner.exponentiate([dec(r[:ew]) for r in recs], secret_A)
+                    f.write(b''.join(enc(h) + r[ew:] for h, r in zip(hs, recs)))
+            os.remove(path('b1s'))
+        acc = Aggregator(secret_system._N_squared)
+        _hash_join(path('a2s'), path('b2'), ew, ew + cw, acc, max_records, tmp)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    # 方1用公钥重随机化后交给方2解密
+    total = acc.total(engine=HiddenDataEngine.from_public_key(secret_system.key_public))
+    return acc.count(), secret_system.unseal(total)
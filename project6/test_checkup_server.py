@@ -0,0 +1,30 @@
+import pytest
+from checkup_server import BreachStore, CheckupClient
+
+
+@pytest.fixture(params=['modp', 'sm2'])
+def store(request, tmp_path):
+    store = BreachStore(str(tmp_path / 'store'), group=request.param)
+    store.insert(["alice:hunter2"])
+    return store
+
+
+def test_query_roundtrip(store):
+    client = CheckupClient.for_store(store)
+    prefix, blinded, secret = client.prepare("alice:hunter2")
+    assert client.check(store.query(prefix, blinded), secret)
+    prefix, blinded, secret = client.prepare("bob:letmein")
+    assert not client.check(store.query(prefix, blinded), secret)
+
+
+def test_query_rejects_invalid_elements(store):
+    if store.group_name == 'sm2':
+        # (1, 2)不在曲线上；(0, 0)是无穷远点的表示
+        bad = [(1, 2), (0, 0)]
+    else:
+        p = store.group.get_context()[0]
+        # p-1的阶为2，应答±1会泄露密钥的奇偶性；p-2 = -2不是二次剩余，不在q阶子群中
+        bad = [p - 1, 1, 0, p, p - 2]
+    for value in bad:
+        with pytest.raises(ValueError):
+            store.query(0, value)
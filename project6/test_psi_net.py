@@ -0,0 +1,19 @@
+import pytest
+from psi_core import make_group
+from psi_net import _decode_elements
+
+
+@pytest.mark.parametrize('name', ['modp', 'sm2'])
+def test_decode_rejects_invalid_elements(name):
+    group = make_group(name)
+    good = group.encode_element(group.process_element("alice", group.random_exponent()))
+    assert _decode_elements(group, [good, good]) == [group.decode_element(good)] * 2
+    if name == 'sm2':
+        # (1, 2)不在曲线上
+        bad = group.encode_element((1, 2))
+    else:
+        # p-1的阶为2，对它乘方会泄露指数的奇偶性
+        bad = group.encode_element(group.get_context()[0] - 1)
+    # 有效值之后的第一个无效值即中止
+    with pytest.raises(ValueError):
+        _decode_elements(group, [good, bad])
@@ -0,0 +1,27 @@
+import os
+import json
+import pytest
+from psi_params import ParamStore, generate_params, vet_params
+
+
+def test_paillier_primes_must_have_full_length():
+    # 位数不足的小素数过去能通过 <= bits // 2 的检查
+    assert not vet_params('paillier', 1024, {'p1': 1000003, 'p2': 1000033})
+    assert vet_params('paillier', 256, generate_params('paillier', 256))
+
+
+def test_load_rejects_mismatched_bits(tmp_path):
+    store = ParamStore(str(tmp_path))
+    path = store.save('dh', 256, generate_params('dh', 256))
+    assert store.load(path, 'dh', 256)
+    # 内容自称256位的群被改名为512位文件：不能按文件中的bits复核后当作512位群使用
+    forged = os.path.join(str(tmp_path), 'dh-512-forged.json')
+    os.rename(path, forged)
+    with pytest.raises(ValueError):
+        ParamStore(str(tmp_path)).load(forged, 'dh', 512)
+    with open(forged) as f:
+        doc = json.load(f)
+    assert doc['bits'] == 256
+    # 文件名与请求不符
+    with pytest.raises(ValueError):
+        ParamStore(str(tmp_path)).load(forged, 'dh', 256)